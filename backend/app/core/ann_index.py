@@ -0,0 +1,150 @@
+import numpy as np
+
+
+class IVFIndex:
+    """
+    Inverted-file index for approximate cosine search, pure NumPy.
+
+    A spherical k-means coarse quantizer splits the gallery into `nlist` cells.
+    A query is only compared against the rows of its `nprobe` closest cells,
+    so search cost is roughly nprobe / nlist of an exact scan.
+
+    Tuning:
+        nlist  - more cells = smaller cells = faster, but needs a larger nprobe
+                 for the same recall. sqrt(N) to 4*sqrt(N) is a good start.
+        nprobe - cells visited per query. Higher = better recall, slower.
+
+    Each cell keeps its own contiguous copy of its vectors plus the gallery
+    row numbers they came from, so a probe is one dense matmul, not a gather.
+    """
+
+    def __init__(self, nlist: int = 1024, nprobe: int = 16, train_iters: int = 10, seed: int = 0):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.train_iters = train_iters
+        self.seed = seed
+
+        self.centroids = None
+        self.list_ids = []
+        self.list_vecs = []
+        self.trained_size = 0
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    def train(self, embeddings: np.ndarray):
+        """
+        Runs spherical k-means on the (normalized) gallery and assigns every row
+        to its cell. Replaces any previous training.
+        """
+        n = len(embeddings)
+        nlist = max(1, min(self.nlist, n))
+        rng = np.random.default_rng(self.seed)
+
+        # k-means on a sample is plenty for the coarse quantizer
+        sample_size = min(n, nlist * 64)
+        sample = embeddings[rng.choice(n, sample_size, replace=False)]
+        centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+
+        for _ in range(self.train_iters):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, sample)
+            counts = np.bincount(assign, minlength=nlist)
+
+            # Re-seed empty cells from random sample rows
+            empty = counts == 0
+            if empty.any():
+                sums[empty] = sample[rng.choice(sample_size, int(empty.sum()))]
+
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            centroids = (sums / norms).astype(np.float32)
+
+        self.centroids = np.ascontiguousarray(centroids)
+        self.list_ids = [np.empty(0, dtype=np.int64) for _ in range(nlist)]
+        self.list_vecs = [np.empty((0, embeddings.shape[1]), dtype=np.float32) for _ in range(nlist)]
+        self.trained_size = n
+        self.add(embeddings, np.arange(n, dtype=np.int64))
+
+    def add(self, embeddings: np.ndarray, row_ids: np.ndarray):
+        """
+        Incrementally assigns new gallery rows to their nearest cell.
+        Centroids are not retrained; call `train` again if the gallery has grown
+        a lot since `trained_size`.
+        """
+        if not self.is_trained or len(row_ids) == 0:
+            return
+        assign = self._assign(embeddings)
+        for cell in np.unique(assign):
+            members = assign == cell
+            self.list_ids[cell] = np.concatenate([self.list_ids[cell], row_ids[members]])
+            self.list_vecs[cell] = np.concatenate([self.list_vecs[cell], embeddings[members]])
+
+    def without_row(self, row_id: int) -> "IVFIndex":
+        """
+        Copy of this index with one gallery row dropped and the row numbers
+        above it shifted down by one, mirroring how GalleryIndex compacts its
+        matrix on removal. Centroids are shared; searches on the old copy are unaffected.
+        """
+        clone = IVFIndex(self.nlist, self.nprobe, self.train_iters, self.seed)
+        clone.centroids = self.centroids
+        clone.trained_size = self.trained_size
+        for ids, vecs in zip(self.list_ids, self.list_vecs):
+            keep = ids != row_id
+            if not keep.all():
+                ids, vecs = ids[keep], vecs[keep]
+            clone.list_ids.append(np.where(ids > row_id, ids - 1, ids))
+            clone.list_vecs.append(vecs)
+        return clone
+
+    def _assign(self, embeddings: np.ndarray) -> np.ndarray:
+        assign = np.empty(len(embeddings), dtype=np.int64)
+        # Chunked so a 1M-row training pass doesn't allocate an N x nlist matrix
+        for start in range(0, len(embeddings), 65536):
+            chunk = embeddings[start:start + 65536]
+            assign[start:start + len(chunk)] = np.argmax(chunk @ self.centroids.T, axis=1)
+        return assign
+
+    def search(self, queries: np.ndarray, k: int = 1, max_row: int = None):
+        """
+        Approximate top-k for each (normalized) query.
+        Same return contract as GalleryIndex.search: (scores, indices), (n, k),
+        best first, missing slots are index -1 / score 0.
+        Rows >= `max_row` (appended after the caller's snapshot) are ignored.
+        """
+        n_queries = len(queries)
+        scores = np.full((n_queries, k), -np.inf, dtype=np.float32)
+        indices = np.full((n_queries, k), -1, dtype=np.int64)
+        if n_queries == 0 or not self.is_trained:
+            return np.zeros_like(scores), indices
+
+        nprobe = max(1, min(self.nprobe, len(self.centroids)))
+        coarse = queries @ self.centroids.T
+        probes = np.argpartition(-coarse, nprobe - 1, axis=1)[:, :nprobe]
+
+        # Visit each probed cell once and score all queries that picked it in one matmul
+        for cell in np.unique(probes):
+            ids = self.list_ids[cell]
+            vecs = self.list_vecs[cell]
+            if max_row is not None:
+                keep = ids < max_row
+                ids, vecs = ids[keep], vecs[keep]
+            if len(ids) == 0:
+                continue
+
+            q_idx = np.nonzero((probes == cell).any(axis=1))[0]
+            sims = queries[q_idx] @ vecs.T
+            top = min(k, sims.shape[1])
+            best = np.argpartition(-sims, top - 1, axis=1)[:, :top]
+
+            # Merge this cell's top slots with the running best-so-far
+            merged_scores = np.concatenate([scores[q_idx], np.take_along_axis(sims, best, axis=1)], axis=1)
+            merged_ids = np.concatenate([indices[q_idx], ids[best]], axis=1)
+            order = np.argsort(-merged_scores, axis=1)[:, :k]
+            scores[q_idx] = np.take_along_axis(merged_scores, order, axis=1)
+            indices[q_idx] = np.take_along_axis(merged_ids, order, axis=1)
+
+        scores[indices < 0] = 0.0
+        return scores, indices
@@ -0,0 +1,124 @@
+import numpy as np
+
+
+def iou_matrix(boxes_a: np.ndarray, boxes_b: np.ndarray) -> np.ndarray:
+    """
+    Pairwise IoU between two sets of [x1, y1, x2, y2] boxes -> (len(a), len(b)).
+    """
+    a = np.asarray(boxes_a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(boxes_b, dtype=np.float32).reshape(-1, 4)
+    if len(a) == 0 or len(b) == 0:
+        return np.zeros((len(a), len(b)), dtype=np.float32)
+
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.where(union > 0, inter / np.maximum(union, 1e-6), 0.0)
+
+
+def greedy_match(iou: np.ndarray, threshold: float):
+    """
+    Greedy one-to-one assignment on an IoU matrix, highest overlap first.
+    Returns (pairs, unmatched_rows, unmatched_cols).
+    """
+    pairs = []
+    used_rows, used_cols = set(), set()
+    if iou.size:
+        rows, cols = np.nonzero(iou >= threshold)
+        for idx in np.argsort(-iou[rows, cols]):
+            r, c = int(rows[idx]), int(cols[idx])
+            if r in used_rows or c in used_cols:
+                continue
+            pairs.append((r, c))
+            used_rows.add(r)
+            used_cols.add(c)
+
+    unmatched_rows = [r for r in range(iou.shape[0]) if r not in used_rows]
+    unmatched_cols = [c for c in range(iou.shape[1]) if c not in used_cols]
+    return pairs, unmatched_rows, unmatched_cols
+
+
+class BoxTracker:
+    """
+    Lightweight constant-velocity box tracker for detect-every-N-frames.
+
+    On detection frames `update()` associates the fresh detections with the
+    existing tracks by IoU and re-estimates each track's per-frame velocity.
+    On the frames in between `predict()` moves every box by its velocity, so
+    the identity found on the last detection frame follows the face around.
+
+    Detections are the dicts produced by `RecognitionService._analyze_frame`
+    ({"box", "name", "score", "is_known"}); everything but the box is carried
+    through unchanged.
+    """
+
+    def __init__(self, iou_threshold: float = 0.3):
+        self.iou_threshold = iou_threshold
+        self.tracks = []
+        self._next_id = 0
+
+    def update(self, detections: list, frame_index: int) -> list:
+        """
+        Feeds the results of a full detection pass. Detections are the source
+        of truth: unmatched tracks are dropped, unmatched detections start new ones.
+        """
+        prev_boxes = np.array([t["box"] for t in self.tracks], dtype=np.float32).reshape(-1, 4)
+        det_boxes = np.array([d["box"] for d in detections], dtype=np.float32).reshape(-1, 4)
+        pairs, _, new_dets = greedy_match(iou_matrix(prev_boxes, det_boxes), self.iou_threshold)
+
+        tracks = []
+        for t_idx, d_idx in pairs:
+            track = self.tracks[t_idx]
+            gap = max(1, frame_index - track["frame_index"])
+            velocity = (det_boxes[d_idx] - track["detected_box"]) / gap
+            tracks.append(self._make_track(track["track_id"], detections[d_idx], det_boxes[d_idx], velocity, frame_index))
+
+        for d_idx in new_dets:
+            tracks.append(self._make_track(self._next_id, detections[d_idx], det_boxes[d_idx], np.zeros(4, np.float32), frame_index))
+            self._next_id += 1
+
+        self.tracks = tracks
+        return self._results()
+
+    def predict(self) -> list:
+        """
+        Advances every track by one frame and returns the propagated results.
+        """
+        for track in self.tracks:
+            track["box"] = track["box"] + track["velocity"]
+        return self._results()
+
+    def hold(self) -> list:
+        """
+        Nothing in the frame changed (motion gate): every box stays where it
+        was last seen instead of being extrapolated, and stops moving.
+        """
+        for track in self.tracks:
+            track["velocity"] = np.zeros(4, np.float32)
+        return self._results()
+
+    @staticmethod
+    def _make_track(track_id, detection, box, velocity, frame_index):
+        return {
+            "track_id": track_id,
+            "data": detection,
+            "box": box.copy(),
+            "detected_box": box.copy(),
+            "velocity": velocity,
+            "frame_index": frame_index,
+        }
+
+    def _results(self) -> list:
+        results = []
+        for track in self.tracks:
+            data = dict(track["data"])
+            data["box"] = np.round(track["box"]).astype(int)
+            data["track_id"] = track["track_id"]
+            results.append(data)
+        return results
@@ -0,0 +1,82 @@
+import os
+
+import numpy as np
+from bson.binary import Binary
+
+EMBEDDING_DIM = 512
+
+# Version 1: list of doubles (original format). Version 2: raw little-endian bytes in a BSON Binary.
+EMBEDDING_VERSION = 2
+
+# float32 keeps full precision; float16 halves storage again (cosine error ~1e-4)
+EMBEDDING_STORE_DTYPE = os.getenv("EMBEDDING_STORE_DTYPE", "float32")
+
+_DTYPES = {
+    "float32": np.dtype("<f4"),
+    "float16": np.dtype("<f2"),
+}
+
+
+def _dtype(name: str) -> np.dtype:
+    try:
+        return _DTYPES[name]
+    except KeyError:
+        raise ValueError(f"Unsupported embedding dtype: {name!r} (expected one of {sorted(_DTYPES)})")
+
+
+def encode_embedding(embedding, dtype: str = None) -> dict:
+    """
+    Packs one embedding for storage.
+    Returns the fields to put on the person document:
+        {"embedding": Binary, "embedding_dtype": "float32", "embedding_version": 2}
+    """
+    dtype = dtype or EMBEDDING_STORE_DTYPE
+    vector = np.asarray(embedding, dtype=np.float32).reshape(-1)
+    if vector.shape[0] != EMBEDDING_DIM:
+        raise ValueError(f"Expected a {EMBEDDING_DIM}-d embedding, got {vector.shape[0]}")
+    return {
+        "embedding": Binary(vector.astype(_dtype(dtype)).tobytes()),
+        "embedding_dtype": dtype,
+        "embedding_version": EMBEDDING_VERSION,
+    }
+
+
+def decode_embedding(doc: dict) -> np.ndarray:
+    """
+    Reads the embedding of one person document as a float32 vector.
+    Handles both the binary format and legacy list-of-doubles documents.
+    """
+    value = doc["embedding"]
+    if isinstance(value, bytes):
+        return np.frombuffer(value, dtype=_dtype(doc.get("embedding_dtype", "float32"))).astype(np.float32)
+    return np.asarray(value, dtype=np.float32)
+
+
+def decode_embedding_matrix(docs) -> np.ndarray:
+    """
+    Turns person documents (a list or a live cursor) into one (n, 512) float32 matrix.
+
+    When every row is binary with the same dtype, the raw buffers are joined
+    and parsed with a single np.frombuffer call, so no per-element Python
+    floats are ever created. Mixed or legacy rows fall back to decoding row by row.
+    """
+    values = []
+    dtypes = set()
+    legacy = False
+    for doc in docs:
+        value = doc["embedding"]
+        if isinstance(value, bytes):
+            dtypes.add(doc.get("embedding_dtype", "float32"))
+        else:
+            legacy = True
+        values.append((value, doc.get("embedding_dtype", "float32")))
+
+    if not values:
+        return np.empty((0, EMBEDDING_DIM), dtype=np.float32)
+
+    if not legacy and len(dtypes) == 1:
+        dtype = _dtype(dtypes.pop())
+        matrix = np.frombuffer(b"".join(v for v, _ in values), dtype=dtype).reshape(-1, EMBEDDING_DIM)
+        return matrix.astype(np.float32)
+
+    return np.stack([decode_embedding({"embedding": v, "embedding_dtype": d}) for v, d in values])
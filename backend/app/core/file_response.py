@@ -0,0 +1,54 @@
+import os
+from email.utils import parsedate_to_datetime
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.types import Receive, Scope, Send
+
+# Bytes per read when streaming the file
+MEDIA_CHUNK_SIZE = 1024 * 1024
+
+
+class MediaFileResponse(FileResponse):
+    """
+    FileResponse for large media files (processed videos).
+
+    Starlette already handles single / multi Range requests (206, 416),
+    If-Range, Content-Length, ETag, Last-Modified and the `pathsend` ASGI
+    extension. On top of that:
+        - conditional GETs: If-None-Match / If-Modified-Since answer 304
+        - the file is streamed in MEDIA_CHUNK_SIZE reads, so memory stays
+          flat whatever the file size
+    """
+
+    chunk_size = MEDIA_CHUNK_SIZE
+
+    def __init__(self, path: str, **kwargs):
+        if kwargs.get("stat_result") is None:
+            kwargs["stat_result"] = os.stat(path)
+        super().__init__(path, **kwargs)
+
+    def _not_modified(self, request_headers: Headers) -> bool:
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match is not None:
+            # Weak comparison, as RFC 9110 asks for If-None-Match
+            etag = self.headers["etag"].removeprefix("W/")
+            tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+            return "*" in tags or etag in tags
+
+        if_modified_since = request_headers.get("if-modified-since")
+        if if_modified_since is not None:
+            try:
+                since = parsedate_to_datetime(if_modified_since)
+                modified = parsedate_to_datetime(self.headers["last-modified"])
+            except (TypeError, ValueError):
+                return False
+            return modified <= since
+        return False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and self.status_code == 200 and self._not_modified(Headers(scope=scope)):
+            headers = {name: self.headers[name] for name in ("etag", "last-modified", "cache-control")
+                       if name in self.headers}
+            return await Response(status_code=304, headers=headers)(scope, receive, send)
+        await super().__call__(scope, receive, send)
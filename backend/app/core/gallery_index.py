@@ -0,0 +1,300 @@
+import os
+import threading
+import numpy as np
+
+from app.core.ann_index import IVFIndex
+from app.core.embedding_codec import EMBEDDING_DIM, decode_embedding_matrix
+
+MATCH_THRESHOLD = 0.60
+
+# --- ANN backend settings ---
+GALLERY_BACKEND = os.getenv("GALLERY_INDEX_BACKEND", "exact")
+IVF_NLIST = int(os.getenv("IVF_NLIST", "1024"))
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", "16"))
+IVF_MIN_SIZE = int(os.getenv("IVF_MIN_SIZE", "50000"))
+
+
+def l2_normalize(vectors) -> np.ndarray:
+    """
+    Returns a float32 copy of `vectors` with every row scaled to unit length.
+    Rows with zero norm are left as zeros (they score 0 against everything).
+    """
+    matrix = np.asarray(vectors, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix[None, :]
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return np.ascontiguousarray(matrix / norms, dtype=np.float32)
+
+
+def stack_face_embeddings(faces):
+    """
+    Collects the embeddings of detected faces into one (n, 512) matrix.
+    Faces with an empty / zero embedding are dropped, same as the old loops did.
+    Returns (kept_faces, normalized_matrix).
+    """
+    kept = []
+    rows = []
+    for face in faces:
+        embedding = getattr(face, "embedding", None)
+        if embedding is None or not np.any(embedding):
+            continue
+        kept.append(face)
+        rows.append(embedding)
+
+    if not rows:
+        return [], np.empty((0, EMBEDDING_DIM), dtype=np.float32)
+    return kept, l2_normalize(np.stack(rows))
+
+
+def _build_ann_index():
+    """
+    Creates the optional approximate backend configured through the environment.
+        GALLERY_INDEX_BACKEND = exact | ivf | auto   (auto = ivf once the gallery is large)
+        IVF_NLIST, IVF_NPROBE, IVF_MIN_SIZE          (recall / speed knobs)
+    """
+    return IVFIndex(nlist=IVF_NLIST, nprobe=IVF_NPROBE)
+
+
+class GalleryIndex:
+    """
+    In-memory gallery of enrolled identities.
+
+    Keeps one contiguous, L2-normalized float32 matrix plus parallel
+    person_id / name arrays, so a whole frame of faces is scored against
+    every identity with a single matrix multiply. For very large galleries
+    an IVF index (see ann_index.py) can be switched on behind the same API.
+
+    Rows live in capacity-doubling buffers, so `add` is amortized O(1) and
+    readers keep using the views they snapshotted even while a row is appended.
+    When `add` grows the gallery past the IVF threshold, the index is trained
+    on a background thread and swapped in when done; until then searches
+    stay exact.
+    """
+
+    def __init__(self, backend: str = None):
+        self.backend = (backend or GALLERY_BACKEND).lower()
+        self._lock = threading.Lock()
+        self._size = 0
+        self._embeddings = np.empty((0, EMBEDDING_DIM), dtype=np.float32)
+        self._person_ids = np.empty(0, dtype=object)
+        self._names = np.empty(0, dtype=object)
+        self.ann = None
+        # Bumped whenever row numbers change (reload, removal), so a background
+        # IVF training can tell its snapshot went stale
+        self._generation = 0
+        self._training = False
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def embeddings(self) -> np.ndarray:
+        return self._embeddings[:self._size]
+
+    @property
+    def person_ids(self) -> np.ndarray:
+        return self._person_ids[:self._size]
+
+    @property
+    def names(self) -> np.ndarray:
+        return self._names[:self._size]
+
+    def _wants_ann(self, size: int) -> bool:
+        if self.backend == "ivf":
+            # k-means needs a few rows per cell to be worth it
+            return size >= 2 * IVF_NLIST
+        if self.backend == "auto":
+            return size >= IVF_MIN_SIZE
+        return False
+
+    def load(self, persons: list):
+        """
+        Rebuilds the index from person documents ({"person_id", "name", "embedding"}).
+        Embeddings may be binary or legacy lists (see embedding_codec).
+        The arrays are swapped in one step so readers never see a half-built gallery.
+        """
+        if persons:
+            embeddings = decode_embedding_matrix(persons)
+        else:
+            embeddings = np.empty((0, EMBEDDING_DIM), dtype=np.float32)
+        person_ids = [p.get("person_id") for p in persons]
+        names = [p["name"] for p in persons]
+        self.load_matrix(embeddings, person_ids, names)
+
+    def load_matrix(self, embeddings: np.ndarray, person_ids, names):
+        """
+        Same as `load` for data that is already a (n, 512) matrix plus
+        parallel id / name sequences (e.g. synthetic galleries in benchmarks).
+        Rows are L2-normalized here.
+        """
+        embeddings = l2_normalize(embeddings) if len(embeddings) else np.empty((0, EMBEDDING_DIM), dtype=np.float32)
+        person_ids = np.array(person_ids, dtype=object)
+        names = np.array(names, dtype=object)
+
+        ann = None
+        if self._wants_ann(len(embeddings)):
+            ann = _build_ann_index()
+            ann.train(embeddings)
+
+        with self._lock:
+            self._embeddings = embeddings
+            self._person_ids = person_ids
+            self._names = names
+            self._size = len(names)
+            self.ann = ann
+            self._generation += 1
+
+    def add(self, person_id: str, name: str, embedding):
+        """
+        Appends one identity without rebuilding the gallery.
+        Used right after enrollment so new people are recognizable immediately.
+        """
+        row = l2_normalize(embedding)[0]
+
+        with self._lock:
+            size = self._size
+            if size == len(self._embeddings):
+                capacity = max(1024, 2 * size)
+                embeddings = np.empty((capacity, EMBEDDING_DIM), dtype=np.float32)
+                person_ids = np.empty(capacity, dtype=object)
+                names = np.empty(capacity, dtype=object)
+                embeddings[:size] = self._embeddings[:size]
+                person_ids[:size] = self._person_ids[:size]
+                names[:size] = self._names[:size]
+                self._embeddings, self._person_ids, self._names = embeddings, person_ids, names
+
+            self._embeddings[size] = row
+            self._person_ids[size] = person_id
+            self._names[size] = name
+            self._size = size + 1
+
+            if self.ann is not None:
+                self.ann.add(row[None, :], np.array([size], dtype=np.int64))
+            elif self._wants_ann(self._size) and not self._training:
+                # k-means on a large gallery takes seconds: not on the enrolling request, not under the lock
+                self._training = True
+                threading.Thread(target=self._train_ann, daemon=True, name="ivf-train").start()
+
+    def _train_ann(self):
+        """
+        Trains an IVF index on a snapshot of the gallery and swaps it in.
+        Rows appended meanwhile are added to it; if rows were removed or the
+        gallery reloaded, it starts over on the new data.
+        """
+        try:
+            while True:
+                with self._lock:
+                    if self.ann is not None or not self._wants_ann(self._size):
+                        return
+                    generation, size = self._generation, self._size
+                    # add() only writes past `size` or into new buffers, so this view stays valid
+                    embeddings = self._embeddings[:size]
+
+                ann = _build_ann_index()
+                ann.train(embeddings)
+
+                with self._lock:
+                    if self._generation != generation or self.ann is not None:
+                        continue
+                    if self._size > size:
+                        ann.add(self._embeddings[size:self._size], np.arange(size, self._size, dtype=np.int64))
+                    self.ann = ann
+                    return
+        finally:
+            with self._lock:
+                self._training = False
+
+    def contains(self, person_id: str) -> bool:
+        return bool(np.any(self.person_ids == person_id))
+
+    def remove(self, person_id: str) -> bool:
+        """
+        Drops one identity (e.g. its status is no longer "active").
+        Copy-on-write: the remaining rows go into new buffers, so searches that
+        already took a snapshot keep a consistent view. Returns False if absent.
+        """
+        with self._lock:
+            size = self._size
+            rows = np.nonzero(self._person_ids[:size] == person_id)[0]
+            if len(rows) == 0:
+                return False
+            row = int(rows[0])
+
+            keep = np.ones(size, dtype=bool)
+            keep[row] = False
+            self._embeddings = np.ascontiguousarray(self._embeddings[:size][keep])
+            self._person_ids = self._person_ids[:size][keep]
+            self._names = self._names[:size][keep]
+            self._size = size - 1
+            self._generation += 1
+            if self.ann is not None:
+                self.ann = self.ann.without_row(row)
+        return True
+
+    def _snapshot(self):
+        with self._lock:
+            size = self._size
+            return self._embeddings[:size], self._person_ids[:size], self._names[:size], self.ann
+
+    def search(self, queries: np.ndarray, k: int = 1):
+        """
+        Scores every query row against the whole gallery.
+        `queries` must already be L2-normalized (see `l2_normalize`).
+        Returns (scores, indices), both shaped (n_queries, k) and sorted best first.
+        Missing slots (gallery smaller than k) have index -1 and score 0.
+        """
+        embeddings, _, _, ann = self._snapshot()
+        return self._search_matrix(embeddings, queries, k, ann)
+
+    @staticmethod
+    def _search_matrix(embeddings: np.ndarray, queries: np.ndarray, k: int, ann=None):
+        if ann is not None:
+            return ann.search(queries, k, max_row=len(embeddings))
+
+        n_queries = len(queries)
+        scores = np.zeros((n_queries, k), dtype=np.float32)
+        indices = np.full((n_queries, k), -1, dtype=np.int64)
+        if n_queries == 0 or len(embeddings) == 0:
+            return scores, indices
+
+        sims = queries @ embeddings.T
+        top = min(k, sims.shape[1])
+        if top == 1:
+            best = np.argmax(sims, axis=1)[:, None]
+        else:
+            # argpartition keeps this O(N) per query, then sort only the top slots
+            part = np.argpartition(-sims, top - 1, axis=1)[:, :top]
+            order = np.argsort(-np.take_along_axis(sims, part, axis=1), axis=1)
+            best = np.take_along_axis(part, order, axis=1)
+
+        indices[:, :top] = best
+        scores[:, :top] = np.take_along_axis(sims, best, axis=1)
+        return scores, indices
+
+    def match(self, queries: np.ndarray, threshold: float = MATCH_THRESHOLD, k: int = 1) -> list:
+        """
+        Top-k identity lookup for a batch of normalized embeddings.
+        Returns one dict per query:
+            {"name", "person_id", "score", "is_known", "candidates": [(name, person_id, score), ...]}
+        A negative best score is reported as 0, like the original per-identity loop.
+        """
+        embeddings, person_ids, names, ann = self._snapshot()
+        scores, indices = self._search_matrix(embeddings, queries, k, ann)
+
+        results = []
+        for row_scores, row_indices in zip(scores, indices):
+            candidates = [
+                (names[i], person_ids[i], float(s))
+                for s, i in zip(row_scores, row_indices) if i >= 0
+            ]
+            best_score = max(float(row_scores[0]), 0.0) if candidates else 0.0
+            is_known = best_score > threshold
+            results.append({
+                "name": candidates[0][0] if is_known else "Unknown",
+                "person_id": candidates[0][1] if is_known else None,
+                "score": best_score,
+                "is_known": is_known,
+                "candidates": candidates,
+            })
+        return results
@@ -0,0 +1,90 @@
+import logging
+import os
+import threading
+import time
+
+# Level of the app's "facelog.*" loggers
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# Minimum seconds between two messages of the same rate-limited key
+LOG_RATE_LIMIT_SEC = float(os.getenv("LOG_RATE_LIMIT_SEC", "5"))
+
+_configured = False
+_configure_lock = threading.Lock()
+
+
+def _configure():
+    global _configured
+    with _configure_lock:
+        if _configured:
+            return
+        root = logging.getLogger("facelog")
+        if not root.handlers:
+            handler = logging.StreamHandler()
+            handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s"))
+            root.addHandler(handler)
+        root.setLevel(LOG_LEVEL)
+        # uvicorn / the root logger have their own formats; keep ours separate
+        root.propagate = False
+        _configured = True
+
+
+def format_fields(event: str, fields: dict) -> str:
+    """`event key=value ...`: one line, easy to grep and to parse."""
+    parts = [event]
+    for key, value in fields.items():
+        if isinstance(value, float):
+            value = round(value, 3)
+        value = str(value)
+        if " " in value or not value:
+            value = '"' + value.replace('"', "'") + '"'
+        parts.append(f"{key}={value}")
+    return " ".join(parts)
+
+
+class RateLimitedLogger:
+    """
+    Structured logger for hot loops: `log.info("video_frame", frame=120, ...)`
+    emits at most one line per key every `interval_sec` and reports how many
+    were suppressed in between, so per-frame logging costs a dict lookup and
+    a clock read instead of a write to stdout.
+
+    The key is the event name unless `key=` is given (e.g. per camera).
+    """
+
+    def __init__(self, name: str, interval_sec: float = LOG_RATE_LIMIT_SEC):
+        _configure()
+        self.logger = logging.getLogger(f"facelog.{name}")
+        self.interval_sec = interval_sec
+        self._last = {}
+        self._suppressed = {}
+        self._lock = threading.Lock()
+
+    def _allow(self, key) -> int:
+        """Number of suppressed messages to report, or -1 to drop this one."""
+        now = time.monotonic()
+        with self._lock:
+            last = self._last.get(key)
+            if last is not None and now - last < self.interval_sec:
+                self._suppressed[key] = self._suppressed.get(key, 0) + 1
+                return -1
+            self._last[key] = now
+            return self._suppressed.pop(key, 0)
+
+    def log(self, level: int, event: str, key=None, **fields):
+        if not self.logger.isEnabledFor(level):
+            return
+        suppressed = self._allow(key if key is not None else event)
+        if suppressed < 0:
+            return
+        if suppressed:
+            fields["suppressed"] = suppressed
+        self.logger.log(level, format_fields(event, fields))
+
+    def debug(self, event: str, key=None, **fields):
+        self.log(logging.DEBUG, event, key, **fields)
+
+    def info(self, event: str, key=None, **fields):
+        self.log(logging.INFO, event, key, **fields)
+
+    def warning(self, event: str, key=None, **fields):
+        self.log(logging.WARNING, event, key, **fields)
@@ -0,0 +1,216 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds (seconds) of the stage timing buckets: 0.25 ms .. 10 s
+STAGE_BUCKETS = (0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape_label(value) -> str:
+    # Label values escape backslash, double quote and line feed (text exposition format)
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape_label(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _HistogramChild:
+    """One label combination of a Histogram: bucket counts, sum and count."""
+
+    def __init__(self, buckets: tuple):
+        self._buckets = buckets
+        self._counts = [0] * (len(buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        i = bisect.bisect_left(self._buckets, value)
+        with self._lock:
+            self._counts[i] += 1
+            self._sum += value
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def snapshot(self):
+        with self._lock:
+            return list(self._counts), self._sum
+
+    def merge(self, counts: list, total: float):
+        """Adds observations recorded elsewhere (same buckets), e.g. in a worker process."""
+        with self._lock:
+            for i, count in enumerate(counts):
+                self._counts[i] += count
+            self._sum += total
+
+
+class Histogram:
+    """
+    Prometheus-style histogram with fixed buckets and optional labels.
+
+    `labels(...)` returns (and caches) the child for one label combination;
+    hot loops should keep that child around, so an observation is a bisect
+    plus two increments under a per-child lock.
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (),
+                 buckets: tuple = STAGE_BUCKETS, registry: "Registry" = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._children = {}
+        self._lock = threading.Lock()
+        (registry or REGISTRY).register(self)
+
+    def labels(self, *values, **labels) -> _HistogramChild:
+        key = tuple(str(v) for v in values) or tuple(str(labels[name]) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, _HistogramChild(self.buckets))
+        return child
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def time(self):
+        return self.labels().time()
+
+    def snapshot(self) -> dict:
+        """{label values: (bucket counts, sum)}, plain data that pickles across processes."""
+        return {key: child.snapshot() for key, child in list(self._children.items())}
+
+    def merge(self, snapshot: dict):
+        """Adds a snapshot (or snapshot_delta) taken from the same histogram in another process."""
+        for key, (counts, total) in snapshot.items():
+            self.labels(*key).merge(counts, total)
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for key, child in sorted(self._children.items()):
+            counts, total = child.snapshot()
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+def snapshot_delta(current: dict, base: dict) -> dict:
+    """Observations in histogram snapshot `current` that are not in the older `base`."""
+    delta = {}
+    for key, (counts, total) in current.items():
+        base_counts, base_total = base.get(key, ([0] * len(counts), 0.0))
+        diff = [a - b for a, b in zip(counts, base_counts)]
+        if any(diff):
+            delta[key] = (diff, total - base_total)
+    return delta
+
+
+class Counter:
+    """Monotonic counter with optional labels."""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), registry: "Registry" = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        (registry or REGISTRY).register(self)
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Gauge:
+    """Gauge read from a callback at scrape time (queue depths, pool sizes...)."""
+
+    def __init__(self, name: str, documentation: str, read, registry: "Registry" = None):
+        self.name = name
+        self.documentation = documentation
+        self._read = read
+        (registry or REGISTRY).register(self)
+
+    def render(self) -> list:
+        try:
+            value = self._read()
+        except Exception:
+            return []
+        if value is None:
+            return []
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge",
+                f"{self.name} {_format_value(value)}"]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+
+    def render(self) -> str:
+        """Every registered metric in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# Per-stage wall time of the hot paths:
+#   pipeline = video | live | enroll | events
+#   stage    = decode, det_prepare (downscale + colour conversion), detect, embed, match, draw, encode,
+#              jpeg_encode, crop_write, db_write
+STAGE_SECONDS = Histogram(
+    "facelog_stage_seconds",
+    "Wall time of one call of a processing stage (batched calls count once).",
+    ("pipeline", "stage"),
+)
+
+MJPEG_FRAMES = Counter("facelog_mjpeg_frames_total", "JPEG frames sent to /live/video_feed viewers.", ("camera_id",))
+MJPEG_BYTES = Counter("facelog_mjpeg_bytes_total", "JPEG bytes sent to /live/video_feed viewers.", ("camera_id",))
+
+
+def stage_timers(pipeline: str, stages) -> dict:
+    """{stage: histogram child} for one pipeline, to keep in hot loops."""
+    return {stage: STAGE_SECONDS.labels(pipeline=pipeline, stage=stage) for stage in stages}
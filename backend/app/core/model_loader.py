@@ -1,20 +1,428 @@
+import os
+import cv2
 import numpy as np
+import queue
 import threading
-from insightface.app import FaceAnalysis
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import TYPE_CHECKING
+
+# insightface / onnxruntime are imported on first model load, so importing
+# the app stays cheap for tests, workers and reloads
+if TYPE_CHECKING:
+    from insightface.app import FaceAnalysis
+
+CPU_COUNT = os.cpu_count() or 1
+# Processes that run inference side by side: this one plus every video job worker
+# (each worker process builds its own pool), so each gets an equal share of the cores
+INFERENCE_PROCESSES = 1 + max(1, int(os.getenv("VIDEO_JOB_WORKERS", "1")))
+PROCESS_CPUS = max(1, CPU_COUNT // INFERENCE_PROCESSES)
+# Model instances per process (0 = one per 4 cores of the process's share). Instances are loaded on demand.
+MODEL_POOL_SIZE = int(os.getenv("MODEL_POOL_SIZE", "0")) or max(1, PROCESS_CPUS // 4)
+# ONNX Runtime threads per instance (0 = split the process's share evenly across the pool)
+ORT_INTRA_OP_THREADS = int(os.getenv("ORT_INTRA_OP_THREADS", "0")) or max(1, PROCESS_CPUS // MODEL_POOL_SIZE)
+ORT_INTER_OP_THREADS = int(os.getenv("ORT_INTER_OP_THREADS", "1"))
+# How long a caller waits for a free instance before giving up
+MODEL_POOL_TIMEOUT_SEC = float(os.getenv("MODEL_POOL_TIMEOUT_SEC", "30"))
+
+
+def parse_det_size(value: str) -> tuple:
+    """"640" -> (640, 640); "640x384" -> (640, 384), width x height like FaceAnalysis.prepare."""
+    width, _, height = value.lower().partition("x")
+    return int(width), int(height or width)
+
+
+# Detector input size, "N" or "WIDTHxHEIGHT"; each pipeline can override it. Smaller sizes are
+# faster but miss small faces: a face needs roughly 10+ pixels at detector scale to be found
+DET_SIZE = os.getenv("DET_SIZE", "640")
+DET_SIZES = {
+    "video": parse_det_size(os.getenv("DET_SIZE_VIDEO", DET_SIZE)),
+    "live": parse_det_size(os.getenv("DET_SIZE_LIVE", DET_SIZE)),
+    "enroll": parse_det_size(os.getenv("DET_SIZE_ENROLL", DET_SIZE)),
+}
+# Shrink frames to the detector size before colour conversion and detection, then
+# align / embed from the full-resolution frame (0 = whole RGB frame to the detector)
+DETECT_DOWNSCALE = os.getenv("DETECT_DOWNSCALE", "1") == "1"
+
+
+# buffalo_l files of the two models the app runs (see detect_faces / embed_faces);
+# skipping the landmark and gender/age models saves memory per instance
+MODEL_PACK = "buffalo_l"
+DETECTION_MODEL_FILE = "det_10g.onnx"
+RECOGNITION_MODEL_FILE = "w600k_r50.onnx"
+
+
+def create_session(model_file: str):
+    """
+    ONNX Runtime session for one model of a pool instance, limited to
+    ORT_INTRA_OP_THREADS / ORT_INTER_OP_THREADS threads.
+    """
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    options.intra_op_num_threads = ORT_INTRA_OP_THREADS
+    options.inter_op_num_threads = ORT_INTER_OP_THREADS
+    options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    return ort.InferenceSession(model_file, sess_options=options, providers=["CPUExecutionProvider"])
+
+
+def _create_model():
+    from insightface.app import FaceAnalysis
+    from insightface.model_zoo.arcface_onnx import ArcFaceONNX
+    from insightface.model_zoo.retinaface import RetinaFace
+    from insightface.utils import ensure_available
+
+    # FaceAnalysis builds its sessions through model_zoo.get_model, which drops
+    # sess_options (insightface 0.7.3), so the sessions are created here and the
+    # instance is assembled around them instead of through FaceAnalysis.__init__
+    model_dir = ensure_available("models", MODEL_PACK, root="~/.insightface")
+    det_file = os.path.join(model_dir, DETECTION_MODEL_FILE)
+    rec_file = os.path.join(model_dir, RECOGNITION_MODEL_FILE)
+
+    app = FaceAnalysis.__new__(FaceAnalysis)
+    app.det_model = RetinaFace(model_file=det_file, session=create_session(det_file))
+    app.models = {
+        "detection": app.det_model,
+        "recognition": ArcFaceONNX(model_file=rec_file, session=create_session(rec_file)),
+    }
+    app.prepare(ctx_id=0, det_size=parse_det_size(DET_SIZE))
+    return app
+
+
+class ModelPool:
+    """
+    Pool of independent FaceAnalysis instances, so video jobs, live cameras
+    and enrollments can run inference at the same time.
+
+        with model_pool.checkout() as app:
+            faces = detect_faces(app, img)
+
+    An instance is used by one caller at a time. Instances are created on
+    demand up to `size`, so a process that never runs two inferences at once
+    only ever loads one. Every instance gets `intra_threads` ONNX Runtime
+    threads, so the pool as a whole doesn't oversubscribe the CPU.
+
+    Time spent waiting for a free instance is recorded for stats().
+    """
+
+    def __init__(self, size: int = MODEL_POOL_SIZE, timeout: float = MODEL_POOL_TIMEOUT_SEC):
+        self.size = max(1, size)
+        self.timeout = timeout
+        self.created = 0
+        self._primary = None
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        # insightface downloads buffalo_l on first use; never load two at once
+        self._create_lock = threading.Lock()
+
+        self.checkouts = 0
+        self.waited = 0
+        self.wait_total_sec = 0.0
+        self._waits = deque(maxlen=1000)
+
+    def _create(self):
+        with self._create_lock:
+            print(f" Loading InsightFace Model (buffalo_l) #{self.created}/{self.size}... This might take a moment.")
+            app = _create_model()
+            warm_up(app)
+            if self._primary is None:
+                self._primary = app
+            print(" Model Loaded Successfully!")
+        return app
+
+    def _acquire(self, timeout: float):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            grow = self.created < self.size
+            if grow:
+                self.created += 1
+        if grow:
+            try:
+                return self._create()
+            except BaseException:
+                with self._lock:
+                    self.created -= 1
+                raise
+
+        try:
+            return self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError(f"No model instance free after {timeout}s (pool size {self.size})")
+
+    @contextmanager
+    def checkout(self, timeout: float = None):
+        """Borrows one instance for the duration of the `with` block."""
+        start = time.perf_counter()
+        app = self._acquire(self.timeout if timeout is None else timeout)
+        wait = time.perf_counter() - start
+        with self._lock:
+            self.checkouts += 1
+            self.wait_total_sec += wait
+            self._waits.append(wait)
+        try:
+            yield app
+        finally:
+            self._idle.put(app)
+
+    def primary(self):
+        """The first loaded instance (loading it if needed). Don't run inference on it directly."""
+        if self._primary is None:
+            with self.checkout():
+                pass
+        return self._primary
+
+    def stats(self) -> dict:
+        with self._lock:
+            waits = sorted(self._waits)
+            checkouts, total = self.checkouts, self.wait_total_sec
+        return {
+            "size": self.size,
+            "created": self.created,
+            "idle": self._idle.qsize(),
+            "intra_op_threads": ORT_INTRA_OP_THREADS,
+            "inter_op_threads": ORT_INTER_OP_THREADS,
+            "checkouts": checkouts,
+            "wait_ms_avg": round(1000 * total / checkouts, 3) if checkouts else 0.0,
+            "wait_ms_p95": round(1000 * waits[int(0.95 * (len(waits) - 1))], 3) if waits else 0.0,
+            "wait_ms_max": round(1000 * waits[-1], 3) if waits else 0.0,
+        }
+
 
 class ModelLoader:
     _instance = None
-    _app = None
 
     @staticmethod
     def get_model():
-        if ModelLoader._app is None:
-            print(" Loading InsightFace Model (buffalo_l)... This might take a moment.")
-            ModelLoader._app = FaceAnalysis(name="buffalo_l", providers=["CPUExecutionProvider"])
-            ModelLoader._app.prepare(ctx_id=0, det_size=(640, 640))
-            print(" Model Loaded Successfully!")
-        return ModelLoader._app
+        """
+        Loads the model if needed and returns the pool's first instance.
+        Inference should go through `model_pool.checkout()` instead.
+        """
+        return model_pool.primary()
+
+    @staticmethod
+    def is_loaded() -> bool:
+        return model_pool.created > 0 and model_pool._primary is not None
 
 # Global access point
+model_pool = ModelPool()
 model_loader = ModelLoader()
-model_lock = threading.Lock()
\ No newline at end of file
+
+
+def _to_faces(bboxes: np.ndarray, kpss) -> list:
+    from insightface.app.common import Face
+
+    faces = []
+    for i in range(bboxes.shape[0]):
+        kps = kpss[i] if kpss is not None else None
+        faces.append(Face(bbox=bboxes[i, 0:4], kps=kps, det_score=bboxes[i, 4]))
+    return faces
+
+
+def detect_faces(app: "FaceAnalysis", img: np.ndarray, input_size=None) -> list:
+    """
+    Detection only: boxes, 5-point landmarks and det scores, no embeddings.
+    Same Face objects as `app.get()`, minus the recognition / attribute models,
+    so callers can decide which faces are worth embedding.
+    `input_size` overrides the detector size the model was prepared with.
+    """
+    bboxes, kpss = app.det_model.detect(img, input_size=input_size, max_num=0, metric="default")
+    return _to_faces(bboxes, kpss)
+
+
+def _fit_size(shape, input_size) -> tuple:
+    # (width, height) SCRFD.detect resizes an image of `shape` to before padding
+    im_ratio = float(shape[0]) / shape[1]
+    model_ratio = float(input_size[1]) / input_size[0]
+    if im_ratio > model_ratio:
+        new_height = input_size[1]
+        new_width = int(new_height / im_ratio)
+    else:
+        new_width = input_size[0]
+        new_height = int(new_width * im_ratio)
+    return new_width, new_height
+
+
+def _letterbox(img: np.ndarray, input_size) -> np.ndarray:
+    # Same resize + bottom/right padding SCRFD.detect applies before inference
+    new_width, new_height = _fit_size(img.shape, input_size)
+    det_img = np.zeros((input_size[1], input_size[0], 3), dtype=np.uint8)
+    det_img[:new_height, :new_width, :] = cv2.resize(img, (new_width, new_height))
+    return det_img
+
+
+def supports_batch(det_model) -> bool:
+    """
+    Whether one detector forward pass can cover several images: an SCRFD
+    session whose input has a dynamic batch dimension and whose outputs are
+    (batch, anchors, values). buffalo_l's det_10g is exported with batch 1
+    and 2-D outputs, so with the default model pack this is False.
+    """
+    session = getattr(det_model, "session", None)
+    if session is None or not hasattr(det_model, "_feat_stride_fpn"):
+        return False
+    if isinstance(session.get_inputs()[0].shape[0], int):
+        return False
+    return all(len(output.shape) == 3 for output in session.get_outputs())
+
+
+@lru_cache(maxsize=64)
+def _anchor_centers(height: int, width: int, stride: int, num_anchors: int) -> np.ndarray:
+    centers = np.stack(np.mgrid[:height, :width][::-1], axis=-1).astype(np.float32)
+    centers = (centers * stride).reshape((-1, 2))
+    if num_anchors > 1:
+        centers = np.stack([centers] * num_anchors, axis=1).reshape((-1, 2))
+    centers.flags.writeable = False
+    return centers
+
+
+def _decode_detections(det_model, outputs: list, input_size, det_scale: float):
+    """
+    SCRFD post-processing (RetinaFace.forward + detect) for one image's slice
+    of a batched forward pass: anchor decoding, score threshold, NMS and
+    scaling back to image coordinates. Only reads the detector's settings,
+    so callers sharing the model don't interfere.
+    """
+    from insightface.model_zoo.retinaface import distance2bbox, distance2kps
+
+    fmc = det_model.fmc
+    scores_list, bboxes_list, kpss_list = [], [], []
+    for idx, stride in enumerate(det_model._feat_stride_fpn):
+        scores = outputs[idx]
+        centers = _anchor_centers(input_size[1] // stride, input_size[0] // stride, stride,
+                                  det_model._num_anchors)
+        keep = np.where(scores >= det_model.det_thresh)[0]
+        scores_list.append(scores[keep])
+        bboxes_list.append(distance2bbox(centers, outputs[idx + fmc] * stride)[keep])
+        if det_model.use_kps:
+            kpss = distance2kps(centers, outputs[idx + fmc * 2] * stride)
+            kpss_list.append(kpss.reshape((kpss.shape[0], -1, 2))[keep])
+
+    scores = np.vstack(scores_list)
+    order = scores.ravel().argsort()[::-1]
+    pre_det = np.hstack((np.vstack(bboxes_list) / det_scale, scores)).astype(np.float32, copy=False)[order]
+    keep = det_model.nms(pre_det)
+    kpss = np.vstack(kpss_list)[order][keep] / det_scale if det_model.use_kps else None
+    return pre_det[keep], kpss
+
+
+def detect_faces_batch(app: "FaceAnalysis", imgs: list, input_size=None) -> list:
+    """
+    Runs detection for several frames with one detector forward pass.
+    Returns one list of Face objects per image, same as `detect_faces`.
+
+    Only detectors exported with a batch dimension can do this (see
+    supports_batch); otherwise, or for a single image, frames are detected
+    one by one.
+    """
+    det_model = app.det_model
+    if len(imgs) <= 1 or not supports_batch(det_model):
+        return [detect_faces(app, img, input_size) for img in imgs]
+
+    input_size = tuple(input_size or det_model.input_size)
+    det_imgs = [_letterbox(img, input_size) for img in imgs]
+    blob = cv2.dnn.blobFromImages(det_imgs, 1.0 / det_model.input_std, input_size,
+                                  (det_model.input_mean,) * 3, swapRB=True)
+    outputs = det_model.session.run(det_model.output_names, {det_model.input_name: blob})
+
+    results = []
+    for i, img in enumerate(imgs):
+        det_scale = float(_fit_size(img.shape, input_size)[1]) / img.shape[0]
+        bboxes, kpss = _decode_detections(det_model, [out[i] for out in outputs], input_size, det_scale)
+        results.append(_to_faces(bboxes, kpss))
+    return results
+
+
+def prepare_detection_inputs(frames: list, pipeline: str) -> list:
+    """
+    BGR frames -> [(det_img_rgb, (scale_x, scale_y)), ...] for detect_scaled.
+
+    With DETECT_DOWNSCALE a frame larger than the pipeline's detector size is
+    first shrunk to exactly the size SCRFD would letterbox it to, so colour
+    conversion and the detector's own resize touch ~det_size pixels instead
+    of a whole 1080p / 4K frame. The resize is the bilinear one SCRFD does
+    itself, so the detector sees the same input either way (INTER_AREA would
+    cost more on a 4K frame than the conversion it saves). The full-resolution frame stays the
+    source for alignment and embedding (embed_faces(..., bgr=True)).
+    """
+    det_size = DET_SIZES[pipeline]
+    inputs = []
+    for frame in frames:
+        scale = (1.0, 1.0)
+        if DETECT_DOWNSCALE:
+            height, width = frame.shape[:2]
+            new_width, new_height = _fit_size(frame.shape, det_size)
+            if new_height < height:
+                frame = cv2.resize(frame, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
+                scale = (new_width / width, new_height / height)
+        inputs.append((cv2.cvtColor(frame, cv2.COLOR_BGR2RGB), scale))
+    return inputs
+
+
+def detect_scaled(app: "FaceAnalysis", inputs: list, pipeline: str) -> list:
+    """
+    Batched detection on prepare_detection_inputs() output at the pipeline's
+    detector size. Boxes and landmarks are mapped back to full-frame coordinates.
+    """
+    faces_per_image = detect_faces_batch(app, [img for img, _ in inputs], DET_SIZES[pipeline])
+    for (_, (scale_x, scale_y)), faces in zip(inputs, faces_per_image):
+        if scale_x == 1.0 and scale_y == 1.0:
+            continue
+        for face in faces:
+            face.bbox = face.bbox / np.array([scale_x, scale_y, scale_x, scale_y], dtype=np.float32)
+            if face.kps is not None:
+                face.kps = face.kps / np.array([scale_x, scale_y], dtype=np.float32)
+    return faces_per_image
+
+
+def embed_faces(app: "FaceAnalysis", img: np.ndarray, faces: list, bgr: bool = False):
+    """
+    Sets `face.embedding` for the given faces (from `detect_faces`) with one
+    batched ArcFace forward pass over their aligned crops.
+    """
+    embed_face_batches(app, [(img, faces)], bgr)
+
+
+def embed_face_batches(app: "FaceAnalysis", batches: list, bgr: bool = False):
+    """
+    Same as `embed_faces` for faces from several frames at once:
+    `batches` is [(img, faces), ...]. Every crop from every frame is aligned
+    first, then embedded in a single recognition-model call.
+    With bgr=True the images are BGR frames and only the 112x112 crops are
+    converted to RGB, never the whole frame.
+    """
+    from insightface.utils import face_align
+
+    rec_model = app.models["recognition"]
+    size = rec_model.input_size[0]
+    faces = []
+    crops = []
+    for img, frame_faces in batches:
+        for face in frame_faces:
+            faces.append(face)
+            crop = face_align.norm_crop(img, landmark=face.kps, image_size=size)
+            crops.append(cv2.cvtColor(crop, cv2.COLOR_BGR2RGB) if bgr else crop)
+    if not crops:
+        return
+
+    embeddings = rec_model.get_feat(crops)
+    for face, embedding in zip(faces, embeddings):
+        face.embedding = embedding.flatten()
+
+
+def warm_up(app: "FaceAnalysis"):
+    """
+    One dummy pass through the detector and the recognition model, so the
+    first real request doesn't pay for ONNX Runtime's lazy initialization.
+    """
+    det_w, det_h = app.det_model.input_size
+    detect_faces(app, np.zeros((det_h, det_w, 3), dtype=np.uint8))
+    rec_model = app.models["recognition"]
+    size = rec_model.input_size[0]
+    rec_model.get_feat([np.zeros((size, size, 3), dtype=np.uint8)])
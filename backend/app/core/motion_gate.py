@@ -0,0 +1,135 @@
+import os
+
+import cv2
+import numpy as np
+
+# Skip detection on frames that haven't changed since the last analyzed one
+MOTION_GATE_ENABLED = os.getenv("MOTION_GATE_ENABLED", "1") == "1"
+# Width of the grayscale thumbnail frames are compared on
+MOTION_SCALE_WIDTH = int(os.getenv("MOTION_SCALE_WIDTH", "160"))
+# Per-pixel difference (0-255) that counts as a change...
+MOTION_PIXEL_THRESHOLD = int(os.getenv("MOTION_PIXEL_THRESHOLD", "25"))
+# ...and the fraction of (region) pixels that must change to run detection
+MOTION_MIN_CHANGED = float(os.getenv("MOTION_MIN_CHANGED", "0.002"))
+# Analyze at least every Nth gated frame anyway, so slow drifts are never missed for long
+MOTION_MAX_SKIP = int(os.getenv("MOTION_MAX_SKIP", "25"))
+
+
+def parse_rois(text: str) -> list:
+    """
+    Regions of interest from "x,y,w,h;x,y,w,h" with every value a fraction
+    of the frame (0-1), so the same regions work at any resolution.
+    Raises ValueError on malformed input.
+    """
+    rois = []
+    for part in filter(None, (p.strip() for p in (text or "").split(";"))):
+        values = [float(v) for v in part.split(",")]
+        if len(values) != 4:
+            raise ValueError(f"ROI needs 4 values x,y,w,h, got {part!r}")
+        x, y, w, h = values
+        if not (0 <= x < 1 and 0 <= y < 1 and 0 < w <= 1 and 0 < h <= 1):
+            raise ValueError(f"ROI values must be fractions of the frame, got {part!r}")
+        rois.append((x, y, w, h))
+    return rois
+
+
+class MotionGate:
+    """
+    Cheap change detector in front of face detection.
+
+    Each frame is shrunk to a MOTION_SCALE_WIDTH-wide, blurred grayscale
+    thumbnail and compared with the thumbnail of the last frame that was
+    analyzed. If fewer than `min_changed` of the pixels (inside the regions
+    of interest, if any) differ by more than `pixel_threshold`, nothing has
+    entered, left or moved, and the caller reuses its previous results
+    instead of running the model.
+
+    Comparing against the last *analyzed* frame (not the previous one) means
+    slow changes still add up and trigger a pass. Every `max_skip`
+    consecutive skips a pass is forced anyway.
+    """
+
+    def __init__(self, enabled: bool = MOTION_GATE_ENABLED, rois: list = None,
+                 scale_width: int = MOTION_SCALE_WIDTH, pixel_threshold: int = MOTION_PIXEL_THRESHOLD,
+                 min_changed: float = MOTION_MIN_CHANGED, max_skip: int = MOTION_MAX_SKIP):
+        self.enabled = enabled
+        self.rois = list(rois or [])
+        self.scale_width = max(16, scale_width)
+        self.pixel_threshold = pixel_threshold
+        self.min_changed = min_changed
+        self.max_skip = max_skip
+        self._reference = None
+        self._mask = None
+        self._run = 0
+
+        self.frames = 0
+        self.analyzed = 0
+        self.skipped = 0
+        self.last_changed = None
+
+    def _thumbnail(self, frame: np.ndarray) -> np.ndarray:
+        height, width = frame.shape[:2]
+        size = (self.scale_width, max(1, round(height * self.scale_width / width)))
+        # Resize first: the colour conversion then runs on a few thousand pixels
+        small = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        # Sensor noise and compression artefacts shouldn't count as motion
+        return cv2.GaussianBlur(small, (5, 5), 0)
+
+    def _roi_mask(self, shape) -> np.ndarray:
+        if not self.rois:
+            return None
+        if self._mask is None or self._mask.shape != shape:
+            height, width = shape
+            mask = np.zeros(shape, dtype=bool)
+            for x, y, w, h in self.rois:
+                mask[int(y * height):int(np.ceil((y + h) * height)), int(x * width):int(np.ceil((x + w) * width))] = True
+            self._mask = mask
+        return self._mask
+
+    def _accept(self, thumbnail) -> bool:
+        self._reference = thumbnail
+        self._run = 0
+        self.analyzed += 1
+        return True
+
+    def should_analyze(self, frame: np.ndarray) -> bool:
+        """True if `frame` needs a detection pass; False to reuse the last results."""
+        self.frames += 1
+        if not self.enabled:
+            self.analyzed += 1
+            return True
+
+        thumbnail = self._thumbnail(frame)
+        if self._reference is None or self._reference.shape != thumbnail.shape or self._run >= self.max_skip:
+            return self._accept(thumbnail)
+
+        changed = cv2.absdiff(thumbnail, self._reference) > self.pixel_threshold
+        mask = self._roi_mask(changed.shape)
+        if mask is not None:
+            changed = changed[mask]
+        self.last_changed = float(changed.mean()) if changed.size else 0.0
+        if self.last_changed >= self.min_changed:
+            return self._accept(thumbnail)
+
+        self._run += 1
+        self.skipped += 1
+        return False
+
+    def reset(self):
+        """Forget the reference frame (e.g. after a seek or a source restart)."""
+        self._reference = None
+        self._mask = None
+        self._run = 0
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "rois": self.rois,
+            "frames": self.frames,
+            "analyzed": self.analyzed,
+            "skipped": self.skipped,
+            "skip_ratio": round(self.skipped / self.frames, 3) if self.frames else 0.0,
+            "last_changed": round(self.last_changed, 5) if self.last_changed is not None else None,
+        }
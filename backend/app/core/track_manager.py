@@ -0,0 +1,134 @@
+import os
+
+import numpy as np
+
+from app.core.box_tracker import iou_matrix, greedy_match
+
+# A settled track re-runs recognition at least this often (in frames)
+TRACK_REFRESH_FRAMES = int(os.getenv("TRACK_REFRESH_FRAMES", "30"))
+# Identities at or above this score are trusted until the next refresh
+TRACK_CONFIDENT_SCORE = float(os.getenv("TRACK_CONFIDENT_SCORE", "0.65"))
+# Best scores at or below this are settled as Unknown until the next refresh
+TRACK_UNKNOWN_SCORE = float(os.getenv("TRACK_UNKNOWN_SCORE", "0.35"))
+# Re-check a track if its detection score falls this far below the one it was recognized at
+TRACK_DET_SCORE_DROP = float(os.getenv("TRACK_DET_SCORE_DROP", "0.15"))
+
+
+class TrackManager:
+    """
+    Per-stream identity cache keyed by face track.
+
+    Every detection pass is associated with the existing tracks by box IoU
+    (same greedy matching as BoxTracker). A track keeps the identity it was
+    last recognized with, and the embedding + gallery search only run again when:
+        - the track is new
+        - its identity is borderline (between TRACK_UNKNOWN_SCORE and TRACK_CONFIDENT_SCORE)
+        - the face's detection score dropped (turned away, occluded, blurred)
+        - TRACK_REFRESH_FRAMES frames have passed since it was last recognized
+
+    So the recognition model is called roughly once per person per refresh
+    window instead of once per person per frame.
+
+    One instance per stream (video file, camera); not thread-safe.
+    """
+
+    def __init__(self, iou_threshold: float = 0.3, refresh_every: int = TRACK_REFRESH_FRAMES,
+                 max_missed: int = 2):
+        self.iou_threshold = iou_threshold
+        self.refresh_every = max(1, refresh_every)
+        # Detection passes a track survives without a matching face (brief misses / blinks)
+        self.max_missed = max_missed
+        self.tracks = []
+        self._next_id = 0
+        self.faces_seen = 0
+        self.recognitions = 0
+
+    def _needs_recognition(self, track: dict, det_score: float, frame_index: int) -> bool:
+        if track["identity"] is None:
+            return True
+        score = track["identity"]["score"]
+        if TRACK_UNKNOWN_SCORE < score < TRACK_CONFIDENT_SCORE:
+            return True
+        if det_score < track["det_score"] - TRACK_DET_SCORE_DROP:
+            return True
+        return frame_index - track["recognized_at"] >= self.refresh_every
+
+    def identify(self, faces: list, frame_index: int, recognize) -> list:
+        """
+        Resolves the identity of every detected face.
+
+        faces       - detected faces with .bbox / .det_score (embedding not needed)
+        recognize   - recognize(faces_subset) -> list of GalleryIndex.match() dicts,
+                      called once with only the faces whose track needs it
+        Returns one dict per face:
+            {"face", "track_id", "name", "person_id", "score", "is_known", "reused"}
+        """
+        assigned, stale = self.associate(faces, frame_index)
+        matches = recognize([faces[i] for i in stale]) if stale else []
+        return self.resolve(faces, assigned, stale, matches, frame_index)
+
+    def associate(self, faces: list, frame_index: int):
+        """
+        First half of `identify`, for callers that batch recognition across
+        several streams: matches faces to tracks and returns (assigned, stale),
+        where `stale` lists the indexes of faces that need recognition.
+        """
+        boxes = np.array([f.bbox for f in faces], dtype=np.float32).reshape(-1, 4)
+        prev = np.array([t["box"] for t in self.tracks], dtype=np.float32).reshape(-1, 4)
+        pairs, missed, new_faces = greedy_match(iou_matrix(prev, boxes), self.iou_threshold)
+
+        assigned = [None] * len(faces)
+        for t_idx, f_idx in pairs:
+            track = self.tracks[t_idx]
+            track["box"] = boxes[f_idx]
+            track["missed"] = 0
+            assigned[f_idx] = track
+
+        tracks = [t for t in assigned if t is not None]
+        for t_idx in missed:
+            track = self.tracks[t_idx]
+            track["missed"] += 1
+            if track["missed"] <= self.max_missed:
+                tracks.append(track)
+
+        for f_idx in new_faces:
+            track = {"track_id": self._next_id, "box": boxes[f_idx], "identity": None,
+                     "recognized_at": frame_index, "det_score": 0.0, "missed": 0}
+            self._next_id += 1
+            assigned[f_idx] = track
+            tracks.append(track)
+        self.tracks = tracks
+
+        stale = [i for i, face in enumerate(faces)
+                 if self._needs_recognition(assigned[i], float(face.det_score), frame_index)]
+        return assigned, stale
+
+    def resolve(self, faces: list, assigned: list, stale: list, matches: list, frame_index: int) -> list:
+        """
+        Second half of `identify`: stores the matches for the stale faces
+        (aligned with `stale`) and returns the per-face results.
+        """
+        for i, match in zip(stale, matches):
+            track = assigned[i]
+            track["identity"] = {k: match[k] for k in ("name", "person_id", "score", "is_known")}
+            track["recognized_at"] = frame_index
+            track["det_score"] = float(faces[i].det_score)
+
+        self.faces_seen += len(faces)
+        self.recognitions += len(stale)
+
+        stale = set(stale)
+        results = []
+        for i, face in enumerate(faces):
+            track = assigned[i]
+            results.append({"face": face, "track_id": track["track_id"], "reused": i not in stale,
+                            **track["identity"]})
+        return results
+
+    def stats(self) -> dict:
+        return {
+            "tracks": len(self.tracks),
+            "faces_seen": self.faces_seen,
+            "recognitions": self.recognitions,
+            "reuse_ratio": round(1 - self.recognitions / self.faces_seen, 3) if self.faces_seen else 0.0,
+        }
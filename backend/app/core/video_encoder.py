@@ -0,0 +1,154 @@
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+
+import cv2
+import numpy as np
+
+# Audio codecs that can be stream-copied into an .mp4 container as-is
+MP4_COPYABLE_AUDIO = {"aac", "mp3", "alac", "ac3", "eac3", "opus", "flac"}
+
+VIDEO_ENCODER_PRESET = os.getenv("VIDEO_ENCODER_PRESET", "veryfast")
+VIDEO_ENCODER_CRF = os.getenv("VIDEO_ENCODER_CRF", "23")
+
+
+def get_ffmpeg_exe():
+    """
+    Bundled ffmpeg from imageio-ffmpeg (already a dependency), else the one on PATH.
+    Returns None if neither is available.
+    """
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception:
+        return shutil.which("ffmpeg")
+
+
+def probe_audio_codec(ffmpeg: str, input_path: str):
+    """
+    Name of the first audio stream's codec in `input_path` (e.g. "aac"), or None.
+    Uses `ffmpeg -i` so we don't depend on a separate ffprobe binary.
+    """
+    try:
+        proc = subprocess.run(
+            [ffmpeg, "-hide_banner", "-i", input_path],
+            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, timeout=30
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    match = re.search(r"Stream #\d+:\d+.*?: Audio: (\w+)", proc.stderr.decode(errors="replace"))
+    return match.group(1) if match else None
+
+
+class FFmpegVideoWriter:
+    """
+    Single-pass encoder: raw BGR frames are piped into one ffmpeg process that
+    writes browser-ready H.264 (yuv420p, faststart) and muxes the original
+    audio track from `audio_source` in the same pass.
+
+    Audio is stream-copied when the codec fits in MP4, otherwise re-encoded
+    to AAC. Nothing is buffered in Python, so memory stays flat on long videos,
+    and no temp files are written next to the output or in the CWD.
+
+    Same write() / release() interface as cv2.VideoWriter.
+    """
+
+    def __init__(self, output_path: str, width: int, height: int, fps: float,
+                 audio_source: str = None, ffmpeg: str = None):
+        self.output_path = output_path
+        self.ffmpeg = ffmpeg or get_ffmpeg_exe()
+        if self.ffmpeg is None:
+            raise RuntimeError("ffmpeg executable not found")
+
+        cmd = [
+            self.ffmpeg, "-hide_banner", "-loglevel", "error", "-y",
+            "-f", "rawvideo", "-pix_fmt", "bgr24", "-s", f"{width}x{height}", "-r", f"{fps}",
+            "-i", "pipe:0",
+        ]
+
+        audio_codec = probe_audio_codec(self.ffmpeg, audio_source) if audio_source else None
+        if audio_codec:
+            cmd += ["-i", audio_source, "-map", "0:v:0", "-map", "1:a:0"]
+            cmd += ["-c:a", "copy"] if audio_codec in MP4_COPYABLE_AUDIO else ["-c:a", "aac", "-b:a", "128k"]
+            cmd += ["-shortest"]
+
+        cmd += [
+            "-c:v", "libx264", "-preset", VIDEO_ENCODER_PRESET, "-crf", VIDEO_ENCODER_CRF,
+            # yuv420p needs even dimensions
+            "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2",
+            "-pix_fmt", "yuv420p", "-movflags", "+faststart",
+            "-f", "mp4", output_path,
+        ]
+
+        # stderr goes to an unnamed temp file so a chatty ffmpeg can never block the pipe
+        self._stderr = tempfile.TemporaryFile()
+        self.proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=self._stderr)
+        self.audio_codec = audio_codec
+
+    def write(self, frame):
+        try:
+            # Decoded frames are already contiguous BGR buffers; hand them over without a copy
+            self.proc.stdin.write(memoryview(np.ascontiguousarray(frame)).cast("B"))
+        except BrokenPipeError:
+            raise RuntimeError(f"ffmpeg exited early: {self._read_stderr()}")
+
+    def release(self):
+        """Closes the pipe and waits for ffmpeg to finish the file."""
+        if self.proc.stdin and not self.proc.stdin.closed:
+            try:
+                self.proc.stdin.close()
+            except BrokenPipeError:
+                pass
+        returncode = self.proc.wait()
+        error = self._read_stderr()
+        self._stderr.close()
+        if returncode != 0:
+            raise RuntimeError(f"ffmpeg failed ({returncode}): {error}")
+
+    def abort(self):
+        """Kills ffmpeg and removes the partial output."""
+        self.proc.kill()
+        self.proc.wait()
+        self._stderr.close()
+        if os.path.exists(self.output_path):
+            os.remove(self.output_path)
+
+    def _read_stderr(self) -> str:
+        self._stderr.seek(0)
+        return self._stderr.read().decode(errors="replace").strip()[-2000:]
+
+
+class OpenCVVideoWriter:
+    """
+    Fallback when no ffmpeg binary is available: silent mp4v via OpenCV.
+    Plays in most desktop players but not in every browser.
+    """
+
+    def __init__(self, output_path: str, width: int, height: int, fps: float):
+        self.output_path = output_path
+        self.writer = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+
+    def write(self, frame):
+        self.writer.write(frame)
+
+    def release(self):
+        self.writer.release()
+
+    def abort(self):
+        self.writer.release()
+        if os.path.exists(self.output_path):
+            os.remove(self.output_path)
+
+
+def open_video_writer(output_path: str, width: int, height: int, fps: float, audio_source: str = None):
+    """
+    Returns an FFmpegVideoWriter (H.264 + original audio), or the OpenCV
+    fallback if ffmpeg is missing.
+    """
+    ffmpeg = get_ffmpeg_exe()
+    if ffmpeg is None:
+        print(" ffmpeg not found. Writing silent mp4v video with OpenCV instead.")
+        return OpenCVVideoWriter(output_path, width, height, fps)
+    return FFmpegVideoWriter(output_path, width, height, fps, audio_source=audio_source, ffmpeg=ffmpeg)
@@ -0,0 +1,257 @@
+import queue
+import threading
+import time
+from collections import deque
+
+_END = object()
+
+
+class StageStats:
+    """
+    Counters for one pipeline stage.
+        busy_sec  - time spent doing the stage's own work
+        wait_sec  - time blocked on an empty input or a full output queue
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.frames = 0
+        self.busy_sec = 0.0
+        self.wait_sec = 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "frames": self.frames,
+            "busy_sec": round(self.busy_sec, 4),
+            "wait_sec": round(self.wait_sec, 4),
+            "fps": round(self.frames / self.busy_sec, 2) if self.busy_sec > 0 else None,
+        }
+
+
+class QueueStats:
+    """Depth samples taken every time a frame is handed to the next stage."""
+
+    def __init__(self, name: str, maxsize: int):
+        self.name = name
+        self.maxsize = maxsize
+        self.samples = 0
+        self.depth_sum = 0
+        self.max_depth = 0
+
+    def sample(self, depth: int):
+        self.samples += 1
+        self.depth_sum += depth
+        self.max_depth = max(self.max_depth, depth)
+
+    def as_dict(self) -> dict:
+        return {
+            "maxsize": self.maxsize,
+            "max_depth": self.max_depth,
+            "avg_depth": round(self.depth_sum / self.samples, 2) if self.samples else 0.0,
+        }
+
+
+class VideoPipeline:
+    """
+    Three-stage frame pipeline for offline video:
+
+        decode thread  --[decoded]-->  inference (caller's thread)  --[annotate]-->  encode thread
+
+    Queues are bounded, so a slow stage applies backpressure instead of
+    buffering the whole video in RAM. Each stage is a single thread reading a
+    FIFO queue, so frame order is preserved end to end.
+
+    After `run()` returns, `stats()` tells which stage was the bottleneck:
+    it is the one with the highest busy_sec, and its input queue is the one
+    that sits near maxsize.
+
+    With `batch_size` > 1 the inference stage also takes whatever is already
+    decoded (up to batch_size frames, never waiting for more) and hands the
+    group to `batch_fn` first, so batched model calls can cover several frames.
+    """
+
+    def __init__(self, queue_size: int = 8, batch_size: int = 1, decode_timer=None):
+        self.batch_size = max(1, batch_size)
+        # Optional histogram (app.core.metrics) fed with every frame's read time
+        self.decode_timer = decode_timer
+        self.decoded = queue.Queue(maxsize=queue_size)
+        self.annotate = queue.Queue(maxsize=queue_size)
+        self.queue_stats = {
+            "decoded": QueueStats("decoded", queue_size),
+            "annotate": QueueStats("annotate", queue_size),
+        }
+        self.stage_stats = {
+            "decode": StageStats("decode"),
+            "inference": StageStats("inference"),
+            "encode": StageStats("encode"),
+        }
+        self.wall_sec = 0.0
+        self._stop = threading.Event()
+        self._error = None
+
+    # --- queue helpers (stop-aware so a failed stage never deadlocks the others) ---
+    def _put(self, q: queue.Queue, item, stats: StageStats, q_stats: QueueStats) -> bool:
+        start = time.perf_counter()
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                q_stats.sample(q.qsize())
+                stats.wait_sec += time.perf_counter() - start
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q: queue.Queue, stats: StageStats):
+        start = time.perf_counter()
+        while not self._stop.is_set():
+            try:
+                item = q.get(timeout=0.1)
+                stats.wait_sec += time.perf_counter() - start
+                return item
+            except queue.Empty:
+                continue
+        return _END
+
+    def _fail(self, exc: BaseException):
+        if self._error is None:
+            self._error = exc
+        self._stop.set()
+
+    # --- stages ---
+    def _decode_loop(self, cap):
+        stats = self.stage_stats["decode"]
+        try:
+            index = 0
+            while not self._stop.is_set():
+                start = time.perf_counter()
+                ret, frame = cap.read()
+                elapsed = time.perf_counter() - start
+                stats.busy_sec += elapsed
+                if self.decode_timer is not None:
+                    self.decode_timer.observe(elapsed)
+                if not ret:
+                    break
+                index += 1
+                stats.frames += 1
+                if not self._put(self.decoded, (index, frame), stats, self.queue_stats["decoded"]):
+                    return
+        except BaseException as e:
+            self._fail(e)
+        finally:
+            # Always unblock the inference stage
+            self._put(self.decoded, _END, stats, self.queue_stats["decoded"])
+
+    def _encode_loop(self, write_fn):
+        stats = self.stage_stats["encode"]
+        try:
+            while True:
+                item = self._get(self.annotate, stats)
+                if item is _END:
+                    return
+                index, frame, result = item
+                start = time.perf_counter()
+                write_fn(index, frame, result)
+                stats.busy_sec += time.perf_counter() - start
+                stats.frames += 1
+        except BaseException as e:
+            self._fail(e)
+
+    def _take_batch(self, first, pending: deque) -> bool:
+        # Grabs frames that are already waiting; returns True if the decoder has finished
+        pending.append(first)
+        while len(pending) < self.batch_size:
+            try:
+                item = self.decoded.get_nowait()
+            except queue.Empty:
+                return False
+            if item is _END:
+                return True
+            pending.append(item)
+        return False
+
+    def run(self, cap, process_fn, write_fn, should_stop=None, batch_fn=None) -> bool:
+        """
+        Drives the pipeline until the capture is exhausted.
+
+        process_fn(index, frame) -> result   runs on the caller's thread, in frame order
+        write_fn(index, frame, result)       runs on the encode thread, in frame order
+        should_stop() -> bool                optional; checked once per frame
+        batch_fn([(index, frame), ...])      optional; called on the caller's thread with
+                                             each group of frames before process_fn sees them
+
+        Returns False if stopped early through `should_stop`. Exceptions raised
+        in any stage are re-raised here after all threads have exited.
+        """
+        wall_start = time.perf_counter()
+        decoder = threading.Thread(target=self._decode_loop, args=(cap,), daemon=True, name="video-decode")
+        encoder = threading.Thread(target=self._encode_loop, args=(write_fn,), daemon=True, name="video-encode")
+        decoder.start()
+        encoder.start()
+
+        stats = self.stage_stats["inference"]
+        completed = True
+        pending = deque()
+        decoder_done = False
+        try:
+            while True:
+                if not pending:
+                    if decoder_done:
+                        break
+                    item = self._get(self.decoded, stats)
+                    if item is _END:
+                        break
+                    if batch_fn is None:
+                        pending.append(item)
+                    else:
+                        decoder_done = self._take_batch(item, pending)
+                        start = time.perf_counter()
+                        batch_fn(list(pending))
+                        stats.busy_sec += time.perf_counter() - start
+
+                if should_stop is not None and should_stop():
+                    completed = False
+                    break
+
+                index, frame = pending.popleft()
+                start = time.perf_counter()
+                result = process_fn(index, frame)
+                stats.busy_sec += time.perf_counter() - start
+                stats.frames += 1
+
+                if not self._put(self.annotate, (index, frame, result), stats, self.queue_stats["annotate"]):
+                    break
+        except BaseException as e:
+            self._fail(e)
+        finally:
+            if not completed:
+                self._stop.set()
+            else:
+                # Let the encoder drain whatever is still queued
+                self._put(self.annotate, _END, stats, self.queue_stats["annotate"])
+            encoder.join()
+            self._stop.set()
+            decoder.join()
+            self.wall_sec = time.perf_counter() - wall_start
+
+        if self._error is not None:
+            raise self._error
+        return completed
+
+    def stats(self) -> dict:
+        stages = {name: s.as_dict() for name, s in self.stage_stats.items()}
+        frames = self.stage_stats["encode"].frames
+        return {
+            "frames": frames,
+            "wall_sec": round(self.wall_sec, 4),
+            "fps": round(frames / self.wall_sec, 2) if self.wall_sec > 0 else None,
+            "stages": stages,
+            "queues": {name: q.as_dict() for name, q in self.queue_stats.items()},
+            "bottleneck": max(self.stage_stats, key=lambda n: self.stage_stats[n].busy_sec),
+        }
+
+    def summary(self) -> str:
+        """One log line: overall fps plus busy time per stage and the bottleneck."""
+        stats = self.stats()
+        stages = " | ".join(f"{name} {st['busy_sec']}s" for name, st in stats["stages"].items())
+        return f"Pipeline: {stats['frames']} frames @ {stats['fps']} fps | {stages} | bottleneck: {stats['bottleneck']}"
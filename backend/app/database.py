@@ -1,6 +1,7 @@
 # backend/app/database.py
 
 import os
+import threading
 from pymongo import MongoClient
 from dotenv import load_dotenv
 
@@ -8,14 +9,55 @@ load_dotenv()
 
 MONGODB_URI = os.getenv("MONGODB_URI")
 
-if not MONGODB_URI:
-    raise RuntimeError("MONGODB_URI not found in environment variables")
+# The client is created on first use, not at import time, so importing the
+# app (tests, worker processes, reloads) never needs a reachable database.
+_client = None
+_client_lock = threading.Lock()
 
-client = MongoClient(MONGODB_URI)
 
-# Database name comes from URI: /facelog_ai
-db = client["facelog_ai"]
+def get_client() -> MongoClient:
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                if not MONGODB_URI:
+                    raise RuntimeError("MONGODB_URI not found in environment variables")
+                _client = MongoClient(MONGODB_URI)
+    return _client
+
+
+def get_db():
+    # Database name comes from URI: /facelog_ai
+    return get_client()["facelog_ai"]
+
+
+class LazyCollection:
+    """Stands in for a pymongo Collection and resolves it on first attribute access."""
+
+    def __init__(self, name: str):
+        self._name = name
+
+    def __getattr__(self, attr):
+        return getattr(get_db()[self._name], attr)
+
+
+class LazyDatabase:
+    """Stands in for the pymongo Database; `db["name"]` returns a LazyCollection."""
+
+    def __getitem__(self, name: str) -> LazyCollection:
+        return LazyCollection(name)
+
+    def __getattr__(self, attr):
+        return getattr(get_db(), attr)
+
+
+db = LazyDatabase()
 
 # Collections (logical structure)
 persons_collection = db["persons"]
 events_collection = db["recognition_events"]
+# Dashboard counters and per-day, per-person visit rollups (see stats_repo)
+counters_collection = db["counters"]
+daily_stats_collection = db["daily_person_stats"]
+# Background video jobs, visible to every API worker process (see jobs_repo)
+video_jobs_collection = db["video_jobs"]
@@ -1,5 +1,7 @@
 import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 
@@ -8,8 +10,30 @@ from app.routes.enrollment import router as enrollment_router
 from app.routes.recognition import router as recognition_router
 from app.routes.analysis import router as analysis_router 
 from app.routes.live import router as live_router
+from app.services.video_jobs import video_job_manager
+from app.services.gallery_cache import gallery_cache
+from app.services.event_sink import event_sink
+from app.services.live_manager import live_manager
+from app.services.warmup import warmup, WARMUP_ON_STARTUP
+from app.core.model_loader import model_pool
+from app.core.metrics import REGISTRY, CONTENT_TYPE, Gauge
 
-app = FastAPI(title="FaceLog-AI")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Model load, dummy inference and gallery sync run in the background;
+    # the server accepts requests right away and /health/ready says when it's warm
+    if WARMUP_ON_STARTUP:
+        warmup.start()
+    yield
+    # Stop running video jobs and tear down the worker pool
+    warmup.stop()
+    video_job_manager.shutdown()
+    live_manager.stop_all()
+    gallery_cache.stop_watcher()
+    # Write any buffered recognition events before the process exits
+    event_sink.stop()
+
+app = FastAPI(title="FaceLog-AI", lifespan=lifespan)
 
 # --- CORS ---
 origins = [
@@ -22,6 +46,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Pagination cursor of /analysis/logs
+    expose_headers=["X-Next-Cursor"],
 )
 
 # --- MOUNT STATIC FILES ---
@@ -43,6 +69,44 @@ app.include_router(recognition_router)
 app.include_router(analysis_router)  
 app.include_router(live_router)
 
+@app.get("/health/ready")
+def health_ready():
+    """
+    Readiness probe: 200 once the model is loaded and warm and the gallery
+    is in memory, 503 (with the same body) until then.
+    """
+    status = warmup.status()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
+@app.get("/health/models")
+def health_models():
+    # Inference pool: instances loaded / idle, ORT threads, checkout wait times
+    return model_pool.stats()
+
+@app.get("/health/events")
+def health_events():
+    # Write-behind event buffer: backlog size, flush timings, failures
+    return event_sink.stats()
+
+# Point-in-time values read at scrape time, next to the stage histograms
+Gauge("facelog_event_sink_backlog", "Recognition event writes waiting for the next flush.",
+      lambda: event_sink.stats()["backlog"])
+Gauge("facelog_model_pool_idle", "Idle model instances in the inference pool.",
+      lambda: model_pool.stats()["idle"])
+Gauge("facelog_live_cameras", "Live cameras currently registered.", lambda: len(live_manager.sessions))
+Gauge("facelog_gallery_size", "Identities in the in-memory gallery.", lambda: len(gallery_cache))
+
+@app.get("/metrics")
+def metrics():
+    """
+    Prometheus text format: per-stage timing histograms of the video, live,
+    enrollment and event-write paths (facelog_stage_seconds), MJPEG traffic
+    and a few gauges. Video stages run in job worker processes and are
+    merged in from their progress reports.
+    """
+    video_job_manager.collect_metrics()
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
 @app.get("/health/db")
 def health_db():
     return {
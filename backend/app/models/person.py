@@ -1,6 +1,8 @@
 from datetime import datetime
 from uuid import uuid4
 
+from app.core.embedding_codec import encode_embedding
+
 
 def normalize_name_from_filename(filename: str) -> str:
   
@@ -19,6 +21,8 @@ def create_person_document(
 ):
     """
     Creates a MongoDB document for a single enrolled person.
+    The embedding is stored as BSON Binary (see embedding_codec), tagged
+    with its dtype and format version.
     """
 
     now = datetime.utcnow()
@@ -29,7 +33,7 @@ def create_person_document(
         "name": normalize_name_from_filename(filename),
         "name_raw": filename,
 
-        "embedding": embedding,  
+        **encode_embedding(embedding),
 
         "face_metadata": {
             "bbox": bbox,             
@@ -1,6 +1,17 @@
 
+import re
+from datetime import datetime
+from typing import Optional
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+from pymongo.errors import BulkWriteError
 from app.database import events_collection
 
+# MongoDB duplicate key error: the document was already written by an earlier attempt
+DUPLICATE_KEY = 11000
+
 def insert_event(event_data: dict):
     """
     Inserts a recognized event into MongoDB.
@@ -8,4 +19,131 @@ def insert_event(event_data: dict):
     try:
         events_collection.insert_one(event_data)
     except Exception as e:
-        print(f"Error saving event: {e}")
\ No newline at end of file
+        print(f"Error saving event: {e}")
+
+
+def insert_events(event_docs: list) -> int:
+    """
+    Inserts many events in one round-trip.
+    Documents carry their own _id, so re-sending a batch after a failure is
+    safe: already-written documents are skipped as duplicates.
+    Returns the number of new documents written.
+    """
+    if not event_docs:
+        return 0
+    try:
+        return len(events_collection.insert_many(event_docs, ordered=False).inserted_ids)
+    except BulkWriteError as e:
+        errors = e.details.get("writeErrors", [])
+        if any(err.get("code") != DUPLICATE_KEY for err in errors):
+            raise
+        return e.details.get("nInserted", 0)
+
+
+# Newest first; _id breaks ties between events written in the same millisecond
+LOG_SORT = [("created_at", DESCENDING), ("_id", DESCENDING)]
+
+# How find_events matches `name`: anywhere in the name, from its start, or the whole name
+NAME_MATCHES = ("contains", "prefix", "exact")
+
+
+def ensure_event_indexes():
+    """
+    Indexes behind the /analysis/logs filters, all ending in the log sort
+    order: a page with no filter, or one equality filter (date, camera_id,
+    exact name), is read in index order with no in-memory sort. Prefix and
+    substring name searches use name_lower too, but sort their matches.
+    Safe to call repeatedly.
+    """
+    events_collection.create_index(LOG_SORT, name="created_at_id")
+    events_collection.create_index([("name_lower", ASCENDING)] + LOG_SORT, name="name_lower_created_at_id")
+    events_collection.create_index([("date", ASCENDING)] + LOG_SORT, name="date_created_at_id")
+    events_collection.create_index([("camera_id", ASCENDING)] + LOG_SORT, name="camera_id_created_at_id")
+
+
+def encode_log_cursor(event: dict) -> str:
+    """Opaque keyset position of an event: its created_at and _id."""
+    return f"{event['created_at'].isoformat()}_{event['_id']}"
+
+
+def decode_log_cursor(cursor: str):
+    try:
+        created_at, event_id = cursor.rsplit("_", 1)
+        return datetime.fromisoformat(created_at), ObjectId(event_id)
+    except (ValueError, InvalidId):
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+
+
+def find_events(name: Optional[str] = None, name_match: str = "contains", date: Optional[str] = None,
+                camera_id: Optional[str] = None, after: Optional[str] = None,
+                limit: Optional[int] = None, batch_size: int = 500):
+    """
+    Events newest first, as a live cursor (documents are fetched from
+    MongoDB in batches of `batch_size` while the caller iterates).
+
+    `name` is matched case-insensitively against name_lower (see NAME_MATCHES):
+        contains - anywhere in the name; scans the name_lower index keys
+        prefix   - from the start; a name_lower index range
+        exact    - the whole name; an index range already in log order
+    contains and prefix sort their matches in memory.
+    `after` is a cursor from encode_log_cursor: only events older than that
+    one are returned (keyset pagination, no skip()).
+    """
+    query = {}
+    if name:
+        key = name.strip().lower()
+        if name_match == "exact":
+            query["name_lower"] = key
+        elif name_match == "prefix":
+            query["name_lower"] = {"$regex": "^" + re.escape(key)}
+        else:
+            query["name_lower"] = {"$regex": re.escape(key)}
+    if date:
+        query["date"] = date
+    if camera_id:
+        query["camera_id"] = camera_id
+    if after:
+        created_at, event_id = decode_log_cursor(after)
+        query["$or"] = [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "_id": {"$lt": event_id}},
+        ]
+
+    cursor = events_collection.find(query).sort(LOG_SORT).batch_size(batch_size)
+    if limit:
+        cursor = cursor.limit(limit)
+    return cursor
+
+
+def backfill_name_lower(batch_size: int = 1000) -> int:
+    """
+    Adds name_lower to events written before it existed, so name searches
+    find them. Runs at start-up (warm-up); a no-op once every event has it.
+    Returns the number of documents updated.
+    """
+    cursor = events_collection.find(
+        {"name_lower": {"$exists": False}, "name": {"$type": "string"}},
+        {"name": 1}
+    ).batch_size(batch_size)
+
+    updated = 0
+    batch = []
+    for doc in cursor:
+        batch.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"name_lower": doc["name"].lower()}}))
+        if len(batch) >= batch_size:
+            updated += events_collection.bulk_write(batch, ordered=False).modified_count
+            batch = []
+    if batch:
+        updated += events_collection.bulk_write(batch, ordered=False).modified_count
+    return updated
+
+
+def update_events(updates: dict) -> int:
+    """
+    Applies {event_id: {field: value}} as $set updates in one bulk_write.
+    Returns the number of documents matched.
+    """
+    if not updates:
+        return 0
+    ops = [UpdateOne({"_id": event_id}, {"$set": fields}) for event_id, fields in updates.items()]
+    return events_collection.bulk_write(ops, ordered=False).matched_count
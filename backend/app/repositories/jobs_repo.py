@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from pymongo import ASCENDING
+
+from app.database import video_jobs_collection
+
+ACTIVE_STATES = ("queued", "running", "cancelling")
+
+
+def insert_job(job_doc: Dict):
+    video_jobs_collection.insert_one({"_id": job_doc["job_id"], **job_doc})
+
+
+def get_job(job_id: str) -> Optional[Dict]:
+    return video_jobs_collection.find_one({"_id": job_id}, {"_id": 0})
+
+
+def update_job(job_id: str, fields: Dict):
+    """Progress update; ignored once the job is finished, so a late save can't overwrite the final state."""
+    video_jobs_collection.update_one({"_id": job_id, "finished_at": None}, {"$set": fields})
+
+
+def finish_job(job_id: str, fields: Dict, retention_sec: float):
+    """Records a job's final state; the document expires `retention_sec` later (TTL index)."""
+    expires_at = datetime.utcnow() + timedelta(seconds=retention_sec)
+    video_jobs_collection.update_one({"_id": job_id}, {"$set": {**fields, "expires_at": expires_at}})
+
+
+def request_cancel(job_id: str) -> bool:
+    """
+    Asks the process running a job to stop it (it polls cancel_requested).
+    Returns False for unknown jobs; finished jobs are left as they are.
+    """
+    result = video_jobs_collection.update_one(
+        {"_id": job_id, "status": {"$in": list(ACTIVE_STATES)}},
+        {"$set": {"cancel_requested": True, "status": "cancelling"}},
+    )
+    return result.matched_count > 0 or get_job(job_id) is not None
+
+
+def find_cancel_requests(job_ids: list) -> list:
+    """Which of these jobs another process asked to cancel."""
+    if not job_ids:
+        return []
+    cursor = video_jobs_collection.find({"_id": {"$in": list(job_ids)}, "cancel_requested": True}, {"_id": 1})
+    return [doc["_id"] for doc in cursor]
+
+
+def find_active_job_ids() -> list:
+    cursor = video_jobs_collection.find({"status": {"$in": list(ACTIVE_STATES)}}, {"_id": 1})
+    return [doc["_id"] for doc in cursor]
+
+
+def ensure_job_indexes():
+    """Finished jobs are removed by MongoDB once expires_at passes. Safe to call repeatedly."""
+    video_jobs_collection.create_index([("expires_at", ASCENDING)], expireAfterSeconds=0)
+    video_jobs_collection.create_index([("status", ASCENDING)])
@@ -1,5 +1,8 @@
-from typing import Dict
+from datetime import datetime
+from typing import Dict, Optional
+from pymongo import UpdateOne, ReturnDocument
 from pymongo.collection import Collection
+from app.core.embedding_codec import EMBEDDING_STORE_DTYPE, encode_embedding, decode_embedding
 from app.database import db
 
 persons_collection: Collection = db["persons"]
@@ -14,6 +17,17 @@ def insert_person(person_doc: Dict) -> Dict:
     }
 
 
+def insert_persons(person_docs: list) -> int:
+    """
+    Bulk version of insert_person for batch enrollment: one unordered
+    insert_many round trip. Returns the number of documents written.
+    """
+    if not person_docs:
+        return 0
+    result = persons_collection.insert_many(person_docs, ordered=False)
+    return len(result.inserted_ids)
+
+
 def get_all_persons() -> list:
     """
     Fetches all active person documents from the database.
@@ -23,6 +37,107 @@ def get_all_persons() -> list:
     # get_all_persons() function is called...
     cursor = persons_collection.find(
         {"status": "active"}, 
-        {"name": 1, "embedding": 1, "person_id": 1, "_id": 0}
+        {"name": 1, "embedding": 1, "embedding_dtype": 1, "person_id": 1, "updated_at": 1, "_id": 0}
     )
     return list(cursor)
+
+
+def get_persons_updated_since(since: Optional[datetime]) -> list:
+    """
+    Fetches every person document (any status) changed at or after `since`,
+    oldest change first. Used by the gallery cache to apply deltas.
+    """
+    query = {} if since is None else {"updated_at": {"$gte": since}}
+    cursor = persons_collection.find(
+        query,
+        {"name": 1, "embedding": 1, "embedding_dtype": 1, "person_id": 1, "status": 1, "updated_at": 1, "_id": 0}
+    ).sort("updated_at", 1)
+    return list(cursor)
+
+
+def get_persons_for_dedup() -> list:
+    """
+    Every active person with its embedding and what is needed to pick which
+    copy of a duplicated identity to keep. Oldest first.
+    """
+    cursor = persons_collection.find(
+        {"status": "active"},
+        {"name": 1, "embedding": 1, "embedding_dtype": 1, "person_id": 1, "created_at": 1,
+         "face_image_path": 1, "samples": 1, "_id": 0}
+    ).sort("created_at", 1)
+    return list(cursor)
+
+
+def get_person(person_id: str) -> Optional[Dict]:
+    return persons_collection.find_one({"person_id": person_id}, {"_id": 0})
+
+
+def update_person_embedding(person_id: str, embedding, samples: int, sample: Dict) -> Optional[Dict]:
+    """
+    Replaces a person's embedding after merging in another enrollment sample,
+    records the sample and bumps updated_at. Only active persons take samples.
+    Returns the updated document, or None if the person isn't active.
+    """
+    return persons_collection.find_one_and_update(
+        {"person_id": person_id, "status": "active"},
+        {
+            "$set": {**encode_embedding(embedding), "samples": samples, "updated_at": datetime.utcnow()},
+            "$push": {"merged_samples": sample},
+        },
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
+    )
+
+
+def mark_duplicates(person_ids: list, keep_id: str) -> int:
+    """
+    Soft-deletes duplicate identities: status "duplicate" plus a pointer to
+    the identity that was kept. Returns the number of documents changed.
+    """
+    result = persons_collection.update_many(
+        {"person_id": {"$in": person_ids}, "status": "active"},
+        {"$set": {"status": "duplicate", "merged_into": keep_id, "updated_at": datetime.utcnow()}}
+    )
+    return result.modified_count
+
+
+def count_active_persons() -> int:
+    return persons_collection.count_documents({"status": "active"})
+
+
+def set_person_status(person_id: str, status: str) -> bool:
+    """
+    Changes a person's status (e.g. "active" -> "inactive") and bumps updated_at
+    so gallery caches pick up the change.
+    """
+    result = persons_collection.update_one(
+        {"person_id": person_id},
+        {"$set": {"status": status, "updated_at": datetime.utcnow()}}
+    )
+    return result.matched_count > 0
+
+
+def migrate_embeddings(dtype: str = None, batch_size: int = 500) -> int:
+    """
+    Re-encodes stored embeddings into the binary format (see embedding_codec).
+    Picks up legacy list embeddings and binary ones stored with another dtype.
+    updated_at is left alone: the vectors don't change, so gallery caches
+    have nothing to reload. Returns the number of documents rewritten.
+    """
+    dtype = dtype or EMBEDDING_STORE_DTYPE
+    cursor = persons_collection.find(
+        {"embedding_dtype": {"$ne": dtype}},
+        {"embedding": 1, "embedding_dtype": 1}
+    ).batch_size(batch_size)
+
+    migrated = 0
+    batch = []
+    for doc in cursor:
+        fields = encode_embedding(decode_embedding(doc), dtype)
+        batch.append(UpdateOne({"_id": doc["_id"]}, {"$set": fields}))
+        if len(batch) >= batch_size:
+            migrated += persons_collection.bulk_write(batch, ordered=False).modified_count
+            batch = []
+    if batch:
+        migrated += persons_collection.bulk_write(batch, ordered=False).modified_count
+    return migrated
@@ -0,0 +1,158 @@
+from datetime import datetime, timedelta
+from typing import Callable, Iterable, Optional
+
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+from pymongo.errors import DuplicateKeyError
+from app.database import counters_collection, daily_stats_collection
+
+# Counter names (documents in the counters collection)
+EVENTS_COUNTER = "events"
+ENROLLED_FACES_COUNTER = "enrolled_faces"
+# Marker document (same collection) set once the daily rollups hold the whole event history
+DAILY_STATS_MARKER = "daily_stats"
+
+
+def get_counter(name: str) -> int:
+    """Current value of a counter (0 if nothing has been counted yet)."""
+    doc = counters_collection.find_one({"_id": name})
+    return doc["value"] if doc is not None else 0
+
+
+def is_seeded(name: str) -> bool:
+    doc = counters_collection.find_one({"_id": name}, {"seeded": 1})
+    return bool(doc and doc.get("seeded"))
+
+
+def increment_counter(name: str, amount: int = 1):
+    # Seeded counters only: until seed_counter has run, its count covers whatever happens now
+    if amount:
+        counters_collection.update_one({"_id": name, "seeded": True}, {"$inc": {"value": amount}})
+
+
+def seed_counter(name: str, count: Callable[[], int]) -> bool:
+    """
+    Sets a counter that was never seeded to `count()` (e.g. a
+    count_documents) and marks it seeded; run once at start-up (warm-up).
+    increment_counter leaves unseeded counters alone, so nothing is counted
+    both by the seed and by an increment. Returns True if it seeded now.
+    """
+    if is_seeded(name):
+        return False
+    counted = count()
+    try:
+        result = counters_collection.update_one(
+            {"_id": name, "seeded": {"$ne": True}},
+            {"$set": {"value": counted, "seeded": True}},
+            upsert=True,
+        )
+    except DuplicateKeyError:
+        # Another process seeded it first
+        return False
+    return result.upserted_id is not None or result.modified_count > 0
+
+
+def reset_counter(name: str, value: int = 0):
+    counters_collection.update_one({"_id": name}, {"$set": {"value": value, "seeded": True}}, upsert=True)
+
+
+def _day(date: str) -> str:
+    # Events carry dd-mm-YYYY; rollups also keep YYYY-MM-DD so days sort and range-query
+    return datetime.strptime(date, "%d-%m-%Y").strftime("%Y-%m-%d")
+
+
+def add_rollup(rollups: dict, date: str, name: str, visits: int, duration_sec: float,
+               first_seen: datetime, last_seen: datetime):
+    """Folds one event (or an extension of one) into {(date, name): delta} for apply_rollups."""
+    delta = rollups.setdefault((date, name), {
+        "visits": 0, "duration_sec": 0.0, "first_seen": None, "last_seen": None
+    })
+    delta["visits"] += visits
+    delta["duration_sec"] += max(0.0, duration_sec)
+    if first_seen is not None:
+        delta["first_seen"] = first_seen if delta["first_seen"] is None else min(delta["first_seen"], first_seen)
+    if last_seen is not None:
+        delta["last_seen"] = last_seen if delta["last_seen"] is None else max(delta["last_seen"], last_seen)
+
+
+def apply_rollups(rollups: dict) -> int:
+    """
+    Adds per-day, per-person deltas in one bulk_write of upserts:
+        {(date, name): {"visits", "duration_sec", "first_seen", "last_seen"}}
+    visits and duration are $inc'ed, first / last seen kept with $min / $max.
+    Returns the number of rollup documents touched.
+    """
+    ops = []
+    for (date, name), delta in rollups.items():
+        update = {
+            "$inc": {"visits": delta["visits"], "total_duration_sec": delta["duration_sec"]},
+            "$setOnInsert": {"date": date, "day": _day(date), "name": name, "name_lower": name.lower()},
+        }
+        if delta["first_seen"] is not None:
+            update["$min"] = {"first_seen": delta["first_seen"]}
+        if delta["last_seen"] is not None:
+            update["$max"] = {"last_seen": delta["last_seen"]}
+        ops.append(UpdateOne({"_id": f"{date}|{name}"}, update, upsert=True))
+    if not ops:
+        return 0
+    daily_stats_collection.bulk_write(ops, ordered=False)
+    return len(ops)
+
+
+def seed_daily_stats(events: Iterable[dict]) -> bool:
+    """
+    Rebuilds the rollups from the whole event history, once (start-up, like
+    seed_counter): existing rollup documents are overwritten, not added to.
+    `events` yields event documents. Until the DAILY_STATS_MARKER is set,
+    the event sink doesn't write rollups (see EventSink._write_stats).
+    Returns True if it seeded now.
+    """
+    if is_seeded(DAILY_STATS_MARKER):
+        return False
+    rollups = {}
+    for event in events:
+        if not {"name", "date", "created_at"} <= event.keys():
+            continue
+        start = event.get("start_seconds_raw", 0.0)
+        duration = max(0.0, event.get("end_seconds_raw", start) - start)
+        first_seen = event.get("first_seen", event["created_at"])
+        add_rollup(rollups, event["date"], event["name"], 1, duration,
+                   first_seen, first_seen + timedelta(seconds=duration))
+
+    ops = [
+        UpdateOne({"_id": f"{date}|{name}"}, {"$set": {
+            "date": date, "day": _day(date), "name": name, "name_lower": name.lower(),
+            "visits": delta["visits"], "total_duration_sec": delta["duration_sec"],
+            "first_seen": delta["first_seen"], "last_seen": delta["last_seen"],
+        }}, upsert=True)
+        for (date, name), delta in rollups.items()
+    ]
+    for i in range(0, len(ops), 1000):
+        daily_stats_collection.bulk_write(ops[i:i + 1000], ordered=False)
+    counters_collection.update_one({"_id": DAILY_STATS_MARKER},
+                                   {"$set": {"value": len(ops), "seeded": True}}, upsert=True)
+    return True
+
+
+def ensure_stats_indexes():
+    daily_stats_collection.create_index([("day", DESCENDING), ("total_duration_sec", DESCENDING)])
+    daily_stats_collection.create_index([("name_lower", ASCENDING), ("day", DESCENDING)])
+
+
+def find_daily_stats(date: Optional[str] = None, name: Optional[str] = None, limit: int = 500) -> list:
+    """
+    Rollups newest day first, longest total time first within a day.
+    `date` is dd-mm-YYYY like the event logs; `name` matches exactly (any case).
+    """
+    query = {}
+    if date:
+        query["day"] = _day(date)
+    if name:
+        query["name_lower"] = name.strip().lower()
+    cursor = daily_stats_collection.find(query, {"_id": 0}).sort(
+        [("day", DESCENDING), ("total_duration_sec", DESCENDING)]
+    ).limit(limit)
+    return list(cursor)
+
+
+def clear_daily_stats() -> int:
+    return daily_stats_collection.delete_many({}).deleted_count
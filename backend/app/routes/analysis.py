@@ -1,29 +1,45 @@
 import os
+import json
 import shutil
 from typing import Optional
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
 from app.database import persons_collection, events_collection
+from app.repositories.events_repo import NAME_MATCHES, find_events, encode_log_cursor
+from app.repositories.stats_repo import (
+    EVENTS_COUNTER, ENROLLED_FACES_COUNTER, reset_counter, clear_daily_stats
+)
+from app.services.stats_service import dashboard_stats, daily_stats, stats_cache
+from app.services.gallery_cache import gallery_cache
+from app.services.dedup_service import DEDUP_THRESHOLD, find_duplicate_clusters, deduplicate
 
 router = APIRouter(prefix="/analysis", tags=["Analysis"])
 
+# Rows per /logs page when no limit is given, and the most a page may ask for
+LOGS_PAGE_LIMIT = int(os.getenv("LOGS_PAGE_LIMIT", "1000"))
+LOGS_MAX_LIMIT = int(os.getenv("LOGS_MAX_LIMIT", "10000"))
+
 # ---  DASHBOARD STATS ---
 @router.get("/stats")
 def get_stats():
     """
     Returns high-level counts for the dashboard cards.
+    Read from maintained counters (not counted per request) and cached for a few seconds.
     """
-    total_users = persons_collection.count_documents({"status": "active"})
-    total_events = events_collection.count_documents({})
-    
-    # Get total active faces (files on disk)
-    faces_dir = "data/enrolled_faces"
-    total_files = len(os.listdir(faces_dir)) if os.path.exists(faces_dir) else 0
+    return dashboard_stats()
 
-    return {
-        "total_users": total_users,
-        "total_events": total_events,
-        "storage_count": total_files
-    }
+@router.get("/daily_stats")
+def get_daily_stats(date: Optional[str] = None, name: Optional[str] = None, limit: int = 500):
+    """
+    Per-person totals per day: visits, total_duration_sec, first_seen, last_seen.
+    Kept up to date as events are written, so nothing is summed from raw logs.
+    Usage: /analysis/daily_stats?date=22-01-2026 or ?name=Abdul Khan
+    """
+    try:
+        return daily_stats(date, name, max(1, min(limit, LOGS_MAX_LIMIT)))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="date must be DD-MM-YYYY")
 
 # --- GALLERY DATA ---
 @router.get("/persons")
@@ -41,25 +57,72 @@ def get_enrolled_persons():
 
 
 @router.get("/logs")
-def get_logs(name: Optional[str] = None, date: Optional[str] = None):
+def get_logs(name: Optional[str] = None, date: Optional[str] = None,
+             match: str = "contains", camera_id: Optional[str] = None,
+             cursor: Optional[str] = None, limit: Optional[int] = None,
+             format: str = "json"):
     """
-    Fetches logs with optional filtering (Querying).
+    Fetches logs with optional filtering (Querying), newest first.
     Usage: /analysis/logs?name=Abdul&date=22-01-2026
+
+    - name matches case-insensitively anywhere in the name; match=prefix from
+      its start, match=exact the whole name (both faster on a large log)
+    - one page of at most `limit` rows; when there are more, the X-Next-Cursor
+      response header holds the `cursor` value for the next page
+    - format=ndjson streams every matching row (or `limit` rows) as it is read
     """
-    query = {}
-    
-    # Filter by Name
-    if name:
-        query["name"] = {"$regex": name, "$options": "i"}
-        
-    # Filter by Date 
-    if date:
-        query["date"] = date
-
-    # Sort by newest first
-    cursor = events_collection.find(query, {"_id": 0}).sort("created_at", -1)
-    
-    return list(cursor)
+    if match not in NAME_MATCHES:
+        raise HTTPException(status_code=400, detail=f"match must be one of {', '.join(NAME_MATCHES)}")
+    if format not in ("json", "ndjson"):
+        raise HTTPException(status_code=400, detail="format must be 'json' or 'ndjson'")
+    if limit is not None and limit < 1:
+        raise HTTPException(status_code=400, detail="limit must be positive")
+
+    def query(row_limit):
+        try:
+            return find_events(name=name, name_match=match, date=date, camera_id=camera_id,
+                               after=cursor, limit=row_limit)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    if format == "ndjson":
+        rows = query(limit)
+
+        def generate_lines():
+            for row in rows:
+                row.pop("_id")
+                yield json.dumps(jsonable_encoder(row)) + "\n"
+
+        return StreamingResponse(generate_lines(), media_type="application/x-ndjson")
+
+    page_size = min(limit or LOGS_PAGE_LIMIT, LOGS_MAX_LIMIT)
+    # One extra row tells whether there is a next page
+    rows = list(query(page_size + 1))
+    headers = {}
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        headers["X-Next-Cursor"] = encode_log_cursor(rows[-1])
+    for row in rows:
+        row.pop("_id")
+
+    return JSONResponse(content=jsonable_encoder(rows), headers=headers)
+
+# --- DUPLICATE IDENTITIES ---
+@router.get("/duplicates")
+def get_duplicates(threshold: float = DEDUP_THRESHOLD):
+    """
+    Clusters of enrolled persons that look like the same face.
+    Report only; nothing is changed. Usage: /analysis/duplicates?threshold=0.8
+    """
+    return find_duplicate_clusters(threshold)
+
+@router.post("/deduplicate")
+def run_deduplicate(threshold: float = DEDUP_THRESHOLD, apply: bool = False):
+    """
+    Same clusters as /duplicates. With apply=true every duplicate is
+    soft-deleted (status "duplicate") and the oldest enrollment is kept.
+    """
+    return deduplicate(threshold, apply=apply)
 
 # ---  DANGER ZONE (Cleanup) ---
 @router.delete("/reset_logs")
@@ -68,6 +131,9 @@ def reset_logs():
     Deletes logs ONLY. Keeps enrolled faces intact.
     """
     result = events_collection.delete_many({})
+    clear_daily_stats()
+    reset_counter(EVENTS_COUNTER)
+    stats_cache.clear()
     return {"status": "success", "deleted_events": result.deleted_count}
 
 @router.delete("/nuke_system")
@@ -79,6 +145,11 @@ def nuke_system():
     #  Clear Database
     persons_collection.delete_many({})
     events_collection.delete_many({})
+    clear_daily_stats()
+    reset_counter(EVENTS_COUNTER)
+    reset_counter(ENROLLED_FACES_COUNTER)
+    gallery_cache.clear()
+    stats_cache.clear()
 
     #  Clear Physical Files (Enrolled Faces)
     faces_dir = "data/enrolled_faces"
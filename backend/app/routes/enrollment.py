@@ -3,22 +3,21 @@ import os
 import shutil
 import tempfile
 import zipfile
+import json
 import base64
 import cv2
 import numpy as np
 
-from fastapi import APIRouter, UploadFile, File, HTTPException, Body
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, UploadFile, File, HTTPException, Body, Depends, Query
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 
-from app.services.recognition_service import recognition_service
-from app.services.enrollment_service import EnrollmentService
-from app.routes.live import refresh_live_cache
+from app.services.enrollment_service import EnrollmentService, get_enrollment_service
+from app.services.bulk_enrollment import BulkEnrollment
+from app.services.dedup_service import DEDUP_ON_ENROLL, DUPLICATE_POLICIES
 
 router = APIRouter(prefix="/enroll", tags=["Enrollment"])
 
-enrollment_service = EnrollmentService()
-
 ALLOWED_IMAGE_EXTS = (".jpg", ".jpeg", ".png")
 
 # --- Request Models ---
@@ -29,10 +28,21 @@ class WebcamEnrollRequest(BaseModel):
 def _is_allowed_image(filename: str) -> bool:
     return filename.lower().endswith(ALLOWED_IMAGE_EXTS)
 
+def _duplicate_policy(on_duplicate: str = Query(DEDUP_ON_ENROLL)) -> str:
+    """What to do with faces that are already enrolled: allow | merge | reject."""
+    if on_duplicate not in DUPLICATE_POLICIES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"on_duplicate must be one of: {', '.join(DUPLICATE_POLICIES)}"
+        )
+    return on_duplicate
+
 # --- Existing Endpoints ---
 
 @router.post("/image")
-def enroll_single_image(file: UploadFile = File(...)):
+def enroll_single_image(file: UploadFile = File(...),
+                        on_duplicate: str = Depends(_duplicate_policy),
+                        enrollment_service: EnrollmentService = Depends(get_enrollment_service)):
     filename = file.filename
     if not _is_allowed_image(filename):
         raise HTTPException(
@@ -45,12 +55,11 @@ def enroll_single_image(file: UploadFile = File(...)):
         tmp_path = tmp.name
     
     try:
-        results = enrollment_service.enroll_single_image(image_path=tmp_path,original_name=filename)
-        # Refresh recognition cache if successful
+        results = enrollment_service.enroll_single_image(image_path=tmp_path,original_name=filename,
+                                                         on_duplicate=on_duplicate)
+        # The shared gallery cache was already updated incrementally by the service
         if any(r.get("status") == "enrolled" for r in results):
-            print(" New person enrolled via Image. Refreshing system caches...")
-            recognition_service.load_known_faces()
-            refresh_live_cache()
+            print(" New person enrolled via Image. Gallery updated in place.")
         return JSONResponse(content=results)
 
     finally:
@@ -59,56 +68,93 @@ def enroll_single_image(file: UploadFile = File(...)):
 
 
 @router.post("/folder")
-def enroll_folder(file: UploadFile = File(...)):
+def enroll_folder(file: UploadFile = File(...),
+                  on_duplicate: str = Depends(_duplicate_policy),
+                  enrollment_service: EnrollmentService = Depends(get_enrollment_service)):
     if not file.filename.lower().endswith(".zip"):
         raise HTTPException(
             status_code=400,
             detail="Please upload a ZIP file containing images."
         )
 
-    temp_dir = tempfile.mkdtemp()
+    if not zipfile.is_zipfile(file.file):
+        raise HTTPException(status_code=400, detail="Uploaded file is not a valid ZIP archive.")
 
-    try:
-        zip_path = os.path.join(temp_dir, file.filename)
+    # Members are read straight from the uploaded archive, nothing is extracted
+    pipeline = BulkEnrollment(enrollment_service.faces_storage_dir, on_duplicate=on_duplicate)
+    results = []
+    summary = {}
+    for line in pipeline.run(file.file):
+        if line["type"] == "summary":
+            summary = line
+        else:
+            results.extend(line["results"])
 
-        with open(zip_path, "wb") as f:
-            shutil.copyfileobj(file.file, f)
+    total = len(results)
+    enrolled = sum(1 for r in results if r.get("status") == "enrolled")
+    merged = sum(1 for r in results if r.get("status") == "merged")
 
-        with zipfile.ZipFile(zip_path, "r") as zip_ref:
-            zip_ref.extractall(temp_dir)
-        
-        results = enrollment_service.enroll_folder(temp_dir)
-        
-        total = len(results)
-        enrolled = sum(1 for r in results if r.get("status") == "enrolled")
-        
-        # Refresh recognition cache if any were enrolled
-        if enrolled > 0:
-            print(" New people enrolled via Folder. Refreshing system caches...")
-            recognition_service.load_known_faces()
-            refresh_live_cache()
-            
-        failed = total - enrolled
-
-        status = "success" if failed == 0 else ("failed" if enrolled == 0 else "partial_success")
-
-        response = {
-            "status": status,
-            "total_images": total,
-            "enrolled": enrolled,
-            "failed": failed,
-            "results": results
-        }
-
-        return JSONResponse(content=response)
+    if enrolled > 0:
+        print(f" {enrolled} new faces enrolled via Folder. Gallery updated in place.")
 
-    finally:
-        shutil.rmtree(temp_dir, ignore_errors=True)
+    failed = total - enrolled - merged
+
+    status = "success" if failed == 0 else ("failed" if enrolled + merged == 0 else "partial_success")
+
+    response = {
+        "status": status,
+        "total_images": total,
+        "enrolled": enrolled,
+        "merged": merged,
+        "failed": failed,
+        "results": results,
+        "timings": summary.get("timings"),
+        "images_per_sec": summary.get("images_per_sec")
+    }
+
+    return JSONResponse(content=response)
+
+
+@router.post("/folder/stream")
+def enroll_folder_stream(file: UploadFile = File(...),
+                         on_duplicate: str = Depends(_duplicate_policy),
+                         enrollment_service: EnrollmentService = Depends(get_enrollment_service)):
+    """
+    Same as /folder for large archives: newline-delimited JSON, one line per
+    image as soon as it is enrolled (or rejected), then a summary line.
+    """
+    if not file.filename.lower().endswith(".zip"):
+        raise HTTPException(
+            status_code=400,
+            detail="Please upload a ZIP file containing images."
+        )
+
+    # The upload may be closed once this handler returns; stream from a private copy
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".zip") as tmp:
+        shutil.copyfileobj(file.file, tmp)
+        zip_path = tmp.name
+
+    if not zipfile.is_zipfile(zip_path):
+        os.remove(zip_path)
+        raise HTTPException(status_code=400, detail="Uploaded file is not a valid ZIP archive.")
+
+    pipeline = BulkEnrollment(enrollment_service.faces_storage_dir, on_duplicate=on_duplicate)
+
+    def generate_lines():
+        try:
+            for line in pipeline.run(zip_path):
+                yield json.dumps(line) + "\n"
+        finally:
+            os.remove(zip_path)
+
+    return StreamingResponse(generate_lines(), media_type="application/x-ndjson")
 
 # --- NEW: Webcam Enrollment Endpoint ---
 
 @router.post("/webcam")
-async def enroll_from_webcam(payload: WebcamEnrollRequest):
+async def enroll_from_webcam(payload: WebcamEnrollRequest,
+                             on_duplicate: str = Depends(_duplicate_policy),
+                             enrollment_service: EnrollmentService = Depends(get_enrollment_service)):
     """
     Receives a base64 encoded image from the webcam,
     decodes it, and processes it for enrollment.
@@ -129,13 +175,11 @@ async def enroll_from_webcam(payload: WebcamEnrollRequest):
         # 4. Process using our universal service
         # We use the provided name or a default 'webcam_capture' as filename
         source_name = f"{payload.name}.jpg" if payload.name else "webcam_capture.jpg"
-        results = enrollment_service.process_frame_to_embedding(frame, source_name)
+        results = enrollment_service.process_frame_to_embedding(frame, source_name, on_duplicate=on_duplicate)
 
-        # 5. Refresh recognition cache if successful
+        # 5. The shared gallery cache was already updated incrementally by the service
         if any(r.get("status") == "enrolled" for r in results):
-            print(" New person enrolled via Webcam. Refreshing system caches...")
-            recognition_service.load_known_faces()
-            refresh_live_cache()
+            print(" New person enrolled via Webcam. Gallery updated in place.")
 
         return JSONResponse(content=results)
 
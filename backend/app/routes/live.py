@@ -1,129 +1,81 @@
-import cv2
-import time
-import numpy as np
-from fastapi import APIRouter
-from app.services.camera_stream import CameraStream
-from app.core.model_loader import model_loader, model_lock
-from app.services.live_event_tracker import LiveEventTracker
-from app.repositories.persons_repo import get_all_persons
+from fastapi import APIRouter, HTTPException
+from app.core.model_loader import model_loader
+from app.core.metrics import MJPEG_BYTES, MJPEG_FRAMES
+from app.core.motion_gate import parse_rois
+from app.services.gallery_cache import gallery_cache
+from app.services.live_manager import live_manager, DEFAULT_CAMERA_ID
 from fastapi.responses import StreamingResponse
 
 router = APIRouter(prefix="/live", tags=["Live Stream"])
 
-camera = None
-tracker = None
-known_faces_cache = []
-
 def refresh_live_cache():
     """
-    Public function to reload faces from DB. 
-    Called by enrollment.py when a new face is added.
+    Public function to bring the shared gallery up to date with the DB.
+    Only documents changed since the last sync are read.
     """
-    global known_faces_cache
-    persons = get_all_persons()
-    
-    new_cache = []
-    for p in persons:
-        new_cache.append({
-            "name": p["name"],
-            "embedding": np.array(p["embedding"], dtype=np.float32)
-        })
-    
-    known_faces_cache = new_cache
-    print(f" Live Stream Cache Refreshed: {len(known_faces_cache)} faces loaded.")
+    gallery_cache.sync()
+    print(f" Live Stream Cache Refreshed: {len(gallery_cache)} faces loaded (v{gallery_cache.version}).")
 
 @router.get("/start")
-def start_stream(source: str = "0"): 
-    global camera, tracker
-    
-   
+def start_stream(source: str = "0", camera_id: str = DEFAULT_CAMERA_ID, priority: int = 0, roi: str = None): 
+    """
+    Starts (or re-prioritizes) one live camera. Several cameras can run at
+    once under different camera_ids; they all share the one loaded model.
+    `roi` limits the camera's motion gate to regions "x,y,w,h;..." given as
+    fractions of the frame.
+    """
+    try:
+        rois = parse_rois(roi) if roi is not None else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     _ = model_loader.get_model()
     
   
     refresh_live_cache()
     
- 
-    cam_src = 0 if source == "0" else source
-    if camera is None or not camera.running:
-        camera = CameraStream(source=cam_src)
-        camera.start()
-    
-   
-    tracker = LiveEventTracker(time_threshold=5.0)
+    # Local device indexes come in as "0", "1", ...; anything else is a URL / file path
+    cam_src = int(source) if source.isdigit() else source
+    try:
+        live_manager.start(camera_id, cam_src, priority=priority, rois=rois)
+    except RuntimeError as e:
+        raise HTTPException(status_code=429, detail=str(e))
     
-    return {"status": "started", "source": source}
+    return {"status": "started", "source": source, "camera_id": camera_id}
 
 @router.get("/stop")
-def stop_stream():
-    global camera
-    if camera:
-        camera.stop()
-        camera = None
-    return {"status": "stopped"}
-
-def generate_frames():
-    global camera, tracker, known_faces_cache
-    
-    app = model_loader.get_model() 
-    
-    while camera and camera.running:
-        frame = camera.read()
-        if frame is None:
-            continue
-
-        img_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        
-        with model_lock:
-            faces = app.get(img_rgb)
-         
-        
-        for face in faces:
-            embedding = face.embedding
-            norm = np.linalg.norm(embedding)
-            if norm == 0: continue
-            embedding = embedding / norm
-
-            max_score = 0
-            best_match_name = "Unknown"
-
-            for known in known_faces_cache:
-                score = np.dot(embedding, known["embedding"])
-                if score > max_score:
-                    max_score = score
-                    best_match_name = known["name"]
-
-            # Threshold
-            if max_score > 0.60:
-                # 2. Update Tracker (Real-time DB update)
-                tracker.update(best_match_name)
-                
-                # Draw Green Box
-                box = face.bbox.astype(int)
-                cv2.rectangle(frame, (box[0], box[1]), (box[2], box[3]), (0, 255, 0), 2)
-                label = f"{best_match_name} ({int(max_score * 100)}%)"
-                cv2.putText(frame, label, (box[0], box[1] - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
-            else:
-                # Draw Red Box (Unknown)
-                box = face.bbox.astype(int)
-                cv2.rectangle(frame, (box[0], box[1]), (box[2], box[3]), (0, 0, 255), 2)
-                label = f"Unknown ({int(max_score * 100)}%)"
-                cv2.putText(frame, label, (box[0], box[1] - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 255), 2)
+def stop_stream(camera_id: str = DEFAULT_CAMERA_ID):
+    live_manager.stop(camera_id)
+    return {"status": "stopped", "camera_id": camera_id}
 
-        # 3. Check for people who left (Timeouts)
-        tracker.check_for_timeouts()
+@router.get("/cameras")
+def list_cameras():
+    """
+    Running cameras with per-camera capture / processed fps, latency and skipped frames.
+    """
+    return {"cameras": live_manager.stats()}
 
-        # --- ENCODE TO JPEG FOR BROWSER ---
-        ret, buffer = cv2.imencode('.jpg', frame)
-        frame_bytes = buffer.tobytes()
-        
+async def generate_frames(session):
+    """
+    MJPEG stream of one camera's annotated frames.
+    Recognition and JPEG encoding happen once in the shared scheduler; every
+    viewer just reads the latest encoded frame, skipping any it was too slow for.
+    Async, so a viewer waits on the event loop instead of holding one of the
+    threadpool workers the sync endpoints run on.
+    """
+    async for frame_bytes in session.broadcast.stream():
+        MJPEG_FRAMES.inc(camera_id=session.camera_id)
+        MJPEG_BYTES.inc(len(frame_bytes), camera_id=session.camera_id)
         # Yield the frame in MJPEG format
         yield (b'--frame\r\n'
                b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
 
 @router.get("/video_feed")
-def video_feed():
+def video_feed(camera_id: str = DEFAULT_CAMERA_ID):
     """
     The frontend <img> tag will point here:
     <img src="http://localhost:8000/live/video_feed" />
     """
-    return StreamingResponse(generate_frames(), media_type="multipart/x-mixed-replace; boundary=frame")
\ No newline at end of file
+    session = live_manager.get(camera_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail=f"Camera '{camera_id}' is not running")
+    return StreamingResponse(generate_frames(session), media_type="multipart/x-mixed-replace; boundary=frame")
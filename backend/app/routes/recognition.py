@@ -6,20 +6,27 @@ import time
 from fastapi import APIRouter, UploadFile, File, HTTPException
 from fastapi.responses import JSONResponse
 # from app.services.recognition_service import RecognitionService
-from app.services.recognition_service import recognition_service
-
-from fastapi.responses import FileResponse
+from app.services.video_jobs import video_job_manager
+from app.core.motion_gate import parse_rois
 
 router = APIRouter(prefix="/recognize", tags=["Recognition"])
 
 # recognition_service = RecognitionService()
 
 @router.post("/video")
-def recognize_video(file: UploadFile = File(...)):
+def recognize_video(file: UploadFile = File(...), roi: str = None):
+    """
+    `roi` (optional): regions the motion gate watches, "x,y,w,h;..." as
+    fractions of the frame. Changes outside them don't trigger detection.
+    """
     # print("Inside recognition.py in models folder in backend 1")
     # Validation
     if not file.filename.lower().endswith((".mp4", ".avi", ".mov")):
         raise HTTPException(400, "Invalid video format. Please upload MP4, AVI, or MOV.")
+    try:
+        motion_rois = parse_rois(roi)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
     # print("Inside recognition.py in models folder in backend 2")
 
     # Save Uploaded File to Temp
@@ -45,59 +52,70 @@ def recognize_video(file: UploadFile = File(...)):
 
     # print("finally video will be saved at this path:", output_path)
 
-    try:
-        print(f" Starting video processing: {output_filename}")
-        
-        # print("Inside recognition.py in models folder in backend before sending the video to backend for actual processing...")
-
-        result_path = recognition_service.process_video(input_path, output_path)
-
-        # print("Inside recognition.py in models folder in backend after receiving the response that was processed in backend ...")
-
-        if result_path is None:
-            #  print("there is nothing in result_path so we did not get proper result")
-             return JSONResponse({
-                "status": "aborted",
-                "message": "Processing was stopped by the user."
-            })
-
+    # Hand the video to the background job engine; the request returns immediately
+    job_id = video_job_manager.submit(input_path, output_path, output_filename, motion_rois=motion_rois)
+    print(f" Queued video processing job {job_id}: {output_filename}")
+
+    base_url = os.getenv("BACKEND_URL")
+    return JSONResponse({
+        "status": "queued",
+        "job_id": job_id,
+        "status_url": f"{base_url}/recognize/jobs/{job_id}"
+    }, status_code=202)
+
+
+@router.get("/jobs/{job_id}")
+def get_video_job(job_id: str):
+    """
+    Poll this after POST /recognize/video.
+    Reports progress (frames done, fps, ETA) and, once completed, the video URL and event count.
+    """
+    job = video_job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(404, "Job not found")
+
+    if job["status"] == "completed":
         base_url = os.getenv("BACKEND_URL")
-        # print("this is the backend url i took from .env file before creating video_url variable...")
-        # video_url = f"{base_url}/static/processed/{output_filename}"
-        video_url = f"{base_url}/recognize/video/{output_filename}"
-        # print("Inside recognition.py in models folder after creating video_url variable ")
+        job["message"] = "Video processed successfully"
+        job["video_url"] = f"{base_url}/recognize/video/{job['output_filename']}"
+    elif job["status"] == "cancelled":
+        # Same shape the old synchronous "aborted" response had
+        job["message"] = "Processing was stopped by the user."
+    elif job["status"] == "failed":
+        job["message"] = f"Video processing failed: {job['error']}"
 
+    return JSONResponse(job)
 
 
-        # print("Inside recognition.py in models folder Before sending response to frontend")
-        return JSONResponse({
-            "status": "completed",
-            "message": "Video processed successfully",
-            "video_url": video_url
-        })
+@router.post("/jobs/{job_id}/cancel")
+def cancel_video_job(job_id: str):
+    if not video_job_manager.cancel(job_id):
+        raise HTTPException(404, "Job not found")
+    return JSONResponse(video_job_manager.get(job_id))
 
-    except Exception as e:
-        print(f" Error processing video: {e}")
-        raise HTTPException(500, f"Video processing failed: {str(e)}")
 
-    finally:
-    
-        if os.path.exists(input_path):
-            # print("Inside recognition.py in models folder in finally block about to remove temporary files created...")
-            os.remove(input_path)
-            print(f" Cleaned up temp file: {input_path}")
+@router.post("/stop")
+def stop_all_jobs():
+    """
+    Cancels every queued or running video job.
+    """
+    cancelled = video_job_manager.active_jobs()
+    for job_id in cancelled:
+        video_job_manager.cancel(job_id)
+    return JSONResponse({"status": "stopping", "jobs": cancelled})
 
-from fastapi.responses import StreamingResponse
+from app.core.file_response import MediaFileResponse
 
 @router.get("/video/{filename}")
 def serve_video(filename: str):
-    file_path = os.path.join("data", "processed", filename)
+    """
+    Streams a processed video. Supports Range requests (206) so players can
+    seek, and ETag / Last-Modified revalidation (304).
+    """
+    file_path = os.path.join("data", "processed", os.path.basename(filename))
 
-    if not os.path.exists(file_path):
+    if not os.path.isfile(file_path):
         raise HTTPException(404, "Video not found")
 
-    def iterfile():
-        with open(file_path, "rb") as f:
-            yield from f
-
-    return StreamingResponse(iterfile(), media_type="video/mp4")
\ No newline at end of file
+    # Revalidate on every use: a job may write a new file under the same name
+    return MediaFileResponse(file_path, media_type="video/mp4", headers={"cache-control": "no-cache"})
\ No newline at end of file
@@ -0,0 +1,319 @@
+import os
+import threading
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional
+from uuid import uuid4
+
+import cv2
+import numpy as np
+
+from app.core.metrics import stage_timers
+from app.core.model_loader import CPU_COUNT, model_pool, prepare_detection_inputs, detect_scaled, embed_face_batches
+from app.models.person import create_person_document
+from app.repositories.persons_repo import insert_persons
+from app.repositories.stats_repo import ENROLLED_FACES_COUNTER, increment_counter
+from app.core.gallery_index import stack_face_embeddings
+from app.services.dedup_service import DEDUP_ON_ENROLL, DEDUP_THRESHOLD, check_policy, find_enrolled
+from app.services.enrollment_service import check_face_quality, crop_face, merge_result
+from app.services.gallery_cache import gallery_cache
+
+ALLOWED_IMAGE_EXTS = (".jpg", ".jpeg", ".png")
+
+# Threads decoding ZIP members (cv2.imdecode releases the GIL)
+ENROLL_DECODE_WORKERS = int(os.getenv("ENROLL_DECODE_WORKERS", "0")) or min(8, CPU_COUNT)
+# Images per detector pass / per model checkout
+ENROLL_BATCH_SIZE = int(os.getenv("ENROLL_BATCH_SIZE", "16"))
+# Person documents per insert_many
+ENROLL_INSERT_BATCH = int(os.getenv("ENROLL_INSERT_BATCH", "256"))
+
+# Same stages as the summary timings, as /metrics histograms
+_timers = stage_timers("enroll_bulk", ("read", "decode", "inference", "crop_write", "db_write"))
+_TIMER_OF = {"read_sec": "read", "decode_sec": "decode", "inference_sec": "inference",
+             "crop_write_sec": "crop_write", "insert_sec": "db_write"}
+
+
+def _decode(data: bytes) -> Optional[np.ndarray]:
+    image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None or image.size == 0:
+        return None
+    return image
+
+
+class _Item:
+    """One image from the archive on its way through the pipeline."""
+
+    def __init__(self, filename: str, folder_name: Optional[str]):
+        self.filename = filename
+        self.folder_name = folder_name
+        self.results = []
+        # Person docs (with their crop writes) waiting for the next bulk insert
+        self.pending = []
+
+
+class BulkEnrollment:
+    """
+    Enrolls every image of a ZIP archive without extracting it.
+
+        read member -> decode (thread pool) -> detect + embed (batched,
+        one model checkout per batch) -> crop write (thread pool)
+        -> insert_many -> gallery update
+
+    run() is a generator: it yields one result per image as soon as that
+    image's documents are in the database (or it has failed), then a final
+    summary with per-stage timings. The number of decoded images held in
+    memory is bounded, so archive size doesn't matter.
+    """
+
+    def __init__(self, faces_storage_dir: str = "data/enrolled_faces",
+                 decode_workers: int = ENROLL_DECODE_WORKERS,
+                 batch_size: int = ENROLL_BATCH_SIZE,
+                 insert_batch: int = ENROLL_INSERT_BATCH,
+                 on_duplicate: str = DEDUP_ON_ENROLL):
+        self.faces_storage_dir = faces_storage_dir
+        self.decode_workers = max(1, decode_workers)
+        self.batch_size = max(1, batch_size)
+        self.insert_batch = max(1, insert_batch)
+        # allow | merge | reject, see dedup_service
+        self.on_duplicate = check_policy(on_duplicate)
+        os.makedirs(self.faces_storage_dir, exist_ok=True)
+
+    @staticmethod
+    def _members(zf: zipfile.ZipFile):
+        # Same layout rules as the old extract-then-walk: top level and one folder deep
+        for info in zf.infolist():
+            if info.is_dir():
+                continue
+            parts = info.filename.split("/")
+            if len(parts) > 2 or parts[-1].startswith(".") or parts[0] == "__MACOSX":
+                continue
+            yield info, parts[-1], (parts[0] if len(parts) == 2 else None)
+
+    def run(self, zip_file) -> Iterator[Dict]:
+        """`zip_file` is a path or a seekable binary file object."""
+        timings = {"read_sec": 0.0, "decode_sec": 0.0, "inference_sec": 0.0,
+                   "crop_write_sec": 0.0, "insert_sec": 0.0}
+        counts = {"total_images": 0, "enrolled_files": 0, "failed_files": 0,
+                  "faces_enrolled": 0, "faces_merged": 0, "faces_rejected": 0}
+        started = time.perf_counter()
+        timings_lock = threading.Lock()
+
+        def timed(name, fn, *args):
+            start = time.perf_counter()
+            result = fn(*args)
+            elapsed = time.perf_counter() - start
+            _timers[_TIMER_OF[name]].observe(elapsed)
+            with timings_lock:
+                timings[name] += elapsed
+            return result
+
+        def finish(item: _Item) -> Dict:
+            enrolled = sum(1 for r in item.results if r.get("status") == "enrolled")
+            merged = sum(1 for r in item.results if r.get("status") == "merged")
+            counts["faces_enrolled"] += enrolled
+            counts["faces_merged"] += merged
+            counts["faces_rejected"] += len(item.results) - enrolled - merged
+            counts["enrolled_files" if enrolled or merged else "failed_files"] += 1
+            status = "enrolled" if enrolled else ("merged" if merged else "failed")
+            return {"type": "file", "filename": item.filename, "status": status,
+                    "enrolled": enrolled, "merged": merged, "results": item.results}
+
+        waiting_insert: List[_Item] = []
+        crop_writes = []
+        pending_docs = 0
+        # (embedding, person doc, crop write) enrolled in this archive but not inserted yet:
+        # the gallery can't see them, so later images are also checked against these
+        unflushed = []
+
+        def find_unflushed(embedding: np.ndarray):
+            if not unflushed:
+                return None, None
+            scores = np.stack([row for row, _, _ in unflushed]) @ embedding
+            best = int(np.argmax(scores))
+            _, doc, crop_write = unflushed[best]
+            # A doc whose crop failed is never inserted (see flush_inserts)
+            if scores[best] < DEDUP_THRESHOLD or not crop_write.result():
+                return None, None
+            return doc, {"person_id": doc["person_id"], "name": doc["name"], "score": round(float(scores[best]), 4)}
+
+        def flush_inserts():
+            nonlocal pending_docs
+            docs = []
+            for item in waiting_insert:
+                for doc, crop_write, result in item.pending:
+                    if crop_write.result():
+                        docs.append(doc)
+                        item.results.append(result)
+                    else:
+                        item.results.append({"filename": item.filename, "status": "failed",
+                                             "reason": "Could not save face crop"})
+                item.pending = []
+            timed("insert_sec", insert_persons, docs)
+            # Incremental insert into the shared gallery: no reload / ANN retrain needed
+            for doc in docs:
+                gallery_cache.add(doc)
+            done = [finish(item) for item in waiting_insert]
+            waiting_insert.clear()
+            unflushed.clear()
+            pending_docs = 0
+            return done
+
+        def process(batch: List[tuple]):
+            nonlocal pending_docs
+            images = [image for _, image in batch]
+            start = time.perf_counter()
+            inputs = prepare_detection_inputs(images, "enroll")
+            with model_pool.checkout() as app:
+                detections = detect_scaled(app, inputs, "enroll")
+                # Reject bad faces before paying for ArcFace on them
+                keep = []
+                for (item, _), faces in zip(batch, detections):
+                    good = []
+                    for face in faces:
+                        failure = check_face_quality(face, item.filename)
+                        if failure is None:
+                            good.append(face)
+                        else:
+                            item.results.append(failure)
+                    keep.append(good)
+                embed_face_batches(app, [(image, faces) for image, faces in zip(images, keep) if faces], bgr=True)
+            elapsed = time.perf_counter() - start
+            _timers["inference"].observe(elapsed)
+            with timings_lock:
+                timings["inference_sec"] += elapsed
+
+            # One gallery search for every face of the batch
+            _, embeddings = stack_face_embeddings([face for faces in keep for face in faces])
+            duplicates = iter(find_enrolled(embeddings))
+            embeddings_iter = iter(embeddings)
+
+            ready = []
+            for (item, image), faces, detected in zip(batch, keep, detections):
+                if not detected:
+                    item.results.append({"filename": item.filename, "status": "failed", "reason": "No face detected"})
+                kept = {id(face) for face in faces}
+                for face_index, face in enumerate(detected):
+                    if id(face) not in kept or not np.any(face.embedding):
+                        continue
+                    embedding = next(embeddings_iter)
+                    duplicate_of = next(duplicates)
+                    pending_doc, pending_match = find_unflushed(embedding)
+                    if pending_match is not None and (duplicate_of is None or pending_match["score"] > duplicate_of["score"]):
+                        duplicate_of = pending_match
+                    else:
+                        pending_doc = None
+                    if duplicate_of is not None and self.on_duplicate == "reject":
+                        item.results.append({"filename": item.filename, "face_index": face_index, "status": "failed",
+                                             "reason": "Already enrolled", "duplicate_of": duplicate_of})
+                        continue
+
+                    face_crop, (x, y, w, h) = crop_face(image, face)
+                    crop_filename = f"{uuid4()}.jpg"
+                    static_url = f"/static/enrolled_faces/{crop_filename}"
+                    crop_write = writers.submit(timed, "crop_write_sec", cv2.imwrite, os.path.join(self.faces_storage_dir, crop_filename), face_crop)
+                    crop_writes.append(crop_write)
+
+                    if duplicate_of is not None and self.on_duplicate == "merge":
+                        if not crop_write.result():
+                            item.results.append({"filename": item.filename, "face_index": face_index, "status": "failed",
+                                                 "reason": "Could not save face crop", "duplicate_of": duplicate_of})
+                        else:
+                            item.results.append(merge_result(item.filename, face_index, face, embedding,
+                                                             duplicate_of, static_url, pending_doc))
+                        continue
+
+                    person_doc = create_person_document(
+                        embedding=embedding,
+                        filename=item.filename,
+                        bbox=[x, y, w, h],
+                        confidence=float(face.det_score),
+                        folder_name=item.folder_name
+                    )
+                    person_doc["face_image_path"] = static_url
+                    unflushed.append((embedding, person_doc, crop_write))
+                    item.pending.append((person_doc, crop_write, {
+                        "filename": item.filename,
+                        "face_index": face_index,
+                        "status": "enrolled",
+                        "person_id": person_doc["person_id"],
+                        "confidence": float(face.det_score),
+                        "face_image": static_url,
+                        "duplicate_of": duplicate_of
+                    }))
+                if item.pending:
+                    waiting_insert.append(item)
+                    pending_docs += len(item.pending)
+                else:
+                    ready.append(finish(item))
+            if pending_docs >= self.insert_batch:
+                ready.extend(flush_inserts())
+            return ready
+
+        # Bounds the decoded images alive at once
+        window = self.batch_size * 2 + self.decode_workers
+        try:
+            with zipfile.ZipFile(zip_file, "r") as zf, \
+                    ThreadPoolExecutor(self.decode_workers, thread_name_prefix="enroll-decode") as decoders, \
+                    ThreadPoolExecutor(2, thread_name_prefix="enroll-crops") as writers:
+                decoding = deque()
+                batch = []
+                members = self._members(zf)
+                exhausted = False
+
+                while True:
+                    while not exhausted and len(decoding) < window:
+                        entry = next(members, None)
+                        if entry is None:
+                            exhausted = True
+                            break
+                        info, filename, folder_name = entry
+                        if filename.lower().endswith(".zip"):
+                            continue
+                        counts["total_images"] += 1
+                        item = _Item(filename, folder_name)
+                        if not filename.lower().endswith(ALLOWED_IMAGE_EXTS):
+                            item.results.append({"filename": filename, "status": "failed", "reason": "Unsupported format"})
+                            yield finish(item)
+                            continue
+                        data = timed("read_sec", zf.read, info)
+                        decoding.append((item, decoders.submit(timed, "decode_sec", _decode, data)))
+
+                    if not decoding:
+                        break
+
+                    # Results come back in archive order; the pool keeps decoding ahead
+                    item, future = decoding.popleft()
+                    image = future.result()
+                    if image is None:
+                        item.results.append({"filename": item.filename, "status": "failed", "reason": "Unreadable image"})
+                        yield finish(item)
+                    else:
+                        batch.append((item, image))
+
+                    if len(batch) >= self.batch_size or (batch and not decoding and exhausted):
+                        yield from process(batch)
+                        batch = []
+
+                if batch:
+                    yield from process(batch)
+                yield from flush_inserts()
+        finally:
+            # An error or a client that stops reading mid-archive: documents whose
+            # crops are already written still get inserted (executors are shut down,
+            # so every crop write has finished)
+            if waiting_insert:
+                flush_inserts()
+            increment_counter(ENROLLED_FACES_COUNTER, sum(1 for write in crop_writes if write.result()))
+
+        elapsed = time.perf_counter() - started
+        images = counts["total_images"]
+        yield {
+            "type": "summary",
+            **counts,
+            "elapsed_sec": round(elapsed, 3),
+            "images_per_sec": round(images / elapsed, 2) if elapsed > 0 else None,
+            # Decode and crop times are summed over their worker threads
+            "timings": {name: round(sec, 3) for name, sec in timings.items()},
+        }
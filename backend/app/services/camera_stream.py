@@ -1,62 +1,146 @@
+import os
 import cv2
 import threading
 import time
 
+# Most frames a live source may skip per read when its buffer is behind
+CAMERA_MAX_DRAIN = int(os.getenv("CAMERA_MAX_DRAIN", "10"))
+
 class CameraStream:
-    def __init__(self, source=0):
+    """
+    Captures a camera / stream / video file on a background thread and hands
+    out the latest frame.
+
+    - Every frame gets a sequence number (`frame_count`), and consumers can
+      block on a condition variable until a newer one arrives (`wait_for_frame`)
+      instead of polling.
+    - Live sources are read as fast as they deliver. If grab() returns
+      instantly the driver had frames queued, so we keep grabbing (without
+      decoding) until we reach the live edge, then decode only that frame.
+    - Video files have no live edge; they are paced at their own fps.
+    - Published frames are read-only and handed out without copying.
+      Callers that need to draw on one must copy it first (`read()` does).
+    """
+
+    def __init__(self, source=0, on_frame=None):
         self.source = source
         self.cap = cv2.VideoCapture(self.source)
         self.lock = threading.Lock()
+        self.new_frame = threading.Condition(self.lock)
         self.running = False
         self.current_frame = None
         self.thread = None
+        # Sequence number of the latest frame, so consumers can tell a new frame from a re-read
+        self.frame_count = 0
+        self.frame_time = None
+        # Frames the driver had buffered that were skipped to stay on the live edge
+        self.drained = 0
+        # Optional callback after each new frame (e.g. to wake a scheduler)
+        self.on_frame = on_frame
+        self.is_file = isinstance(source, str) and os.path.isfile(source)
 
     def start(self):
         if self.running:
-            return 
-        
+            return
+
         if not self.cap.isOpened():
             self.cap = cv2.VideoCapture(self.source)
+        if not self.is_file:
+            # Honoured by some backends (V4L2, GStreamer); draining covers the rest
+            self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
 
         self.running = True
         self.thread = threading.Thread(target=self._update, daemon=True)
         self.thread.start()
         print(f" Camera started on source: {self.source}")
 
+    def _grab_latest(self, fast_sec: float) -> bool:
+        start = time.perf_counter()
+        if not self.cap.grab():
+            return False
+        drained = 0
+        # An instant grab means the frame was already queued, i.e. stale
+        while time.perf_counter() - start < fast_sec and drained < CAMERA_MAX_DRAIN:
+            start = time.perf_counter()
+            if not self.cap.grab():
+                break
+            drained += 1
+        self.drained += drained
+        return True
+
     def _update(self):
-       
-        
-        target_fps = 8
-        sleep_time = 1.0 / target_fps
+        fps = self.cap.get(cv2.CAP_PROP_FPS) or 25
+        if fps <= 0 or fps > 240:
+            fps = 25
+        interval = 1.0 / fps
+        next_due = time.monotonic()
 
         while self.running:
-            ret, frame = self.cap.read()
-            
+            if self.is_file:
+                # Play files in real time instead of racing through them
+                delay = next_due - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                next_due = max(next_due + interval, time.monotonic() - interval)
+                ret, frame = self.cap.read()
+            else:
+                ret = self._grab_latest(fast_sec=interval / 4)
+                frame = self.cap.retrieve()[1] if ret else None
+                ret = frame is not None
+
             if ret:
-                with self.lock:
+                frame.flags.writeable = False
+                with self.new_frame:
                     self.current_frame = frame
+                    self.frame_count += 1
+                    self.frame_time = time.monotonic()
+                    self.new_frame.notify_all()
+                if self.on_frame is not None:
+                    self.on_frame()
             else:
                 print("📷 Camera disconnected or stream ended.")
                 self.running = False
                 break
-           
-            time.sleep(sleep_time)
+
+        with self.new_frame:
+            self.new_frame.notify_all()
+        if self.on_frame is not None:
+            self.on_frame()
 
     def read(self):
+        """Writable copy of the latest frame, or None before the first capture."""
         with self.lock:
-    
+
             return self.current_frame.copy() if self.current_frame is not None else None
 
-   
+    def read_latest(self):
+        """
+        Latest frame with its sequence number and monotonic capture time:
+        (frame, frame_count, frame_time). No copy: the frame is read-only.
+        frame is None until the first capture.
+        """
+        with self.lock:
+            return self.current_frame, self.frame_count, self.frame_time
+
+    def wait_for_frame(self, after: int, timeout: float = 1.0):
+        """
+        Blocks until a frame newer than sequence number `after` exists (or the
+        camera stops / timeout), then returns read_latest().
+        """
+        with self.new_frame:
+            self.new_frame.wait_for(lambda: self.frame_count > after or not self.running, timeout)
+            return self.current_frame, self.frame_count, self.frame_time
+
+
     def stop(self):
         """Stops the camera thread and releases resources."""
         self.running = False
-        if self.thread.is_alive():
-            self.thread.join() 
-        
-   
+        if self.thread is not None and self.thread.is_alive():
+            self.thread.join()
+
+
         if self.cap and self.cap.isOpened():
-            self.cap.release() 
+            self.cap.release()
             print("📷 Camera Released Successfully.")
-        
-        self.cap = None
\ No newline at end of file
+
+        self.cap = None
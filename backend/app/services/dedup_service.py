@@ -0,0 +1,190 @@
+import os
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.core.embedding_codec import decode_embedding, decode_embedding_matrix, encode_embedding
+from app.core.gallery_index import l2_normalize
+from app.repositories.persons_repo import (
+    get_persons_for_dedup, get_person, update_person_embedding, mark_duplicates
+)
+from app.services.gallery_cache import gallery_cache
+
+# Cosine similarity at which two enrollments are treated as the same person.
+# Stricter than MATCH_THRESHOLD: a false merge loses an identity.
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.75"))
+# What enrollment does with a face that is already enrolled: allow | merge | reject
+DEDUP_ON_ENROLL = os.getenv("DEDUP_ON_ENROLL", "allow")
+# Tile side of the offline similarity scan (block x block float32 scores in memory)
+DEDUP_BLOCK_SIZE = int(os.getenv("DEDUP_BLOCK_SIZE", "2048"))
+
+DUPLICATE_POLICIES = ("allow", "merge", "reject")
+
+
+def check_policy(on_duplicate: str) -> str:
+    if on_duplicate not in DUPLICATE_POLICIES:
+        raise ValueError(f"on_duplicate must be one of {DUPLICATE_POLICIES}, got {on_duplicate!r}")
+    return on_duplicate
+
+
+# --- enroll time ---
+
+def find_enrolled(embeddings: np.ndarray, threshold: float = DEDUP_THRESHOLD) -> List[Optional[Dict]]:
+    """
+    Looks up already-enrolled identities for a batch of normalized embeddings
+    with one gallery search. Returns, per row, {"person_id", "name", "score"}
+    of the closest identity scoring above `threshold`, or None.
+    """
+    if len(embeddings) == 0:
+        return []
+    matches = gallery_cache.index.match(embeddings, threshold=threshold)
+    return [
+        {"person_id": m["person_id"], "name": m["name"], "score": round(m["score"], 4)}
+        if m["is_known"] else None
+        for m in matches
+    ]
+
+
+def merge_sample(person_id: str, embedding: np.ndarray, sample: Dict) -> Optional[Dict]:
+    """
+    Folds a new enrollment of an existing person into that person instead of
+    creating a second identity: the stored embedding becomes the running mean
+    of every sample (re-normalized). Returns the updated document, or None if
+    the person no longer exists or is no longer active (e.g. marked duplicate).
+    """
+    person = get_person(person_id)
+    if person is None or person.get("status") != "active":
+        return None
+    samples = person.get("samples", 1)
+    mean = decode_embedding(person) * samples + embedding
+    merged = update_person_embedding(
+        person_id, l2_normalize(mean)[0], samples + 1, {**sample, "added_at": datetime.utcnow()}
+    )
+    if merged is not None:
+        gallery_cache.replace(merged)
+    return merged
+
+
+def merge_into_document(person_doc: Dict, embedding: np.ndarray, sample: Dict) -> Dict:
+    """
+    Same as merge_sample for a person document that is not in the database
+    yet (enrolled earlier in the same ZIP, waiting for its bulk insert).
+    """
+    samples = person_doc.get("samples", 1)
+    mean = decode_embedding(person_doc) * samples + embedding
+    person_doc.update(encode_embedding(l2_normalize(mean)[0]))
+    person_doc["samples"] = samples + 1
+    person_doc.setdefault("merged_samples", []).append({**sample, "added_at": datetime.utcnow()})
+    return person_doc
+
+
+# --- offline scan ---
+
+class _UnionFind:
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+
+    def find(self, i: int) -> int:
+        root = i
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[i] != root:
+            self.parent[i], i = root, self.parent[i]
+        return root
+
+    def union(self, a: int, b: int):
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            # Keep the lower index (older document) as the root
+            self.parent[max(ra, rb)] = min(ra, rb)
+
+
+def _similar_pairs(embeddings: np.ndarray, threshold: float, block_size: int):
+    """
+    Yields (rows, cols, scores) for every pair i < j with similarity >= threshold.
+    The upper triangle is scored in block x block tiles, one matrix multiply
+    each, so memory stays bounded by the tile whatever the gallery size.
+    """
+    n = len(embeddings)
+    for row_start in range(0, n, block_size):
+        row_block = embeddings[row_start:row_start + block_size]
+        for col_start in range(row_start, n, block_size):
+            sims = row_block @ embeddings[col_start:col_start + block_size].T
+            rows, cols = np.nonzero(sims >= threshold)
+            if col_start == row_start:
+                # Diagonal tile: keep i < j only
+                upper = cols > rows
+                rows, cols = rows[upper], cols[upper]
+            yield rows + row_start, cols + col_start, sims[rows, cols]
+
+
+def find_duplicate_clusters(threshold: float = DEDUP_THRESHOLD, block_size: int = DEDUP_BLOCK_SIZE) -> Dict:
+    """
+    Groups active persons whose embeddings are at least `threshold` similar
+    (transitively) into clusters. In each cluster the oldest enrollment is the
+    one to keep; the others are reported as duplicates of it.
+    """
+    persons = get_persons_for_dedup()
+    if len(persons) < 2:
+        return {"threshold": threshold, "persons_scanned": len(persons), "clusters": [], "duplicates": 0}
+
+    embeddings = l2_normalize(decode_embedding_matrix(persons))
+    groups = _UnionFind(len(persons))
+    best_score = {}
+    for rows, cols, scores in _similar_pairs(embeddings, threshold, max(1, block_size)):
+        for i, j, score in zip(rows.tolist(), cols.tolist(), scores.tolist()):
+            groups.union(i, j)
+            best_score[j] = max(best_score.get(j, 0.0), score)
+
+    members = {}
+    for i in range(len(persons)):
+        members.setdefault(groups.find(i), []).append(i)
+
+    def summary(person):
+        return {"person_id": person["person_id"], "name": person["name"],
+                "face_image": person.get("face_image_path"), "created_at": person.get("created_at")}
+
+    clusters = []
+    for root, rows in members.items():
+        if len(rows) < 2:
+            continue
+        keep = embeddings[root]
+        clusters.append({
+            "keep": summary(persons[root]),
+            "duplicates": [
+                {**summary(persons[i]), "score": round(float(embeddings[i] @ keep), 4),
+                 "best_pair_score": round(best_score.get(i, 0.0), 4)}
+                for i in rows if i != root
+            ],
+        })
+    clusters.sort(key=lambda c: len(c["duplicates"]), reverse=True)
+
+    return {
+        "threshold": threshold,
+        "persons_scanned": len(persons),
+        "clusters": clusters,
+        "duplicates": sum(len(c["duplicates"]) for c in clusters),
+    }
+
+
+def deduplicate(threshold: float = DEDUP_THRESHOLD, apply: bool = False,
+                block_size: int = DEDUP_BLOCK_SIZE) -> Dict:
+    """
+    Runs find_duplicate_clusters and, with apply=True, soft-deletes every
+    duplicate (status "duplicate", merged_into = the kept person_id).
+    Nothing is physically removed, so a wrong merge can be undone by setting
+    the status back to "active".
+    """
+    report = find_duplicate_clusters(threshold, block_size)
+    report["applied"] = apply
+    report["deactivated"] = 0
+    if not apply:
+        return report
+
+    for cluster in report["clusters"]:
+        ids = [d["person_id"] for d in cluster["duplicates"]]
+        report["deactivated"] += mark_duplicates(ids, cluster["keep"]["person_id"])
+        for person_id in ids:
+            gallery_cache.remove(person_id)
+    return report
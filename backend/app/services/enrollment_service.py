@@ -4,12 +4,20 @@ import cv2
 import numpy as np
 from typing import List, Dict, Optional
 from uuid import uuid4 
-import time
+import threading
 
-from app.core.model_loader import model_loader, model_lock
+from app.core.model_loader import model_pool, prepare_detection_inputs, detect_scaled, embed_faces
+from app.core.logging_utils import RateLimitedLogger
+from app.core.metrics import stage_timers
 
 from app.models.person import create_person_document
 from app.repositories.persons_repo import insert_person
+from app.repositories.stats_repo import ENROLLED_FACES_COUNTER, increment_counter
+from app.services.gallery_cache import gallery_cache
+from app.services.dedup_service import DEDUP_ON_ENROLL, check_policy, find_enrolled, merge_sample, merge_into_document
+
+_timers = stage_timers("enroll", ("det_prepare", "detect", "embed", "match", "crop_write", "db_write"))
+_log = RateLimitedLogger("enroll")
 
 
 class EnrollmentService:
@@ -19,8 +27,9 @@ class EnrollmentService:
     """
 
     def __init__(self):
-        # Using the standard model 
-        self.app = model_loader.get_model()
+        # Using the standard model, borrowed from the shared pool per image
+        self.models = model_pool
+        self.models.primary()
         # Prepare permanent storage directory
         self.faces_storage_dir = "data/enrolled_faces"
         os.makedirs(self.faces_storage_dir, exist_ok=True)
@@ -49,7 +58,8 @@ class EnrollmentService:
 
         return results
 
-    def enroll_single_image(self, image_path: str,original_name: str = None, folder_name: str = None) -> List[Dict]:
+    def enroll_single_image(self, image_path: str,original_name: str = None, folder_name: str = None,
+                            on_duplicate: str = DEDUP_ON_ENROLL) -> List[Dict]:
         """Reads image from disk and passes to the core processor."""
         if original_name:
             filename = original_name
@@ -59,7 +69,7 @@ class EnrollmentService:
         image = cv2.imread(image_path)
         if image is None or image.size == 0:
             return [{"filename": filename, "status": "failed", "reason": "Unreadable image"}]
-        return self.process_frame_to_embedding(image, filename, folder_name)
+        return self.process_frame_to_embedding(image, filename, folder_name, on_duplicate)
 
     def enroll_from_url(self, camera_url: str, person_name: str) -> List[Dict]:
         """
@@ -83,62 +93,77 @@ class EnrollmentService:
         finally:
             cap.release()
 
-    def process_frame_to_embedding(self, frame: np.ndarray, source_name: str, folder_name: Optional[str] = None) -> List[Dict]:
+    def process_frame_to_embedding(self, frame: np.ndarray, source_name: str, folder_name: Optional[str] = None,
+                                   on_duplicate: str = DEDUP_ON_ENROLL) -> List[Dict]:
         """
         CORE PROCESSOR: The "Universal Brain" of enrollment.
+        `on_duplicate` decides what happens to a face that is already enrolled:
+        allow (enroll anyway, flagged), merge (into the existing person) or reject.
         """
-        image_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        with model_lock:
-            faces = self.app.get(image_rgb)
+        check_policy(on_duplicate)
+        with _timers["det_prepare"].time():
+            inputs = prepare_detection_inputs([frame], "enroll")
+        with self.models.checkout() as app:
+            # Detector at DET_SIZE_ENROLL + one batched ArcFace call on full-resolution crops
+            with _timers["detect"].time():
+                faces = detect_scaled(app, inputs, "enroll")[0]
+            # Reject bad faces before paying for ArcFace on them
+            failures = {i: check_face_quality(face, source_name) for i, face in enumerate(faces)}
+            with _timers["embed"].time():
+                embed_faces(app, frame, [face for i, face in enumerate(faces) if failures[i] is None], bgr=True)
         
-        length = len(faces)
-        if length == 0:
-            print("no face in this frame...")
         if not faces:
+            _log.info("enroll_no_face", source=source_name)
             return [{"filename": source_name, "status": "failed", "reason": "No face detected"}]
         # print("control will not go further bcoz it was returned above...")
         results = []
         for face_index, face in enumerate(faces):
-            box = face.bbox.astype(int)
-            x1, y1, x2, y2 = box
-            w, h = x2 - x1, y2 - y1
-
-            # Quality checks
-            if w < 40 or h < 40:
-                results.append({"filename": source_name, "status": "failed", "reason": "Face too small"})
-                continue
-            if face.det_score < 0.60:
-                results.append({"filename": source_name, "status": "failed", "reason": "Low confidence", "confidence": float(face.det_score)})
+            if failures[face_index] is not None:
+                results.append(failures[face_index])
                 continue
 
             embedding = face.embedding
             norm = np.linalg.norm(embedding)
             if norm == 0: continue
-            embedding_list = (embedding / norm).tolist()
+            embedding = embedding / norm
+
+            with _timers["match"].time():
+                duplicate_of = find_enrolled(embedding[None, :])[0]
+            if duplicate_of is not None and on_duplicate == "reject":
+                results.append({"filename": source_name, "face_index": face_index, "status": "failed",
+                                 "reason": "Already enrolled", "duplicate_of": duplicate_of})
+                continue
 
             # Prepare Face Crop
-            img_h, img_w, _ = frame.shape
-            pad_x, pad_y = int(w * 0.1), int(h * 0.1)
-            crop_x1, crop_y1 = max(0, x1 - pad_x), max(0, y1 - pad_y)
-            crop_x2, crop_y2 = min(img_w, x2 + pad_x), min(img_h, y2 + pad_y)
-            face_crop = frame[crop_y1:crop_y2, crop_x1:crop_x2]
+            face_crop, (x1, y1, w, h) = crop_face(frame, face)
             
             crop_filename = f"{uuid4()}.jpg"
             crop_path = os.path.join(self.faces_storage_dir, crop_filename)
-            cv2.imwrite(crop_path, face_crop)
+            with _timers["crop_write"].time():
+                saved = cv2.imwrite(crop_path, face_crop)
+            if saved:
+                increment_counter(ENROLLED_FACES_COUNTER)
 
             static_url = f"/static/enrolled_faces/{crop_filename}"
 
+            if duplicate_of is not None and on_duplicate == "merge":
+                results.append(merge_result(source_name, face_index, face, embedding, duplicate_of, static_url))
+                continue
+
             # Create & Insert DB Document
             person_doc = create_person_document(
-                embedding=embedding_list,
+                embedding=embedding,
                 filename=source_name,
                 bbox=[int(x1), int(y1), int(w), int(h)],
                 confidence=float(face.det_score),
                 folder_name=folder_name
             )
             person_doc["face_image_path"] = static_url
-            db_result = insert_person(person_doc)
+            with _timers["db_write"].time():
+                db_result = insert_person(person_doc)
+
+            # Incremental insert into the shared gallery: no reload / ANN retrain needed
+            gallery_cache.add(person_doc)
 
             results.append({
                 "filename": source_name,
@@ -146,7 +171,66 @@ class EnrollmentService:
                 "status": "enrolled",
                 "person_id": db_result["person_id"],
                 "confidence": float(face.det_score),
-                "face_image": static_url  
+                "face_image": static_url,
+                "duplicate_of": duplicate_of
             })
         return results
 
+
+def check_face_quality(face, source_name: str) -> Optional[Dict]:
+    """The failure result for a face that is too small or too uncertain to enroll, else None."""
+    x1, y1, x2, y2 = face.bbox.astype(int)
+    if x2 - x1 < 40 or y2 - y1 < 40:
+        return {"filename": source_name, "status": "failed", "reason": "Face too small"}
+    if face.det_score < 0.60:
+        return {"filename": source_name, "status": "failed", "reason": "Low confidence", "confidence": float(face.det_score)}
+    return None
+
+
+def merge_result(source_name: str, face_index: int, face, embedding: np.ndarray,
+                 duplicate_of: Dict, static_url: str, pending_doc: Optional[Dict] = None) -> Dict:
+    """
+    Merges one face into the person it duplicates and returns its result entry.
+    `pending_doc` is that person's document when it isn't inserted yet (bulk enrollment).
+    """
+    sample = {"filename": source_name, "face_image": static_url, "confidence": float(face.det_score)}
+    if pending_doc is not None:
+        merged = merge_into_document(pending_doc, embedding, sample)
+    else:
+        merged = merge_sample(duplicate_of["person_id"], embedding, sample)
+    if merged is None:
+        return {"filename": source_name, "face_index": face_index, "status": "failed",
+                "reason": "Matched person is no longer enrolled", "duplicate_of": duplicate_of}
+    return {
+        "filename": source_name,
+        "face_index": face_index,
+        "status": "merged",
+        "person_id": merged["person_id"],
+        "confidence": float(face.det_score),
+        "face_image": static_url,
+        "duplicate_of": duplicate_of
+    }
+
+
+def crop_face(frame: np.ndarray, face):
+    """Face crop with 10% padding, and the face box as [x, y, w, h]."""
+    x1, y1, x2, y2 = face.bbox.astype(int)
+    w, h = x2 - x1, y2 - y1
+    img_h, img_w = frame.shape[:2]
+    pad_x, pad_y = int(w * 0.1), int(h * 0.1)
+    crop_x1, crop_y1 = max(0, x1 - pad_x), max(0, y1 - pad_y)
+    crop_x2, crop_y2 = min(img_w, x2 + pad_x), min(img_h, y2 + pad_y)
+    return frame[crop_y1:crop_y2, crop_x1:crop_x2], (int(x1), int(y1), int(w), int(h))
+
+
+_enrollment_service = None
+_service_lock = threading.Lock()
+
+def get_enrollment_service() -> EnrollmentService:
+    """FastAPI dependency: the shared EnrollmentService, built on first request."""
+    global _enrollment_service
+    if _enrollment_service is None:
+        with _service_lock:
+            if _enrollment_service is None:
+                _enrollment_service = EnrollmentService()
+    return _enrollment_service
@@ -0,0 +1,306 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+
+from bson import ObjectId
+from pymongo.errors import PyMongoError
+
+from app.core.logging_utils import RateLimitedLogger
+from app.core.metrics import STAGE_SECONDS
+from app.repositories.events_repo import insert_events, update_events
+from app.repositories.stats_repo import (
+    DAILY_STATS_MARKER, EVENTS_COUNTER, add_rollup, apply_rollups, increment_counter, is_seeded
+)
+
+# Flush as soon as this many writes are pending...
+EVENT_SINK_BATCH_SIZE = int(os.getenv("EVENT_SINK_BATCH_SIZE", "200"))
+# ...or when the oldest pending write is this old
+EVENT_SINK_FLUSH_SEC = float(os.getenv("EVENT_SINK_FLUSH_SEC", "1.0"))
+# Upper bound on buffered writes while MongoDB is unreachable; oldest are dropped beyond it
+EVENT_SINK_MAX_BACKLOG = int(os.getenv("EVENT_SINK_MAX_BACKLOG", "50000"))
+
+_db_write_timer = STAGE_SECONDS.labels(pipeline="events", stage="db_write")
+_log = RateLimitedLogger("event_sink")
+
+
+class EventSink:
+    """
+    Write-behind buffer for recognition events.
+
+    Trackers call insert() / update() from the inference thread; those only
+    touch in-memory dicts. A background thread writes the buffer with one
+    insert_many plus one bulk_write per flush.
+
+    Updates are coalesced per event _id: five updates to the same session
+    between flushes become a single $set, and an update to an event that is
+    still waiting to be inserted is merged straight into the insert.
+    _ids are generated client-side so callers can reference an event before
+    it reaches the database.
+
+    Each flush also folds the batch into the dashboard statistics: the
+    events counter and the per-day, per-person rollups (visits, total
+    duration, first / last seen). Events that are still open (live sessions,
+    status "active") are remembered so later updates only add the extra
+    duration. Until the statistics are seeded from the event history
+    (seed_stats, at start-up) they are not written: the seed counts those
+    events itself.
+    """
+
+    def __init__(self, batch_size: int = EVENT_SINK_BATCH_SIZE, flush_sec: float = EVENT_SINK_FLUSH_SEC,
+                 max_backlog: int = EVENT_SINK_MAX_BACKLOG):
+        self.batch_size = batch_size
+        self.flush_sec = flush_sec
+        self.max_backlog = max_backlog
+
+        self._inserts = OrderedDict()
+        self._updates = OrderedDict()
+        # Open events already counted in the rollups: _id -> date, name, times
+        self._open = {}
+        # Rollup deltas / new-event count not written yet (retried on the next flush)
+        self._pending_rollups = {}
+        self._pending_events = 0
+        # Set once the daily rollups are seeded (looked up in the database until then)
+        self._rollups_seeded = False
+        # Events dropped before they were ever written, so their later updates are dropped too
+        self._dropped_ids = OrderedDict()
+        self._oldest = None
+        self._lock = threading.Lock()
+        # Only one flush talks to MongoDB at a time, so batches land in order
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+
+        self.inserted = 0
+        self.updated = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.dropped = 0
+        self.last_flush_ms = None
+        self.last_error = None
+
+    # --- producer side (inference thread) ---
+    def insert(self, event_doc: dict) -> ObjectId:
+        """Queues a new event and returns its _id."""
+        event_doc.setdefault("_id", ObjectId())
+        with self._lock:
+            self._inserts[event_doc["_id"]] = event_doc
+            self._queued()
+        return event_doc["_id"]
+
+    def update(self, event_id, fields: dict):
+        """Queues a $set on an event; merged with any pending write for the same _id."""
+        with self._lock:
+            if event_id in self._dropped_ids:
+                # Its insert was dropped on overflow: there is no document to update
+                self.dropped += 1
+                return
+            pending = self._inserts.get(event_id)
+            if pending is not None:
+                pending.update(fields)
+            else:
+                self._updates.setdefault(event_id, {}).update(fields)
+            self._queued()
+
+    def _queued(self):
+        # Caller holds self._lock
+        if self._oldest is None:
+            self._oldest = time.monotonic()
+        backlog = len(self._inserts) + len(self._updates)
+        while backlog > self.max_backlog:
+            if self._inserts:
+                # Updates to it are merged into the insert, so the whole event goes at once
+                event_id, _ = self._inserts.popitem(last=False)
+                self._dropped_ids[event_id] = None
+                if len(self._dropped_ids) > self.max_backlog:
+                    self._dropped_ids.popitem(last=False)
+            else:
+                self._updates.popitem(last=False)
+            self.dropped += 1
+            backlog -= 1
+            _log.warning("event_sink_overflow", max_backlog=self.max_backlog, dropped_total=self.dropped,
+                         last_error=self.last_error)
+        if backlog >= self.batch_size:
+            self._wake.set()
+        self._ensure_started()
+
+    def _ensure_started(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._flush_loop, daemon=True, name="event-sink")
+            self._thread.start()
+
+    # --- consumer side ---
+    def _flush_loop(self):
+        while not self._stopping.is_set():
+            self._wake.wait(self.flush_sec)
+            self._wake.clear()
+            with self._lock:
+                due = self._oldest is not None and (
+                    len(self._inserts) + len(self._updates) >= self.batch_size
+                    or time.monotonic() - self._oldest >= self.flush_sec
+                )
+            if due:
+                self.flush()
+
+    def flush(self) -> bool:
+        """
+        Writes everything buffered so far. Safe to call from any thread.
+        On a database error the batch is put back and retried by the next flush.
+        Returns True if the buffer was written.
+        """
+        with self._flush_lock:
+            with self._lock:
+                inserts, updates = self._inserts, self._updates
+                self._inserts, self._updates = OrderedDict(), OrderedDict()
+                self._oldest = None
+            if not inserts and not updates:
+                return True
+
+            start = time.perf_counter()
+            try:
+                # Inserts first: updates may target events from this same batch
+                if inserts:
+                    with _db_write_timer.time():
+                        self.inserted += insert_events(list(inserts.values()))
+                    # Counted as soon as the events exist, even if the updates below fail
+                    self._commit(*self._rollup(inserts, {}), len(inserts))
+                    inserts = OrderedDict()
+                if updates:
+                    with _db_write_timer.time():
+                        self.updated += update_events(updates)
+                    self._commit(*self._rollup({}, updates), 0)
+            except PyMongoError as e:
+                self.failed_flushes += 1
+                self.last_error = str(e)
+                print(f" Event sink flush failed, will retry: {e}")
+                self._requeue(inserts, updates)
+                return False
+
+            self.flushes += 1
+            self.last_flush_ms = round((time.perf_counter() - start) * 1000, 2)
+            return True
+
+    def _rollup(self, inserts: OrderedDict, updates: OrderedDict):
+        """
+        Rollup deltas for one batch, plus the open-event state to keep once the
+        batch is written (None = the event is finished, forget it).
+        """
+        rollups = {}
+        opened = {}
+
+        def add(state, visits, duration):
+            last_seen = state["first_seen"] + timedelta(seconds=max(0.0, state["end"] - state["start"]))
+            add_rollup(rollups, state["date"], state["name"], visits, duration, state["first_seen"], last_seen)
+
+        for event_id, doc in inserts.items():
+            if not {"name", "date", "created_at"} <= doc.keys():
+                continue
+            start = doc.get("start_seconds_raw", 0.0)
+            # Video events say when the person appeared; live events are created at that moment
+            state = {"date": doc["date"], "name": doc["name"], "first_seen": doc.get("first_seen", doc["created_at"]),
+                     "start": start, "end": doc.get("end_seconds_raw", start)}
+            add(state, 1, state["end"] - state["start"])
+            opened[event_id] = state if doc.get("status") == "active" else None
+
+        # Updates to events of this same batch were merged into the inserts already
+        for event_id, fields in updates.items():
+            state = self._open.get(event_id)
+            if state is None:
+                continue
+            end = fields.get("end_seconds_raw", state["end"])
+            add({**state, "end": end}, 0, end - state["end"])
+            opened[event_id] = {**state, "end": end} if fields.get("status", "active") == "active" else None
+
+        return rollups, opened
+
+    def _commit(self, rollups: dict, opened: dict, new_events: int):
+        # Only once the events are written, so a retried batch is counted once
+        for event_id, state in opened.items():
+            if state is None:
+                self._open.pop(event_id, None)
+            else:
+                self._open[event_id] = state
+        self._write_stats(rollups, new_events)
+
+    def _write_stats(self, rollups: dict, new_events: int):
+        # Called under _flush_lock. Stats that fail to write are retried with the next flush.
+        for (date, name), delta in rollups.items():
+            add_rollup(self._pending_rollups, date, name, delta["visits"], delta["duration_sec"],
+                       delta["first_seen"], delta["last_seen"])
+        self._pending_events += new_events
+
+        try:
+            if not self._rollups_seeded:
+                self._rollups_seeded = is_seeded(DAILY_STATS_MARKER)
+            # Not seeded yet: seed_daily_stats will count these events from the database
+            if self._rollups_seeded:
+                apply_rollups(self._pending_rollups)
+            self._pending_rollups = {}
+            # Likewise a no-op until the counter is seeded
+            increment_counter(EVENTS_COUNTER, self._pending_events)
+            self._pending_events = 0
+        except PyMongoError as e:
+            self.last_error = str(e)
+            print(f" Event statistics update failed, will retry: {e}")
+
+    def seed_stats(self, seed) -> bool:
+        """
+        Runs `seed()` (a counter seed / rollup backfill from the events in the
+        database) with no flush in progress, so each event written by this
+        process is either counted by the seed or by a later flush, never both.
+        If it seeded, statistics still waiting to be written are dropped, as
+        the seed counted their events. Returns what seed() returned.
+        """
+        with self._flush_lock:
+            seeded = seed()
+            if seeded:
+                self._pending_rollups = {}
+                self._pending_events = 0
+            return seeded
+
+    def _requeue(self, inserts: OrderedDict, updates: OrderedDict):
+        with self._lock:
+            # Anything queued during the failed flush is newer, so it is merged on top
+            for event_id, fields in self._updates.items():
+                if event_id in inserts:
+                    inserts[event_id].update(fields)
+                else:
+                    updates.setdefault(event_id, {}).update(fields)
+            inserts.update(self._inserts)
+            self._inserts, self._updates = inserts, updates
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+
+    def stop(self, timeout: float = 10.0):
+        """Stops the background thread after a final flush (app shutdown)."""
+        self._stopping.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+
+    def stats(self) -> dict:
+        with self._lock:
+            pending_inserts = len(self._inserts)
+            pending_updates = len(self._updates)
+            oldest_age = time.monotonic() - self._oldest if self._oldest is not None else 0.0
+        return {
+            "backlog": pending_inserts + pending_updates,
+            "pending_inserts": pending_inserts,
+            "pending_updates": pending_updates,
+            "oldest_pending_sec": round(oldest_age, 3),
+            "inserted": self.inserted,
+            "updated": self.updated,
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes,
+            "dropped": self.dropped,
+            "last_flush_ms": self.last_flush_ms,
+            "last_error": self.last_error,
+        }
+
+
+event_sink = EventSink()
@@ -1,12 +1,19 @@
 
-from datetime import datetime
-from app.repositories.events_repo import insert_event
+from datetime import datetime, timedelta
+from app.services.event_sink import event_sink
 
 class EventTracker:
-    def __init__(self, time_threshold=5.0):
+    def __init__(self, time_threshold=5.0, sink=None, origin=None):
         self.time_threshold = time_threshold
+        # Wall-clock time of video second 0 (default: when processing starts), so an
+        # event is dated by the frame the person appeared in rather than when it is saved
+        self.origin = origin or datetime.now()
+        # Events are queued on the write-behind sink instead of one insert_one per session
+        self.sink = sink or event_sink
         # Buffer format: { "Person_Name": { "entry_time": float, "last_seen": float, "count": int } }
         self.active_sessions = {}
+        # Number of events written so far (reported by the video job engine)
+        self.events_saved = 0
 
     def _format_timestamp(self, seconds: float) -> str:
      
@@ -57,6 +64,7 @@ class EventTracker:
         # print("In event_tracker.py file Inside update function5...")
         """
         Called at end of video to flush data still in RAM.
+        Blocks until the queued events are written, so a finished job's events are queryable.
         """
         for name, session in self.active_sessions.items():
             # print("In event_tracker.py file Inside update function6...")
@@ -64,6 +72,7 @@ class EventTracker:
         
         # Clear buffer
         self.active_sessions = {}
+        self.sink.flush()
 
     def _save_event(self, name: str, session: dict):
         # print("In event_tracker.py file Inside __save__event function1...")
@@ -74,11 +83,14 @@ class EventTracker:
             # print("In event_tracker.py file Inside __save__event function2...")
             duration = session["last_seen"] - session["entry_time"]
             now = datetime.utcnow()
+            first_seen = self.origin + timedelta(seconds=session["entry_time"])
             # print("In event_tracker.py file Inside __save__event function3...")
             event_doc = {
                 "name": name,
+                "name_lower": name.lower(),
            
-                "date": now.strftime("%d-%m-%Y"), 
+                "date": first_seen.strftime("%d-%m-%Y"), 
+                "first_seen": first_seen,
            
                 "start_time": self._format_timestamp(session["entry_time"]),
                 "end_time": self._format_timestamp(session["last_seen"]),
@@ -93,4 +105,5 @@ class EventTracker:
             }
             # print("In event_tracker.py file Inside __save__event function4...")
             print(f" Saving Event: {name} | Date: {event_doc['date']} | Duration: {event_doc['duration']}")
-            insert_event(event_doc)
\ No newline at end of file
+            self.sink.insert(event_doc)
+            self.events_saved += 1
\ No newline at end of file
@@ -0,0 +1,122 @@
+import asyncio
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from app.core.metrics import STAGE_SECONDS
+
+# JPEG quality of the live MJPEG stream (OpenCV's default is 95)
+LIVE_JPEG_QUALITY = int(os.getenv("LIVE_JPEG_QUALITY", "80"))
+
+_jpeg_timer = STAGE_SECONDS.labels(pipeline="live", stage="jpeg_encode")
+
+
+class FrameBroadcaster:
+    """
+    Latest-frame slot shared by every viewer of one live camera.
+
+    The producer (the live scheduler) calls publish() once per annotated
+    frame; the frame is JPEG-encoded there, once, and only while someone is
+    watching. Each viewer's stream() async generator waits on the event loop
+    for a newer slot and yields the already-encoded bytes, so viewers don't
+    hold a threadpool worker while they wait.
+
+    The producer never waits on viewers: a slow client simply finds a newer
+    frame when it comes back and the ones in between are counted as dropped.
+    """
+
+    def __init__(self, jpeg_quality: int = LIVE_JPEG_QUALITY):
+        self.encode_params = [int(cv2.IMWRITE_JPEG_QUALITY), jpeg_quality]
+        self.jpeg = None
+        self.seq = 0
+        self.closed = False
+        self._lock = threading.Lock()
+        # (event loop, asyncio.Event) of every waiting viewer
+        self._waiters = set()
+
+        self.subscribers = 0
+        self.published = 0
+        self.encoded = 0
+        self.encode_sec = 0.0
+        self.sent = 0
+        self.dropped = 0
+
+    def publish(self, frame: np.ndarray):
+        self.published += 1
+        if self.subscribers == 0:
+            return
+
+        start = time.perf_counter()
+        ok, buffer = cv2.imencode(".jpg", frame, self.encode_params)
+        elapsed = time.perf_counter() - start
+        self.encode_sec += elapsed
+        _jpeg_timer.observe(elapsed)
+        if not ok:
+            return
+        self.encoded += 1
+
+        with self._lock:
+            self.jpeg = buffer.tobytes()
+            self.seq += 1
+            waiters = list(self._waiters)
+        self._notify(waiters)
+
+    def close(self):
+        """Ends every open stream() (camera stopped or source ended)."""
+        with self._lock:
+            self.closed = True
+            waiters = list(self._waiters)
+        self._notify(waiters)
+
+    @staticmethod
+    def _notify(waiters):
+        for loop, wake in waiters:
+            try:
+                loop.call_soon_threadsafe(wake.set)
+            except RuntimeError:
+                # Event loop already closed (server shutting down)
+                pass
+
+    async def stream(self):
+        """
+        Async generator of JPEG bytes for one viewer; counts as a subscriber while it runs.
+        Only frames published after the viewer joined are sent.
+        """
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        wake = waiter[1]
+        with self._lock:
+            self.subscribers += 1
+            self._waiters.add(waiter)
+            last_seq = self.seq
+        try:
+            while True:
+                # Cleared before looking: a publish after the look sets it again
+                wake.clear()
+                with self._lock:
+                    jpeg, seq, closed = self.jpeg, self.seq, self.closed
+                if seq == last_seq:
+                    if closed:
+                        return
+                    await wake.wait()
+                    continue
+                self.dropped += seq - last_seq - 1
+                self.sent += 1
+                last_seq = seq
+                yield jpeg
+        finally:
+            with self._lock:
+                self.subscribers -= 1
+                self._waiters.discard(waiter)
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": self.subscribers,
+            "frames_published": self.published,
+            "frames_encoded": self.encoded,
+            "encode_ms_avg": round(1000 * self.encode_sec / self.encoded, 2) if self.encoded else None,
+            "frames_sent": self.sent,
+            "frames_dropped": self.dropped,
+        }
@@ -0,0 +1,165 @@
+import os
+import threading
+
+from pymongo.errors import PyMongoError
+
+from app.core.embedding_codec import decode_embedding
+from app.core.gallery_index import GalleryIndex
+from app.database import persons_collection
+from app.repositories.persons_repo import get_persons_updated_since, count_active_persons
+
+# Polling interval when the MongoDB deployment has no change streams (standalone server)
+GALLERY_SYNC_INTERVAL = float(os.getenv("GALLERY_SYNC_INTERVAL", "10"))
+
+
+class GalleryCache:
+    """
+    Process-wide gallery of enrolled identities, shared by the video
+    pipeline, the live stream and enrollment.
+
+    Instead of re-reading the whole persons collection after every change it
+    applies deltas to a single GalleryIndex:
+        - add()     new enrollment in this process
+        - replace() embedding of an enrolled person changed
+        - remove()  person deactivated / deleted
+        - sync()    pulls documents changed since the `updated_at` watermark
+    A background watcher keeps it current with a MongoDB change stream, or by
+    calling sync() every GALLERY_SYNC_INTERVAL seconds when change streams
+    aren't available. `version` goes up by one on every applied change.
+
+    Only documents read back from MongoDB move the watermark. A local add()
+    doesn't: its updated_at comes from this process's clock and could pass
+    an earlier-stamped enrollment from another process that sync() hasn't
+    seen yet.
+    """
+
+    def __init__(self):
+        self.index = GalleryIndex()
+        self.version = 0
+        self.watermark = None
+        self._lock = threading.RLock()
+        self._watcher = None
+        self._stop = threading.Event()
+
+    def __len__(self):
+        return len(self.index)
+
+    # --- deltas ---
+    def add(self, person_doc: dict):
+        """Adds (or re-adds) one active person document."""
+        with self._lock:
+            self._add(person_doc)
+
+    def replace(self, person_doc: dict):
+        """Re-adds a person whose embedding changed (e.g. a merged enrollment)."""
+        with self._lock:
+            self.index.remove(person_doc["person_id"])
+            self._add(person_doc)
+
+    def remove(self, person_id: str):
+        with self._lock:
+            if self.index.remove(person_id):
+                self.version += 1
+
+    def clear(self):
+        with self._lock:
+            self.index.load([])
+            self.watermark = None
+            self.version += 1
+
+    def _add(self, person_doc: dict):
+        # Caller holds self._lock
+        if self.index.contains(person_doc["person_id"]):
+            return
+        self.index.add(person_doc["person_id"], person_doc["name"], decode_embedding(person_doc))
+        self.version += 1
+
+    def _advance(self, updated_at):
+        if updated_at is not None and (self.watermark is None or updated_at > self.watermark):
+            self.watermark = updated_at
+
+    def _apply(self, doc: dict):
+        """Applies one person document read from MongoDB (sync / change stream)."""
+        with self._lock:
+            updated_at = doc.get("updated_at")
+            if doc.get("status") == "active":
+                if self.watermark is not None and updated_at is not None and updated_at > self.watermark:
+                    # Already known but changed since: the embedding may be different now
+                    self.index.remove(doc["person_id"])
+                self._add(doc)
+            elif self.index.remove(doc["person_id"]):
+                self.version += 1
+            self._advance(updated_at)
+
+    # --- loading ---
+    def sync(self) -> int:
+        """
+        Brings the cache up to date with MongoDB.
+        The first call loads every active person in one pass; later calls only
+        fetch documents whose updated_at is at or after the watermark.
+        Returns the number of documents read.
+        """
+        with self._lock:
+            if self.watermark is None and len(self.index) == 0:
+                persons = [p for p in get_persons_updated_since(None) if p.get("status") == "active"]
+                self.index.load(persons)
+                for p in persons:
+                    self._advance(p.get("updated_at"))
+                self.version += 1
+                print(f" Gallery cache loaded: {len(self.index)} identities (v{self.version}).")
+                return len(persons)
+
+            changed = get_persons_updated_since(self.watermark)
+            for doc in changed:
+                self._apply(doc)
+
+            # Hard deletes (e.g. /analysis/nuke_system) leave no updated_at trail
+            if count_active_persons() != len(self.index):
+                self.clear()
+                return self.sync()
+            return len(changed)
+
+    # --- background watcher ---
+    def start_watcher(self):
+        """Starts the change-stream / polling thread once per process."""
+        if self._watcher is not None and self._watcher.is_alive():
+            return
+        self._stop.clear()
+        self._watcher = threading.Thread(target=self._watch_loop, daemon=True, name="gallery-watcher")
+        self._watcher.start()
+
+    def stop_watcher(self):
+        self._stop.set()
+
+    def _watch_loop(self):
+        try:
+            persons_collection.create_index("updated_at")
+        except PyMongoError as e:
+            print(f" Could not create persons.updated_at index: {e}")
+
+        try:
+            with persons_collection.watch(full_document="updateLookup", max_await_time_ms=1000) as stream:
+                print(" Gallery cache following persons change stream.")
+                while not self._stop.is_set():
+                    change = stream.try_next()
+                    if change is None:
+                        continue
+                    doc = change.get("fullDocument")
+                    if doc is not None and "person_id" in doc:
+                        self._apply(doc)
+                    elif change.get("operationType") in ("delete", "drop", "invalidate"):
+                        # Deletes only carry the _id, so fall back to a full reload
+                        self.clear()
+                        self.sync()
+            return
+        except PyMongoError as e:
+            print(f" Change streams unavailable ({e}). Polling persons every {GALLERY_SYNC_INTERVAL}s.")
+
+        while not self._stop.wait(GALLERY_SYNC_INTERVAL):
+            try:
+                self.sync()
+            except PyMongoError as e:
+                print(f" Gallery sync failed: {e}")
+
+
+gallery_cache = GalleryCache()
@@ -1,9 +1,13 @@
 from datetime import datetime
-from app.database import events_collection
+from app.services.event_sink import event_sink
 
 class LiveEventTracker:
-    def __init__(self, time_threshold=5.0):
+    def __init__(self, time_threshold=5.0, sink=None, camera_id=None):
         self.time_threshold = time_threshold
+        # Which live camera these events come from (None = single-camera setup)
+        self.camera_id = camera_id
+        # Inserts / updates are buffered and written in bulk off the inference thread
+        self.sink = sink or event_sink
     
         self.active_sessions = {}
 
@@ -21,6 +25,7 @@ class LiveEventTracker:
           
             event_doc = {
                 "name": name,
+                "name_lower": name.lower(),
                 "date": now.strftime("%d-%m-%Y"),
                 "start_time": self._format_timestamp(now),
                 "end_time": self._format_timestamp(now), 
@@ -30,14 +35,16 @@ class LiveEventTracker:
                 "created_at": now,
                 "status": "active" 
             }
+            if self.camera_id is not None:
+                event_doc["camera_id"] = self.camera_id
             
-            result = events_collection.insert_one(event_doc)
+            event_id = self.sink.insert(event_doc)
             
          
             self.active_sessions[name] = {
                 "entry_time": current_time_ts,
                 "last_seen": current_time_ts,
-                "db_id": result.inserted_id
+                "db_id": event_id
             }
             return
 
@@ -75,6 +82,15 @@ class LiveEventTracker:
         for name in to_remove:
             self._close_session(name)
 
+    def close_all(self):
+        """
+        Marks every open session as completed and writes them out.
+        Called when the stream stops so no event is left "active".
+        """
+        for name in list(self.active_sessions):
+            self._close_session(name)
+        self.sink.flush()
+
     def _close_session(self, name):
         if name in self.active_sessions:
             print(f"🔸 Closing Session: {name}")
@@ -97,14 +113,12 @@ class LiveEventTracker:
 
         end_time_obj = datetime.fromtimestamp(session["last_seen"])
 
-        events_collection.update_one(
-            {"_id": session["db_id"]},
+        self.sink.update(
+            session["db_id"],
             {
-                "$set": {
-                    "end_time": self._format_timestamp(end_time_obj),
-                    "end_seconds_raw": session["last_seen"],
-                    "duration": duration_str,
-                    "status": status
-                }
+                "end_time": self._format_timestamp(end_time_obj),
+                "end_seconds_raw": session["last_seen"],
+                "duration": duration_str,
+                "status": status
             }
         )
\ No newline at end of file
@@ -0,0 +1,355 @@
+import os
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+from app.core.gallery_index import l2_normalize
+from app.core.logging_utils import RateLimitedLogger
+from app.core.metrics import stage_timers
+from app.core.motion_gate import MotionGate
+from app.core.model_loader import model_pool, prepare_detection_inputs, detect_scaled, embed_face_batches
+from app.core.track_manager import TrackManager
+from app.services.camera_stream import CameraStream
+from app.services.frame_broadcaster import FrameBroadcaster
+from app.services.gallery_cache import gallery_cache
+from app.services.live_event_tracker import LiveEventTracker
+
+# Upper bound on concurrently running live cameras
+LIVE_MAX_CAMERAS = int(os.getenv("LIVE_MAX_CAMERAS", "10"))
+# Frames (one per camera) taken per scheduler cycle under a single model checkout
+LIVE_BATCH_SIZE = int(os.getenv("LIVE_BATCH_SIZE", "4"))
+
+DEFAULT_CAMERA_ID = "default"
+
+_timers = stage_timers("live", ("det_prepare", "detect", "embed", "match", "draw"))
+_log = RateLimitedLogger("live")
+
+
+class RateMeter:
+    """Events per second over a sliding window, from (timestamp, running total) samples."""
+
+    def __init__(self, window_sec: float = 5.0):
+        self.window_sec = window_sec
+        self.samples = deque()
+        self.total = 0
+
+    def tick(self, now: float, count: int = 1):
+        self.total += count
+        self.samples.append((now, self.total))
+        self._trim(now)
+
+    def _trim(self, now: float):
+        while len(self.samples) > 2 and now - self.samples[0][0] > self.window_sec:
+            self.samples.popleft()
+
+    def rate(self, now: float) -> float:
+        self._trim(now)
+        if len(self.samples) < 2:
+            return 0.0
+        (t0, n0), (t1, n1) = self.samples[0], self.samples[-1]
+        return round((n1 - n0) / max(t1 - t0, 1e-6), 2)
+
+
+class LiveSession:
+    """
+    One live camera: its capture thread, event tracker, identity cache and
+    the broadcaster that fans its annotated frames out to /live/video_feed viewers.
+    """
+
+    def __init__(self, camera_id: str, source, priority: int = 0, on_frame=None, rois: list = None):
+        self.camera_id = camera_id
+        self.source = source
+        self.priority = priority
+        self.camera = CameraStream(source=source, on_frame=on_frame)
+        self.tracker = LiveEventTracker(time_threshold=5.0, camera_id=camera_id)
+        self.identities = TrackManager()
+        # Frames with no change since the last analyzed one reuse last_matches
+        self.motion = MotionGate(rois=rois)
+        self.last_matches = []
+
+        self.started_at = time.time()
+        self.last_processed = 0
+        self.last_served = 0.0
+        self.processed = 0
+        self.skipped = 0
+        self.faces = 0
+        self.latency_ms = deque(maxlen=100)
+        self.capture_rate = RateMeter()
+        self.process_rate = RateMeter()
+
+        # Annotated frames, encoded once and shared by every viewer
+        self.broadcast = FrameBroadcaster()
+        # Held by the scheduler while it annotates / publishes this camera's frame,
+        # so stop() can't close the tracker under an in-flight batch
+        self.lock = threading.Lock()
+        self.stopped = False
+
+    @property
+    def running(self) -> bool:
+        return self.camera.running
+
+    def start(self):
+        self.camera.start()
+
+    def stop(self):
+        # Waits for a batch that is drawing on this camera; later batches see `stopped` and skip it
+        with self.lock:
+            if self.stopped:
+                return
+            self.stopped = True
+        if self.camera.thread is not None:
+            self.camera.stop()
+        self.tracker.close_all()
+        self.broadcast.close()
+
+    def has_new_frame(self) -> bool:
+        return self.camera.frame_count > self.last_processed
+
+    def publish(self, frame: np.ndarray, frame_time: float):
+        now = time.monotonic()
+        self.processed += 1
+        self.process_rate.tick(now)
+        if frame_time is not None:
+            self.latency_ms.append((now - frame_time) * 1000)
+        self.broadcast.publish(frame)
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        latency = sorted(self.latency_ms)
+        return {
+            "camera_id": self.camera_id,
+            "source": str(self.source),
+            "priority": self.priority,
+            "running": self.running,
+            "started_at": self.started_at,
+            "capture_fps": self.capture_rate.rate(now),
+            "processed_fps": self.process_rate.rate(now),
+            "frames_processed": self.processed,
+            "frames_skipped": self.skipped,
+            "frames_drained": self.camera.drained,
+            "frames_static": self.motion.skipped,
+            "motion": self.motion.stats(),
+            "faces": self.faces,
+            "latency_ms_p50": round(latency[len(latency) // 2], 1) if latency else None,
+            "latency_ms_max": round(latency[-1], 1) if latency else None,
+            "identities": self.identities.stats(),
+            "open_sessions": len(self.tracker.active_sessions),
+            "stream": self.broadcast.stats(),
+        }
+
+
+class LiveSessionManager:
+    """
+    Runs several live cameras against the one shared model.
+
+    Each camera keeps capturing on its own thread (CameraStream). A single
+    scheduler thread repeatedly picks the cameras that have a frame it hasn't
+    seen yet, highest priority first and least recently served next
+    (round-robin within a priority), takes up to LIVE_BATCH_SIZE of them and
+    runs detection + recognition for that batch under one model checkout.
+    Only the freshest frame of each camera is ever processed; older ones are
+    counted as skipped, so a slow model lowers per-camera fps instead of
+    building up latency.
+    """
+
+    def __init__(self, batch_size: int = LIVE_BATCH_SIZE, max_cameras: int = LIVE_MAX_CAMERAS):
+        self.batch_size = max(1, batch_size)
+        self.max_cameras = max_cameras
+        self.sessions = {}
+        self._lock = threading.Lock()
+        self._scheduler = None
+        self._stop = threading.Event()
+        # Set by the cameras on every new frame, so an idle scheduler sleeps instead of polling
+        self._wake = threading.Event()
+
+    # --- camera lifecycle ---
+    def start(self, camera_id: str, source, priority: int = 0, rois: list = None) -> LiveSession:
+        """
+        `rois`: motion gate regions for this camera (see MotionGate / parse_rois);
+        None keeps a running camera's current regions.
+        """
+        with self._lock:
+            session = self.sessions.get(camera_id)
+            if session is not None and session.running:
+                session.priority = priority
+                if rois is not None:
+                    session.motion.rois = rois
+                    session.motion.reset()
+                return session
+            if session is None and len(self.sessions) >= self.max_cameras:
+                raise RuntimeError(f"Camera limit reached ({self.max_cameras})")
+            if session is not None:
+                # Source ended before the scheduler reaped it: close its open events before restarting
+                session.stop()
+
+            session = LiveSession(camera_id, source, priority, on_frame=self._wake.set, rois=rois)
+            session.start()
+            self.sessions[camera_id] = session
+            self._ensure_scheduler()
+        return session
+
+    def stop(self, camera_id: str) -> bool:
+        with self._lock:
+            session = self.sessions.pop(camera_id, None)
+        if session is None:
+            return False
+        session.stop()
+        return True
+
+    def stop_all(self):
+        for camera_id in list(self.sessions):
+            self.stop(camera_id)
+        self._stop.set()
+        self._wake.set()
+
+    def get(self, camera_id: str):
+        return self.sessions.get(camera_id)
+
+    def stats(self) -> list:
+        return [session.stats() for session in list(self.sessions.values())]
+
+    # --- scheduler ---
+    def _ensure_scheduler(self):
+        if self._scheduler is None or not self._scheduler.is_alive():
+            self._stop.clear()
+            self._scheduler = threading.Thread(target=self._schedule_loop, daemon=True, name="live-scheduler")
+            self._scheduler.start()
+
+    def _next_batch(self) -> list:
+        ready = [s for s in list(self.sessions.values()) if s.running and not s.stopped and s.has_new_frame()]
+        ready.sort(key=lambda s: (-s.priority, s.last_served))
+        return ready[:self.batch_size]
+
+    def _reap(self):
+        """
+        Drops cameras whose source ended or disconnected: closes their open
+        events and ends their viewers' streams, and frees their camera slot.
+        """
+        with self._lock:
+            ended = [s for s in self.sessions.values() if not s.running]
+            for session in ended:
+                del self.sessions[session.camera_id]
+        for session in ended:
+            session.stop()
+            _log.info("live_source_ended", key=session.camera_id, camera_id=session.camera_id)
+
+    def _schedule_loop(self):
+        while not self._stop.is_set():
+            # Cleared before looking, so a frame arriving meanwhile still wakes us
+            self._wake.clear()
+            # Camera threads wake us when they exit too
+            self._reap()
+            batch = self._next_batch()
+            if not batch:
+                if not self.sessions:
+                    # Nothing left to watch; the next start() spins up a new scheduler
+                    with self._lock:
+                        if not self.sessions:
+                            self._scheduler = None
+                            return
+                self._wake.wait(0.5)
+                continue
+
+            frames = []
+            for session in batch:
+                frame, frame_count, frame_time = session.camera.read_latest()
+                if frame is None:
+                    continue
+                # Frames captured since the last one we processed were never looked at
+                session.skipped += max(0, frame_count - session.last_processed - 1)
+                session.capture_rate.tick(frame_time, frame_count - session.last_processed)
+                session.last_processed = frame_count
+                session.last_served = time.monotonic()
+                frames.append((session, frame, frame_count, frame_time))
+
+            # Cameras whose picture hasn't changed keep their last results
+            changed = [item for item in frames if item[0].motion.should_analyze(item[1])]
+            if changed:
+                try:
+                    with model_pool.checkout() as app:
+                        results = self._recognize_batch(app, changed)
+                except Exception as e:
+                    _log.warning("live_scheduler_error", error=repr(e))
+                    time.sleep(0.1)
+                    continue
+                for (session, _, _, _), matches in zip(changed, results):
+                    session.last_matches = matches
+
+            for session, frame, _, frame_time in frames:
+                with session.lock:
+                    # Stopped while its batch was in flight: the tracker is closed for good
+                    if session.stopped:
+                        continue
+                    with _timers["draw"].time():
+                        frame = self._annotate(session, frame, session.last_matches)
+                    session.publish(frame, frame_time)
+
+    @staticmethod
+    def _recognize_batch(app, frames: list) -> list:
+        """
+        Detection for every frame of the batch in one detector call (on copies
+        shrunk to DET_SIZE_LIVE), then one ArcFace call on crops aligned from
+        the full-resolution frames and one gallery matmul for the stale faces
+        of all cameras.
+        Returns the TrackManager results per frame.
+        """
+        with _timers["det_prepare"].time():
+            inputs = prepare_detection_inputs([frame for _, frame, _, _ in frames], "live")
+        with _timers["detect"].time():
+            faces_per_frame = detect_scaled(app, inputs, "live")
+
+        # Faces already identified on earlier frames skip embedding + matching
+        plans = []
+        to_embed = []
+        for (session, frame, frame_index, _), faces in zip(frames, faces_per_frame):
+            assigned, stale = session.identities.associate(faces, frame_index)
+            plans.append((assigned, stale))
+            to_embed.append((frame, [faces[i] for i in stale]))
+
+        stale_faces = [face for _, faces in to_embed for face in faces]
+        matches = []
+        if stale_faces:
+            with _timers["embed"].time():
+                embed_face_batches(app, to_embed, bgr=True)
+            # Same in-memory gallery the video pipeline uses
+            with _timers["match"].time():
+                matches = gallery_cache.index.match(l2_normalize(np.stack([face.embedding for face in stale_faces])))
+
+        results = []
+        offset = 0
+        for (session, _, frame_index, _), faces, (assigned, stale) in zip(frames, faces_per_frame, plans):
+            frame_matches = matches[offset:offset + len(stale)]
+            offset += len(stale)
+            results.append(session.identities.resolve(faces, assigned, stale, frame_matches, frame_index))
+        return results
+
+    @staticmethod
+    def _annotate(session: LiveSession, frame: np.ndarray, matches: list) -> np.ndarray:
+        """
+        Draws the boxes and feeds the event tracker. Camera frames are shared
+        read-only, so a copy is made only when there is something to draw.
+        """
+        session.faces += len(matches)
+        if matches:
+            frame = frame.copy()
+        for match in matches:
+            box = match["face"].bbox.astype(int)
+            if match["is_known"]:
+                # Real-time DB update (buffered by the event sink)
+                session.tracker.update(match["name"])
+                color, name = (0, 255, 0), match["name"]
+            else:
+                color, name = (0, 0, 255), "Unknown"
+            label = f"{name} ({int(match['score'] * 100)}%)"
+            cv2.rectangle(frame, (box[0], box[1]), (box[2], box[3]), color, 2)
+            cv2.putText(frame, label, (box[0], box[1] - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+
+        # Close sessions for people who left this camera
+        session.tracker.check_for_timeouts()
+        return frame
+
+
+live_manager = LiveSessionManager()
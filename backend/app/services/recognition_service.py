@@ -185,12 +185,30 @@ import cv2
 import numpy as np
 import os
 import tempfile
+import threading
+import time
 
-from app.repositories.persons_repo import get_all_persons
 from app.services.event_tracker import EventTracker
-from app.core.model_loader import model_loader # <--- ADD THIS IMPORT
-
-from moviepy import VideoFileClip, AudioFileClip
+from app.core.model_loader import model_pool, prepare_detection_inputs, detect_scaled, embed_faces
+from app.core.gallery_index import l2_normalize
+from app.core.track_manager import TrackManager
+from app.services.gallery_cache import gallery_cache
+from app.core.box_tracker import BoxTracker
+from app.core.video_processor import VideoPipeline
+from app.core.video_encoder import open_video_writer
+from app.core.metrics import stage_timers
+from app.core.motion_gate import MOTION_GATE_ENABLED, MotionGate
+from app.core.logging_utils import RateLimitedLogger
+
+# Run full detection + recognition every N frames; boxes are tracked in between
+VIDEO_DETECT_STRIDE = int(os.getenv("VIDEO_DETECT_STRIDE", "3"))
+# Max frames buffered between decode -> inference -> encode
+VIDEO_PIPELINE_QUEUE = int(os.getenv("VIDEO_PIPELINE_QUEUE", "8"))
+# Decoded frames looked at together; their detection frames share one detector call
+VIDEO_INFERENCE_BATCH = int(os.getenv("VIDEO_INFERENCE_BATCH", "8"))
+
+_timers = stage_timers("video", ("decode", "det_prepare", "detect", "embed", "match", "draw", "encode"))
+_log = RateLimitedLogger("video")
 
 class RecognitionService:
     def __init__(self):
@@ -200,29 +218,39 @@ class RecognitionService:
         # self.app = FaceAnalysis(name="buffalo_l", providers=["CPUExecutionProvider"])
         # self.app.prepare(ctx_id=0, det_size=(384, 384))
         
-        # --- NEW CODE (USE SHARED MODEL) ---
-        self.app = model_loader.get_model() 
+        # --- NEW CODE (USE SHARED MODEL POOL) ---
+        # Each inference borrows an instance, so concurrent callers never share one
+        self.models = model_pool
+        self.models.primary()
         
-        self.known_faces = []
+        # Shared with the live stream and enrollment (see gallery_cache.py)
+        self.gallery = gallery_cache.index
         self.load_known_faces()
-        self.tracker = EventTracker(time_threshold=5.0) 
+        # Stage timings / queue depths of the last process_video run
+        self.last_pipeline_stats = None
 
     def load_known_faces(self):
         # ... (Rest of the code remains exactly the same) ...
-        persons = get_all_persons()
-        print("total enrolled person : ", len(persons))
-        self.known_faces = []
-        for p in persons:
-            self.known_faces.append({
-                "name": p["name"],
-                "person_id": p["person_id"],
-                "embedding": np.array(p["embedding"], dtype=np.float32)
-            })
-        print(f"Loaded {len(self.known_faces)} identities into memory.")
-
-    def process_video(self, input_path: str, output_path: str):
-        # ... (Rest of the code remains exactly the same) ...
-        # Just ensure indentation is correct
+        # Incremental: only documents changed since the last sync are read
+        gallery_cache.sync()
+        print(f"Loaded {len(gallery_cache)} identities into memory (gallery v{gallery_cache.version}).")
+
+    def process_video(self, input_path: str, output_path: str, detect_stride: int = None,
+                      progress_callback=None, should_stop=None, motion_rois: list = None,
+                      motion_gate: bool = None):
+        """
+        Annotates a video file and logs recognition events.
+        `detect_stride` = run FaceAnalysis on every Nth frame (default VIDEO_DETECT_STRIDE);
+        the frames in between reuse identities via constant-velocity box tracking.
+        Detection frames that show no change since the last analyzed one (MotionGate,
+        optionally limited to `motion_rois`) keep the previous boxes and identities.
+        Decode, inference and annotate+encode run as a pipelined set of threads.
+
+        progress_callback(frames_done, total_frames, events_saved) is called about
+        twice a second and once at the end. If should_stop() returns True the run
+        is aborted, partial output is deleted and None is returned.
+        """
+        detect_stride = max(1, detect_stride or VIDEO_DETECT_STRIDE)
         cap = cv2.VideoCapture(input_path)
         if not cap.isOpened():
             raise ValueError("Could not open video file.")
@@ -230,109 +258,138 @@ class RecognitionService:
         width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
         height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
         fps = int(cap.get(cv2.CAP_PROP_FPS)) or 25
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) or None
         
-        temp_silent_path = output_path.replace(".mp4", "_silent.mp4")
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v') 
-        out = cv2.VideoWriter(temp_silent_path, fourcc, fps, (width, height))
-
-        frame_count = 0
-        current_faces_data = [] 
-
+        # One ffmpeg pass: annotated frames -> H.264, original audio copied across
+        out = open_video_writer(output_path, width, height, cap.get(cv2.CAP_PROP_FPS) or fps, audio_source=input_path)
+
+        # One event tracker per video, so concurrent jobs never share sessions
+        tracker = EventTracker(time_threshold=5.0)
+        box_tracker = BoxTracker()
+        # Known faces keep their identity across detection passes; only stale tracks are re-embedded
+        identities = TrackManager()
+        pipeline = VideoPipeline(queue_size=VIDEO_PIPELINE_QUEUE, batch_size=VIDEO_INFERENCE_BATCH,
+                                 decode_timer=_timers["decode"])
+        last_progress = [0.0]
+        detected = {}
+        gate = MotionGate(enabled=MOTION_GATE_ENABLED if motion_gate is None else motion_gate, rois=motion_rois)
+        static = set()
+
+        def detect_ahead(items):
+            # The detection frames of this group go through the detector together
+            due = []
+            for index, frame in items:
+                if (index - 1) % detect_stride != 0:
+                    continue
+                if gate.should_analyze(frame):
+                    due.append((index, frame))
+                else:
+                    static.add(index)
+            for (index, _), detection in zip(due, self._detect_frames([frame for _, frame in due])):
+                detected[index] = detection
+
+        def analyze(frame_count, frame):
+            # Inference stage: runs in order on this thread
+            current_timestamp = frame_count / fps
+
+            # Full detection every `detect_stride` frames, tracked boxes in between
+            if (frame_count - 1) % detect_stride == 0:
+                _log.info("video_progress", frame=frame_count, total=total_frames, timestamp=current_timestamp,
+                          video=os.path.basename(input_path))
+                if frame_count in static:
+                    # Static scene: same faces, same places
+                    static.discard(frame_count)
+                    current_faces_data = box_tracker.hold()
+                else:
+                    current_faces_data = box_tracker.update(self._analyze_frame(frame, identities, frame_count, detected.pop(frame_count, None)), frame_count)
+            else:
+                current_faces_data = box_tracker.predict()
+
+            # Events still get a timestamp for every frame the person is on screen
+            for face_data in current_faces_data:
+                if face_data['is_known']:
+                    tracker.update(face_data['name'], current_timestamp)
+
+            if progress_callback is not None and time.monotonic() - last_progress[0] >= 0.5:
+                last_progress[0] = time.monotonic()
+                progress_callback(frame_count, total_frames, tracker.events_saved)
+            return current_faces_data
+
+        def annotate_and_write(frame_count, frame, current_faces_data):
+            # Encode stage: runs on the pipeline's writer thread
+            with _timers["draw"].time():
+                frame = self._draw_boxes(frame, current_faces_data)
+            with _timers["encode"].time():
+                out.write(frame)
+
+        completed = False
         try:
-            while True:
-                ret, frame = cap.read()
-                if not ret:
-                    break 
-
-                frame_count += 1
-                current_timestamp = frame_count / fps
-
-                # Process every frame
-                if frame_count % 1 == 0:
-                    print(f"Processing frame {frame_count} ({current_timestamp:.2f}s)...")
-                    current_faces_data = self._analyze_frame(frame)
-                    
-                    for face_data in current_faces_data:
-                        if face_data['is_known']:
-                            self.tracker.update(face_data['name'], current_timestamp)
-
-                annotated_frame = self._draw_boxes(frame, current_faces_data)
-                out.write(annotated_frame)
-
+            completed = pipeline.run(cap, analyze, annotate_and_write, should_stop=should_stop, batch_fn=detect_ahead)
         finally:
             print("Video ended. Flushing events...")
-            self.tracker.save_all_remaining()
+            tracker.save_all_remaining()
             cap.release()
-            out.release() 
-
-        # --- AUDIO MERGING LOGIC REMAINS SAME ---
-        try:
-            print(" Merging Audio and Optimizing Codec for Browser...")
-            video_clip = VideoFileClip(temp_silent_path)
-            
-            try:
-                original_audio = AudioFileClip(input_path)
-                final_clip = video_clip.with_audio(original_audio)
-            except Exception:
-                print("No audio found in source or error loading audio. Proceeding silent.")
-                final_clip = video_clip
-
-            final_clip.write_videofile(
-                output_path, 
-                codec="libx264", 
-                audio_codec="aac", 
-                temp_audiofile="temp-audio.m4a",
-                remove_temp=True,
-                logger="bar" 
-            )
-            
-            video_clip.close()
-            if 'original_audio' in locals(): original_audio.close()
-            final_clip.close()
-            
-            if os.path.exists(temp_silent_path):
-                os.remove(temp_silent_path)
-                
-            print(f" Final video with audio saved to {output_path}")
-
-        except Exception as e:
-            print(f" Error during audio merge: {e}")
-            if os.path.exists(temp_silent_path):
-                if os.path.exists(output_path): os.remove(output_path)
-                os.rename(temp_silent_path, output_path)
-
+            self.last_pipeline_stats = pipeline.stats()
+            self.last_pipeline_stats["events"] = tracker.events_saved
+            self.last_pipeline_stats["identities"] = identities.stats()
+            self.last_pipeline_stats["motion"] = gate.stats()
+            print(f" {pipeline.summary()}")
+            print(f" Motion gate: {gate.skipped}/{gate.frames} detection frames skipped as static.")
+            if progress_callback is not None:
+                progress_callback(pipeline.stage_stats["inference"].frames, total_frames, tracker.events_saved)
+            if completed:
+                out.release()
+            else:
+                out.abort()
+
+        if not completed:
+            print(" Processing stopped by user. Discarding partial output.")
+            return None
+
+        print(f" Final video with audio saved to {output_path}")
         return output_path
 
-    def _analyze_frame(self, frame):
-        # ... (No changes needed here) ...
-        img_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        faces = self.app.get(img_rgb) # Now uses the shared app instance
-        results = []
-
-        for face in faces:
-            embedding = face.embedding
-            norm = np.linalg.norm(embedding)
-            if norm == 0: continue
-            embedding = embedding / norm
+    def _detect_frames(self, frames):
+        """
+        Detection for several BGR frames in one batched detector call, at
+        DET_SIZE_VIDEO on downscaled copies. Returns [(frame, faces), ...]
+        aligned with `frames`, boxes in full-frame coordinates.
+        """
+        with _timers["det_prepare"].time():
+            inputs = prepare_detection_inputs(frames, "video")
+        with self.models.checkout() as app, _timers["detect"].time():
+            return list(zip(frames, detect_scaled(app, inputs, "video")))
 
-            max_score = 0
-            best_match_name = "Unknown"
+    def _analyze_frame(self, frame, identities: TrackManager, frame_index: int, detection=None):
+        # `detection` = (frame, faces) already computed by a batched _detect_frames call
+        frame, faces = detection or self._detect_frames([frame])[0]
 
-            for known in self.known_faces:
-                score = np.dot(embedding, known["embedding"])
-                if score > max_score:
-                    max_score = score
-                    best_match_name = known["name"]
+        # Embedding + gallery search only for faces whose track needs it
+        matches = identities.identify(faces, frame_index, lambda stale: self.recognize_faces(frame, stale))
 
-            is_match = max_score > 0.60
+        results = []
+        for match in matches:
             results.append({
-                "box": face.bbox.astype(int),
-                "name": best_match_name if is_match else "Unknown",
-                "score": max_score,
-                "is_known": is_match
+                "box": match["face"].bbox.astype(int),
+                "name": match["name"],
+                "score": match["score"],
+                "is_known": match["is_known"]
             })
         return results
 
+    def recognize_faces(self, frame, faces):
+        """
+        Embeds the given detected faces in one batch (aligned from the
+        full-resolution BGR frame) and scores them against the gallery in one
+        matmul. Returns GalleryIndex.match() dicts aligned with `faces`.
+        """
+        if not faces:
+            return []
+        with self.models.checkout() as app, _timers["embed"].time():
+            embed_faces(app, frame, faces, bgr=True)
+        with _timers["match"].time():
+            return self.gallery.match(l2_normalize(np.stack([face.embedding for face in faces])))
+
     def _draw_boxes(self, frame, faces_data):
         # ... (No changes needed here) ...
         for data in faces_data:
@@ -344,4 +401,17 @@ class RecognitionService:
                         cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
         return frame
     
-recognition_service = RecognitionService()
\ No newline at end of file
+_recognition_service = None
+_service_lock = threading.Lock()
+
+def get_recognition_service() -> RecognitionService:
+    """
+    Shared RecognitionService, built on first use (loads the model and syncs
+    the gallery) instead of at import time.
+    """
+    global _recognition_service
+    if _recognition_service is None:
+        with _service_lock:
+            if _recognition_service is None:
+                _recognition_service = RecognitionService()
+    return _recognition_service
@@ -0,0 +1,96 @@
+import os
+import threading
+import time
+from typing import Optional
+
+from app.database import events_collection
+from app.repositories.persons_repo import count_active_persons
+from app.repositories.stats_repo import (
+    EVENTS_COUNTER, ENROLLED_FACES_COUNTER, get_counter, seed_counter, seed_daily_stats, find_daily_stats
+)
+from app.services.event_sink import event_sink
+from app.services.gallery_cache import gallery_cache
+
+# How long dashboard numbers are reused before being read again
+STATS_CACHE_TTL_SEC = float(os.getenv("STATS_CACHE_TTL_SEC", "5"))
+
+FACES_DIR = "data/enrolled_faces"
+
+
+class TTLCache:
+    """Thread-safe memo of computed values; each entry is recomputed after `ttl` seconds."""
+
+    def __init__(self, ttl: float, max_entries: int = 256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, compute):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now - entry[0] < self.ttl:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        value = compute()
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                # Drop expired entries first, then the oldest
+                self._entries = {k: e for k, e in self._entries.items() if now - e[0] < self.ttl}
+                if len(self._entries) >= self.max_entries:
+                    self._entries.pop(min(self._entries, key=lambda k: self._entries[k][0]))
+            self._entries[key] = (time.monotonic(), value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+stats_cache = TTLCache(STATS_CACHE_TTL_SEC)
+
+
+def _count_face_files() -> int:
+    return len(os.listdir(FACES_DIR)) if os.path.exists(FACES_DIR) else 0
+
+
+def _dashboard_stats() -> dict:
+    # The gallery cache holds exactly the active persons once it has loaded
+    total_users = len(gallery_cache) if gallery_cache.watermark is not None else count_active_persons()
+    return {
+        "total_users": total_users,
+        "total_events": get_counter(EVENTS_COUNTER),
+        "storage_count": get_counter(ENROLLED_FACES_COUNTER),
+    }
+
+
+def _event_history():
+    fields = {"name": 1, "date": 1, "created_at": 1, "first_seen": 1, "start_seconds_raw": 1, "end_seconds_raw": 1}
+    return events_collection.find({}, fields).batch_size(1000)
+
+
+def seed_counters():
+    """
+    Seeds the dashboard counters and backfills the daily rollups from the
+    data already stored (once, at start-up). Event statistics are seeded
+    with the event sink paused, so no event is counted twice.
+    """
+    event_sink.seed_stats(lambda: seed_counter(EVENTS_COUNTER, lambda: events_collection.count_documents({})))
+    event_sink.seed_stats(lambda: seed_daily_stats(_event_history()))
+    seed_counter(ENROLLED_FACES_COUNTER, _count_face_files)
+
+
+def dashboard_stats() -> dict:
+    """Counts for the dashboard cards, from maintained counters, cached for STATS_CACHE_TTL_SEC."""
+    return stats_cache.get("dashboard", _dashboard_stats)
+
+
+def daily_stats(date: Optional[str] = None, name: Optional[str] = None, limit: int = 500) -> list:
+    """Per-day, per-person rollups (visits, total duration, first / last seen), cached like the counters."""
+    key = ("daily", date, name.strip().lower() if name else None, limit)
+    return stats_cache.get(key, lambda: find_daily_stats(date, name, limit))
@@ -0,0 +1,319 @@
+import os
+import time
+import threading
+import multiprocessing
+from uuid import uuid4
+from concurrent.futures import ProcessPoolExecutor
+
+from pymongo.errors import PyMongoError
+
+from app.core.metrics import STAGE_SECONDS, snapshot_delta
+from app.repositories.jobs_repo import (
+    ACTIVE_STATES, find_active_job_ids, find_cancel_requests, finish_job, get_job, insert_job, request_cancel,
+    update_job
+)
+
+# How many videos are processed at the same time (one worker process each)
+VIDEO_JOB_WORKERS = int(os.getenv("VIDEO_JOB_WORKERS", "1"))
+
+# Finished jobs are forgotten after this long
+VIDEO_JOB_RETENTION_SEC = int(os.getenv("VIDEO_JOB_RETENTION_SEC", "3600"))
+
+# How often a process saves its jobs' progress and picks up cancel requests made through other processes
+VIDEO_JOB_SYNC_SEC = float(os.getenv("VIDEO_JOB_SYNC_SEC", "1.0"))
+# An active job not saved for this long is reported as failed: the process running it is gone
+VIDEO_JOB_STALE_SEC = float(os.getenv("VIDEO_JOB_STALE_SEC", "60"))
+
+
+def _run_video_job(job_id: str, input_path: str, output_path: str, progress, cancel_event, motion_rois=None):
+    """
+    Entry point inside a worker process.
+    The recognition service (model + gallery) is imported once per worker
+    and then reused for every job that worker picks up.
+
+    Stage timings recorded here live in the worker's own metrics registry, so
+    every progress update also carries this job's facelog_stage_seconds
+    observations; the API process merges them into /metrics (collect_metrics).
+    """
+    from app.services.recognition_service import get_recognition_service
+    recognition_service = get_recognition_service()
+
+    # A worker runs one job at a time: everything observed after this is the job's
+    metrics_base = STAGE_SECONDS.snapshot()
+
+    # Pick up enrollments made since this worker last ran a job
+    recognition_service.load_known_faces()
+
+    started = time.monotonic()
+    started_at = time.time()
+    progress[job_id] = {"status": "running", "started_at": started_at, "frames_done": 0,
+                        "total_frames": None, "events": 0, "fps": None, "stage_seconds": {}}
+
+    def report(frames_done, total_frames, events_saved):
+        elapsed = time.monotonic() - started
+        progress[job_id] = {
+            "status": "running",
+            "started_at": started_at,
+            "frames_done": frames_done,
+            "total_frames": total_frames,
+            "events": events_saved,
+            "fps": round(frames_done / elapsed, 2) if elapsed > 0 else None,
+            "stage_seconds": snapshot_delta(STAGE_SECONDS.snapshot(), metrics_base),
+        }
+
+    try:
+        return recognition_service.process_video(
+            input_path, output_path,
+            progress_callback=report,
+            should_stop=cancel_event.is_set,
+            motion_rois=motion_rois
+        )
+    finally:
+        stats = recognition_service.last_pipeline_stats
+        if job_id in progress:
+            progress[job_id] = {
+                **progress[job_id],
+                # How many detection frames the motion gate saved, for the job status
+                "motion": stats.get("motion") if stats else None,
+                "stage_seconds": snapshot_delta(STAGE_SECONDS.snapshot(), metrics_base),
+            }
+        if os.path.exists(input_path):
+            os.remove(input_path)
+            print(f" Cleaned up temp file: {input_path}")
+
+
+class VideoJobManager:
+    """
+    Runs `process_video` in a pool of worker processes so the HTTP request
+    returns straight away with a job id.
+
+    Job state is kept in MongoDB (video_jobs, see jobs_repo), so with several
+    API worker processes any of them can report on or cancel a job. The
+    process that accepted the upload runs it: it saves the job's progress
+    every VIDEO_JOB_SYNC_SEC and stops it when another process has set
+    cancel_requested on the document.
+
+    Inside that process, progress and cancellation are shared with the
+    workers through a multiprocessing Manager: workers write
+    `progress[job_id]`, the API sets the job's cancel Event. Workers' stage
+    timings come back the same way (see collect_metrics).
+    """
+
+    def __init__(self, max_workers: int = VIDEO_JOB_WORKERS):
+        self.max_workers = max(1, max_workers)
+        # Jobs this process runs
+        self.jobs = {}
+        self._lock = threading.Lock()
+        self._executor = None
+        self._manager = None
+        self._progress = None
+        self._metrics_lock = threading.Lock()
+        self._sync_thread = None
+        self._stop = threading.Event()
+
+    def _ensure_started(self):
+        # Pool and manager are created on first use, not at import time
+        if self._executor is None:
+            ctx = multiprocessing.get_context("spawn")
+            self._manager = ctx.Manager()
+            self._progress = self._manager.dict()
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=ctx)
+
+    def _ensure_syncing(self):
+        if self._sync_thread is None or not self._sync_thread.is_alive():
+            self._stop.clear()
+            self._sync_thread = threading.Thread(target=self._sync_loop, daemon=True, name="video-job-sync")
+            self._sync_thread.start()
+
+    def submit(self, input_path: str, output_path: str, output_filename: str, motion_rois: list = None) -> str:
+        with self._lock:
+            self._ensure_started()
+            self._prune()
+            job_id = str(uuid4())
+            cancel_event = self._manager.Event()
+            job = {
+                "job_id": job_id,
+                "status": "queued",
+                "output_filename": output_filename,
+                "input_path": input_path,
+                "created_at": time.time(),
+                "finished_at": None,
+                "error": None,
+                "cancel_event": cancel_event,
+                "stage_seconds_merged": {},
+            }
+            # Visible to the other API processes before it can start
+            insert_job({**self._record(job), "cancel_requested": False})
+            self.jobs[job_id] = job
+            job["future"] = self._executor.submit(
+                _run_video_job, job_id, input_path, output_path, self._progress, cancel_event, motion_rois
+            )
+            job["future"].add_done_callback(lambda f, j=job: self._on_done(j, f))
+        self._ensure_syncing()
+        return job_id
+
+    def _prune(self):
+        cutoff = time.time() - VIDEO_JOB_RETENTION_SEC
+        for job_id in [j for j, job in self.jobs.items() if job["finished_at"] and job["finished_at"] < cutoff]:
+            self._collect_job_metrics(self.jobs.pop(job_id))
+            self._progress.pop(job_id, None)
+
+    def _collect_job_metrics(self, job: dict):
+        # Merge what the worker observed since the last collection into this process's histograms
+        if self._progress is None:
+            return
+        with self._metrics_lock:
+            reported = self._progress.get(job["job_id"], {}).get("stage_seconds")
+            if not reported:
+                return
+            STAGE_SECONDS.merge(snapshot_delta(reported, job["stage_seconds_merged"]))
+            job["stage_seconds_merged"] = reported
+
+    def collect_metrics(self):
+        """
+        Pulls the video stage timings reported by worker processes into this
+        process's STAGE_SECONDS, so /metrics covers them. Called per scrape.
+        Each API process reports the jobs it runs.
+        """
+        for job in list(self.jobs.values()):
+            self._collect_job_metrics(job)
+
+    def _record(self, job: dict) -> dict:
+        """The MongoDB document of a job this process runs, as of now."""
+        progress = dict(self._progress.get(job["job_id"], {})) if self._progress is not None else {}
+        progress.pop("stage_seconds", None)
+        status = job["status"]
+        if status == "queued" and progress.get("status") == "running":
+            status = "running"
+        return {
+            "job_id": job["job_id"],
+            "status": status,
+            "output_filename": job["output_filename"],
+            "progress": progress,
+            "error": job["error"],
+            "created_at": job["created_at"],
+            "finished_at": job["finished_at"],
+            "heartbeat_at": time.time(),
+        }
+
+    def _save(self, job: dict):
+        try:
+            update_job(job["job_id"], self._record(job))
+        except PyMongoError as e:
+            print(f" Could not save video job {job['job_id']}: {e}")
+
+    def _on_done(self, job: dict, future):
+        job["finished_at"] = time.time()
+        self._collect_job_metrics(job)
+        # The worker removes its input; this covers jobs that never reached a worker
+        if os.path.exists(job["input_path"]):
+            os.remove(job["input_path"])
+        if future.cancelled():
+            job["status"] = "cancelled"
+        elif future.exception() is not None:
+            print(f" Error processing video job {job['job_id']}: {future.exception()}")
+            job["status"] = "failed"
+            job["error"] = str(future.exception())
+        elif future.result() is None:
+            job["status"] = "cancelled"
+        else:
+            job["status"] = "completed"
+
+        try:
+            finish_job(job["job_id"], self._record(job), VIDEO_JOB_RETENTION_SEC)
+        except PyMongoError as e:
+            print(f" Could not save video job {job['job_id']}: {e}")
+
+    def _cancel_local(self, job: dict):
+        if job["status"] in ACTIVE_STATES:
+            # Queued jobs are dropped outright; running ones stop at the next frame
+            if job["future"].cancel():
+                job["status"] = "cancelled"
+            else:
+                job["cancel_event"].set()
+                job["status"] = "cancelling"
+                self._save(job)
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancels a job of any API process. Returns False for unknown ids."""
+        job = self.jobs.get(job_id)
+        if job is None:
+            # Run by another process, which stops it on its next sync
+            return request_cancel(job_id)
+        self._cancel_local(job)
+        return True
+
+    def sync(self):
+        """
+        Saves the progress of the jobs this process runs and applies cancel
+        requests made through other processes.
+        """
+        active = [job for job in list(self.jobs.values()) if job["status"] in ACTIVE_STATES]
+        for job_id in find_cancel_requests([job["job_id"] for job in active]):
+            self._cancel_local(self.jobs[job_id])
+        for job in active:
+            if job["status"] in ACTIVE_STATES:
+                update_job(job["job_id"], self._record(job))
+
+    def _sync_loop(self):
+        while not self._stop.wait(VIDEO_JOB_SYNC_SEC):
+            try:
+                self.sync()
+            except PyMongoError as e:
+                print(f" Video job sync failed: {e}")
+
+    def get(self, job_id: str):
+        """
+        Public view of a job: status, progress (frames done, fps, ETA) and events.
+        Returns None for unknown ids.
+        """
+        job = self.jobs.get(job_id)
+        if job is not None:
+            record = self._record(job)
+        else:
+            record = get_job(job_id)
+            if record is None:
+                return None
+            if record["status"] in ACTIVE_STATES and time.time() - record["heartbeat_at"] > VIDEO_JOB_STALE_SEC:
+                record = {**record, "status": "failed", "error": "The process running this job has stopped"}
+
+        progress = record["progress"]
+        status = record["status"]
+        frames_done = progress.get("frames_done", 0)
+        total_frames = progress.get("total_frames")
+        fps = progress.get("fps")
+        eta_sec = None
+        if status == "running" and fps and total_frames:
+            eta_sec = round(max(total_frames - frames_done, 0) / fps, 1)
+
+        return {
+            "job_id": job_id,
+            "status": status,
+            "output_filename": record["output_filename"],
+            "frames_done": frames_done,
+            "total_frames": total_frames,
+            "percent": round(100 * frames_done / total_frames, 1) if total_frames else None,
+            "fps": fps,
+            "eta_sec": eta_sec,
+            "events": progress.get("events", 0),
+            "motion": progress.get("motion"),
+            "error": record["error"],
+            "created_at": record["created_at"],
+            "finished_at": record["finished_at"],
+        }
+
+    def active_jobs(self) -> list:
+        """Queued / running jobs of every API process."""
+        return find_active_job_ids()
+
+    def shutdown(self):
+        self._stop.set()
+        for job in list(self.jobs.values()):
+            self._cancel_local(job)
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._manager.shutdown()
+            self._executor = None
+
+
+video_job_manager = VideoJobManager()
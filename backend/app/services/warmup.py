@@ -0,0 +1,115 @@
+import os
+import threading
+import time
+
+from app.core.model_loader import model_loader, model_pool, warm_up
+from app.repositories.events_repo import backfill_name_lower, ensure_event_indexes
+from app.repositories.jobs_repo import ensure_job_indexes
+from app.repositories.stats_repo import ensure_stats_indexes
+from app.services.gallery_cache import gallery_cache
+from app.services.stats_service import seed_counters
+
+# Set to 0 to skip the background warm-up (e.g. when only importing routes in tests)
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "1") == "1"
+# Wait between attempts when a warm-up step fails (database not reachable yet, ...)
+WARMUP_RETRY_SEC = float(os.getenv("WARMUP_RETRY_SEC", "5"))
+
+# Taken when the app package is first imported, for the startup-to-ready figure
+PROCESS_STARTED = time.monotonic()
+
+
+class Warmup:
+    """
+    Background start-up: loads buffalo_l, runs one dummy inference, syncs
+    the gallery, seeds the dashboard counters and daily rollups, backfills
+    and indexes the event log, without holding up the server's startup.
+
+    Requests that arrive earlier still work (they load what they need on
+    first use); /health/ready reports 503 until every step has finished.
+    """
+
+    def __init__(self):
+        self.model_loaded = False
+        self.warm = False
+        self.gallery_loaded = False
+        self.error = None
+        self.timings = {}
+        self.ready_after_sec = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    @property
+    def ready(self) -> bool:
+        return self.model_loaded and self.warm and self.gallery_loaded
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self.run, daemon=True, name="warmup")
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _step(self, name: str, fn):
+        # Retries until it succeeds or the app shuts down
+        while not self._stop.is_set():
+            start = time.perf_counter()
+            try:
+                result = fn()
+            except Exception as e:
+                self.error = f"{name}: {e}"
+                print(f" Warm-up step '{name}' failed, retrying in {WARMUP_RETRY_SEC}s: {e}")
+                self._stop.wait(WARMUP_RETRY_SEC)
+                continue
+            self.timings[f"{name}_sec"] = round(time.perf_counter() - start, 3)
+            return result
+        return None
+
+    def _warm_inference(self):
+        # New instances are warmed when created; this times a pass on a warm one
+        with model_pool.checkout() as app:
+            warm_up(app)
+
+    def run(self):
+        """Runs every warm-up step in order; blocking (start() runs it on a thread)."""
+        self._step("model_load", model_loader.get_model)
+        self.model_loaded = model_loader.is_loaded()
+
+        self._step("warm_inference", self._warm_inference)
+        self.warm = self.model_loaded and not self._stop.is_set()
+
+        self._step("gallery_sync", gallery_cache.sync)
+        self.gallery_loaded = not self._stop.is_set()
+        if self.gallery_loaded:
+            gallery_cache.start_watcher()
+
+        if self.ready:
+            self.error = None
+            self.ready_after_sec = round(time.monotonic() - PROCESS_STARTED, 3)
+            print(f" Ready after {self.ready_after_sec}s: {self.timings}")
+
+        # Early, so few events are in flight while counting
+        self._step("counters", seed_counters)
+        # Events from before name_lower existed, so /analysis/logs name searches find them
+        self._step("event_names", backfill_name_lower)
+        # Index builds can take a while on a big events collection; not needed to serve
+        self._step("event_indexes", ensure_event_indexes)
+        self._step("stats_indexes", ensure_stats_indexes)
+        self._step("job_indexes", ensure_job_indexes)
+
+    def status(self) -> dict:
+        return {
+            "ready": self.ready,
+            "model_loaded": self.model_loaded,
+            "warm": self.warm,
+            "gallery_loaded": self.gallery_loaded,
+            "gallery_size": len(gallery_cache),
+            "gallery_version": gallery_cache.version,
+            "ready_after_sec": self.ready_after_sec,
+            "timings": self.timings,
+            "error": self.error,
+        }
+
+
+warmup = Warmup()
@@ -0,0 +1,103 @@
+"""
+Recall / speed benchmark for the approximate gallery index.
+
+Builds a synthetic gallery of random unit vectors, queries it with noisy
+copies of known rows, and compares the IVF backend against exact search.
+
+Run from the backend folder:
+    python -m benchmarks.ann_recall --size 100000 --nprobe 4 8 16 32
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from app.core.ann_index import IVFIndex
+from app.core.gallery_index import GalleryIndex, l2_normalize
+
+
+def make_gallery(size: int, dim: int = 512, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return l2_normalize(rng.standard_normal((size, dim), dtype=np.float32))
+
+
+def make_queries(gallery: np.ndarray, n_queries: int, noise: float = 0.6, seed: int = 1):
+    """
+    Noisy copies of random gallery rows, like a second photo of an enrolled person.
+    `noise` is the noise-to-signal norm ratio (0.6 ~ cosine 0.86 to the original).
+    """
+    rng = np.random.default_rng(seed)
+    dim = gallery.shape[1]
+    truth = rng.choice(len(gallery), n_queries, replace=False)
+    noisy = gallery[truth] + (noise / np.sqrt(dim)) * rng.standard_normal((n_queries, dim), dtype=np.float32)
+    return l2_normalize(noisy), truth
+
+
+def run(size: int, n_queries: int, nlist: int, nprobes: list, noise: float) -> dict:
+    gallery = make_gallery(size)
+    queries, _ = make_queries(gallery, n_queries, noise)
+
+    # Exact search in frame-sized chunks, as the video / live paths call it
+    t0 = time.perf_counter()
+    exact = np.concatenate([
+        GalleryIndex._search_matrix(gallery, queries[i:i + 16], 1)[1]
+        for i in range(0, n_queries, 16)
+    ])
+    exact_sec = time.perf_counter() - t0
+
+    ivf = IVFIndex(nlist=nlist)
+    t0 = time.perf_counter()
+    ivf.train(gallery)
+    train_sec = time.perf_counter() - t0
+
+    report = {
+        "benchmark": "ann_recall",
+        "gallery_size": size,
+        "queries": n_queries,
+        "nlist": nlist,
+        "exact_qps": n_queries / exact_sec,
+        "ivf_train_sec": train_sec,
+        "ivf": [],
+    }
+    for nprobe in nprobes:
+        ivf.nprobe = nprobe
+        t0 = time.perf_counter()
+        approx = np.concatenate([
+            ivf.search(queries[i:i + 16], 1)[1]
+            for i in range(0, n_queries, 16)
+        ])
+        sec = time.perf_counter() - t0
+        report["ivf"].append({
+            "nprobe": nprobe,
+            "recall_at_1": float(np.mean(approx[:, 0] == exact[:, 0])),
+            "qps": n_queries / sec,
+            "speedup": exact_sec / sec,
+        })
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--nlist", type=int, default=1024)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 8, 16, 32, 64])
+    parser.add_argument("--noise", type=float, default=0.6)
+    parser.add_argument("--json", action="store_true", help="Print one JSON object instead of a table")
+    args = parser.parse_args()
+
+    report = run(args.size, args.queries, args.nlist, args.nprobe, args.noise)
+    if args.json:
+        print(json.dumps(report))
+        return
+
+    print(f"gallery={report['gallery_size']} queries={report['queries']} nlist={report['nlist']} "
+          f"train={report['ivf_train_sec']:.2f}s exact={report['exact_qps']:.0f} q/s")
+    for row in report["ivf"]:
+        print(f"  nprobe={row['nprobe']:<4} recall@1={row['recall_at_1']:.3f} "
+              f"{row['qps']:.0f} q/s ({row['speedup']:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Cold start benchmark for the API process.
+
+Each run starts a fresh interpreter and measures:
+    import_sec      - `import app.main` (routes, services; no model, no DB connection)
+    model_load_sec, warm_inference_sec, gallery_sync_sec, ready_after_sec
+                    - the background warm-up steps, with --warm
+                      (needs the buffalo_l model and a reachable MONGODB_URI)
+
+Run from the backend folder:
+    python -m benchmarks.cold_start --runs 5
+    python -m benchmarks.cold_start --warm --json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+_CHILD = """
+import json, time
+t0 = time.perf_counter()
+import app.main
+result = {"import_sec": time.perf_counter() - t0}
+if WARM:
+    from app.services.warmup import warmup
+    warmup.run()
+    status = warmup.status()
+    result.update(status["timings"])
+    result["ready_after_sec"] = status["ready_after_sec"]
+    result["error"] = status["error"]
+print(json.dumps(result))
+"""
+
+
+def run_once(warm: bool) -> dict:
+    env = dict(os.environ)
+    # Importing must not need a database; only --warm actually connects
+    env.setdefault("MONGODB_URI", "mongodb://localhost:27017/facelog_ai")
+    env["WARMUP_ON_STARTUP"] = "0"
+    proc = subprocess.run(
+        [sys.executable, "-c", f"WARM = {warm}\n" + _CHILD],
+        capture_output=True, text=True, env=env
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip()[-2000:])
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def run(runs: int, warm: bool) -> dict:
+    samples = [run_once(warm) for _ in range(runs)]
+    keys = [k for k, v in samples[0].items() if isinstance(v, (int, float))]
+    report = {"benchmark": "cold_start", "runs": runs, "warm": warm}
+    for key in keys:
+        values = [s[key] for s in samples if isinstance(s.get(key), (int, float))]
+        report[key] = {"median": statistics.median(values), "min": min(values), "max": max(values)}
+    errors = [s["error"] for s in samples if s.get("error")]
+    if errors:
+        report["errors"] = errors
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--warm", action="store_true", help="Also load the model and sync the gallery")
+    parser.add_argument("--json", action="store_true", help="Print one JSON object instead of a table")
+    args = parser.parse_args()
+
+    report = run(args.runs, args.warm)
+    if args.json:
+        print(json.dumps(report))
+        return
+
+    print(f"cold start over {report['runs']} runs (median / min / max):")
+    for key, value in report.items():
+        if isinstance(value, dict):
+            print(f"  {key:<20} {value['median']:.3f}s / {value['min']:.3f}s / {value['max']:.3f}s")
+    for error in report.get("errors", []):
+        print(f"  error: {error}")
+
+
+if __name__ == "__main__":
+    main()
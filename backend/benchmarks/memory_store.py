@@ -0,0 +1,295 @@
+"""
+In-memory stand-in for the MongoDB database, for benchmarks and tests.
+
+Implements the slice of the pymongo Collection API the app uses (see the
+repositories, event_sink and gallery_cache): find with projection / sort /
+limit, find_one, find_one_and_update, insert_one / insert_many, update_one /
+update_many / bulk_write with $set, $inc, $min, $max, $setOnInsert, $push
+and upsert, count_documents, delete_many. Indexes are no-ops and watch()
+raises, so the gallery cache falls back to polling.
+
+install() points `app.database.get_db` at one shared MemoryDatabase, so every
+LazyCollection in the app resolves to it. Nothing here talks to a server.
+"""
+import copy
+import re
+import threading
+from types import SimpleNamespace
+
+from bson import ObjectId
+from pymongo import ASCENDING, ReturnDocument
+from pymongo.errors import BulkWriteError, OperationFailure
+
+DUPLICATE_KEY = 11000
+
+_TYPE_NAMES = {"string": str, "int": int, "double": float, "bool": bool, "object": dict, "array": list}
+
+
+def _matches_condition(value, condition) -> bool:
+    if not isinstance(condition, dict) or not any(key.startswith("$") for key in condition):
+        return value == condition
+    for op, arg in condition.items():
+        if op == "$exists":
+            ok = (value is not _MISSING) == bool(arg)
+        elif value is _MISSING:
+            ok = op in ("$ne", "$nin")
+        elif op == "$ne":
+            ok = value != arg
+        elif op == "$in":
+            ok = value in arg
+        elif op == "$nin":
+            ok = value not in arg
+        elif op == "$gt":
+            ok = value > arg
+        elif op == "$gte":
+            ok = value >= arg
+        elif op == "$lt":
+            ok = value < arg
+        elif op == "$lte":
+            ok = value <= arg
+        elif op == "$type":
+            ok = isinstance(value, _TYPE_NAMES[arg])
+        elif op == "$regex":
+            ok = isinstance(value, str) and re.search(arg, value) is not None
+        else:
+            raise NotImplementedError(f"query operator {op}")
+        if not ok:
+            return False
+    return True
+
+
+class _Missing:
+    pass
+
+
+_MISSING = _Missing()
+
+
+def matches(doc: dict, query: dict) -> bool:
+    for key, condition in query.items():
+        if key == "$or":
+            if not any(matches(doc, sub) for sub in condition):
+                return False
+        elif key == "$and":
+            if not all(matches(doc, sub) for sub in condition):
+                return False
+        elif not _matches_condition(doc.get(key, _MISSING), condition):
+            return False
+    return True
+
+
+def _project(doc: dict, projection) -> dict:
+    if not projection:
+        return copy.deepcopy(doc)
+    include = {key for key, flag in projection.items() if flag and key != "_id"}
+    if include:
+        out = {key: copy.deepcopy(doc[key]) for key in include if key in doc}
+        if projection.get("_id", 1) and "_id" in doc:
+            out["_id"] = doc["_id"]
+        return out
+    return {key: copy.deepcopy(value) for key, value in doc.items() if projection.get(key, 1)}
+
+
+def _apply_update(doc: dict, update: dict, inserting: bool):
+    for op, fields in update.items():
+        for key, value in fields.items():
+            if op == "$set":
+                doc[key] = copy.deepcopy(value)
+            elif op == "$setOnInsert":
+                if inserting:
+                    doc[key] = copy.deepcopy(value)
+            elif op == "$inc":
+                doc[key] = doc.get(key, 0) + value
+            elif op == "$min":
+                doc[key] = value if key not in doc else min(doc[key], value)
+            elif op == "$max":
+                doc[key] = value if key not in doc else max(doc[key], value)
+            elif op == "$push":
+                doc.setdefault(key, []).append(copy.deepcopy(value))
+            else:
+                raise NotImplementedError(f"update operator {op}")
+
+
+class MemoryCursor:
+    """Lazy result of find(): sort / limit / batch_size chain like pymongo's Cursor."""
+
+    def __init__(self, docs: list, projection):
+        self._docs = docs
+        self._projection = projection
+        self._limit = 0
+
+    def sort(self, key_or_list, direction=ASCENDING):
+        keys = [(key_or_list, direction)] if isinstance(key_or_list, str) else list(key_or_list)
+        # Stable sorts, least significant key first
+        for key, direction in reversed(keys):
+            self._docs.sort(key=lambda doc: (doc.get(key) is not None, doc.get(key)), reverse=direction < 0)
+        return self
+
+    def limit(self, limit: int):
+        self._limit = limit
+        return self
+
+    def batch_size(self, batch_size: int):
+        return self
+
+    def __iter__(self):
+        docs = self._docs[:self._limit] if self._limit else self._docs
+        return (_project(doc, self._projection) for doc in docs)
+
+
+class MemoryCollection:
+    def __init__(self, name: str):
+        self.name = name
+        self._docs = []
+        self._lock = threading.RLock()
+
+    def _find_docs(self, query) -> list:
+        query = query or {}
+        return [doc for doc in self._docs if matches(doc, query)]
+
+    # --- reads ---
+    def find(self, filter=None, projection=None, **kwargs):
+        with self._lock:
+            return MemoryCursor(self._find_docs(filter), projection)
+
+    def find_one(self, filter=None, projection=None, **kwargs):
+        with self._lock:
+            for doc in self._docs:
+                if matches(doc, filter or {}):
+                    return _project(doc, projection)
+        return None
+
+    def count_documents(self, filter, **kwargs) -> int:
+        with self._lock:
+            return len(self._find_docs(filter))
+
+    def estimated_document_count(self, **kwargs) -> int:
+        return len(self._docs)
+
+    # --- writes ---
+    def _insert(self, doc: dict):
+        doc.setdefault("_id", ObjectId())
+        if any(existing["_id"] == doc["_id"] for existing in self._docs):
+            return False
+        self._docs.append(copy.deepcopy(doc))
+        return True
+
+    def insert_one(self, document: dict, **kwargs):
+        with self._lock:
+            if not self._insert(document):
+                raise OperationFailure("duplicate key", code=DUPLICATE_KEY)
+        return SimpleNamespace(inserted_id=document["_id"], acknowledged=True)
+
+    def insert_many(self, documents, ordered: bool = True, **kwargs):
+        inserted, errors = [], []
+        with self._lock:
+            for index, document in enumerate(documents):
+                if self._insert(document):
+                    inserted.append(document["_id"])
+                else:
+                    errors.append({"index": index, "code": DUPLICATE_KEY, "errmsg": "duplicate key"})
+                    if ordered:
+                        break
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nInserted": len(inserted)})
+        return SimpleNamespace(inserted_ids=inserted, acknowledged=True)
+
+    def _update(self, filter: dict, update: dict, upsert: bool, multi: bool):
+        matched = modified = 0
+        upserted_id = None
+        for doc in self._docs:
+            if matches(doc, filter):
+                before = copy.deepcopy(doc)
+                _apply_update(doc, update, inserting=False)
+                matched += 1
+                modified += doc != before
+                if not multi:
+                    break
+        if not matched and upsert:
+            doc = {key: value for key, value in filter.items() if not key.startswith("$")
+                   and not (isinstance(value, dict) and any(k.startswith("$") for k in value))}
+            _apply_update(doc, update, inserting=True)
+            doc.setdefault("_id", ObjectId())
+            self._docs.append(doc)
+            upserted_id = doc["_id"]
+        return matched, modified, upserted_id
+
+    def update_one(self, filter, update, upsert: bool = False, **kwargs):
+        with self._lock:
+            matched, modified, upserted_id = self._update(filter, update, upsert, multi=False)
+        return SimpleNamespace(matched_count=matched, modified_count=modified, upserted_id=upserted_id)
+
+    def update_many(self, filter, update, upsert: bool = False, **kwargs):
+        with self._lock:
+            matched, modified, upserted_id = self._update(filter, update, upsert, multi=True)
+        return SimpleNamespace(matched_count=matched, modified_count=modified, upserted_id=upserted_id)
+
+    def find_one_and_update(self, filter, update, projection=None, upsert: bool = False,
+                            return_document=ReturnDocument.BEFORE, **kwargs):
+        with self._lock:
+            doc = next((doc for doc in self._docs if matches(doc, filter)), None)
+            if doc is None and not upsert:
+                return None
+            before = None if doc is None else _project(doc, projection)
+            self._update(filter, update, upsert, multi=False)
+            if return_document == ReturnDocument.BEFORE:
+                return before
+            after = doc if doc is not None else self._docs[-1]
+            return _project(after, projection)
+
+    def bulk_write(self, requests, ordered: bool = True, **kwargs):
+        matched = modified = upserted = inserted = 0
+        with self._lock:
+            for request in requests:
+                if hasattr(request, "_filter"):
+                    m, n, upserted_id = self._update(request._filter, request._doc,
+                                                     bool(request._upsert), multi=False)
+                    matched += m
+                    modified += n
+                    upserted += upserted_id is not None
+                else:
+                    inserted += self._insert(request._doc)
+        return SimpleNamespace(matched_count=matched, modified_count=modified,
+                               upserted_count=upserted, inserted_count=inserted, acknowledged=True)
+
+    def delete_many(self, filter, **kwargs):
+        with self._lock:
+            keep = [doc for doc in self._docs if not matches(doc, filter)]
+            deleted = len(self._docs) - len(keep)
+            self._docs = keep
+        return SimpleNamespace(deleted_count=deleted, acknowledged=True)
+
+    # --- server features ---
+    def create_index(self, keys, **kwargs):
+        return kwargs.get("name", str(keys))
+
+    def watch(self, *args, **kwargs):
+        raise OperationFailure("The $changeStream stage is only supported on replica sets")
+
+
+class MemoryDatabase:
+    def __init__(self):
+        self._collections = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, name: str) -> MemoryCollection:
+        with self._lock:
+            if name not in self._collections:
+                self._collections[name] = MemoryCollection(name)
+            return self._collections[name]
+
+    def list_collection_names(self) -> list:
+        return list(self._collections)
+
+    def command(self, name, *args, **kwargs):
+        # ping / health checks
+        return {"ok": 1.0}
+
+
+def install() -> MemoryDatabase:
+    """Routes every app collection to a fresh in-memory database."""
+    import app.database
+
+    database = MemoryDatabase()
+    app.database.get_db = lambda: database
+    return database
@@ -0,0 +1,162 @@
+"""
+Deterministic stand-in for insightface's FaceAnalysis, for benchmarks.
+
+Synthetic images (see benchmarks.synthetic) show faces as flat squares on
+a dark background whose colour encodes an identity (three 4-bit levels, one
+per channel). Like SCRFD, the stub "detector" resizes the image to fit its
+input size and finds faces there (bright connected blobs at least
+MIN_FACE_PX wide), so small faces get lost at small detector sizes and the
+cost grows with the input size. The stub "recognizer" reads the identity
+back from the centre of the aligned crop and returns a fixed random unit
+vector for it. So:
+    - the same identity always gets the same embedding (score 1.0), and
+      any two identities are near-orthogonal, like real ArcFace vectors
+    - flat blocks survive video compression, so identities round-trip
+      through mp4 files
+    - boxes, 5-point landmarks and crops go through the real code paths
+      (detect_faces, embed_face_batches, face_align.norm_crop)
+
+`det_delay_ms` / `rec_delay_ms` add a fixed cost per detector call (per
+image) and per recognition call (per crop) to mimic a real model.
+
+Needs the insightface package (Face, face_align) but no model weights.
+"""
+import time
+from functools import lru_cache
+
+import cv2
+import numpy as np
+
+EMBEDDING_DIM = 512
+CELL = 128
+FACE_SIZE = 80
+# Identities 0..MAX_IDENTITIES-1 can be encoded in a colour
+MAX_IDENTITIES = 16 ** 3
+# Smallest face side, in detector input pixels, the stub detector finds
+MIN_FACE_PX = 10
+
+# insightface's ArcFace landmark template for 112x112 crops
+ARCFACE_DST = np.array([
+    [38.2946, 51.6963], [73.5318, 51.5014], [56.0252, 71.7366],
+    [41.5493, 92.3655], [70.7299, 92.2041]
+], dtype=np.float32)
+
+_LEVEL_BASE = 24
+_LEVEL_STEP = 14
+# Cells darker than this in every channel are background
+_EMPTY_BELOW = 12
+
+
+def identity_color(identity: int) -> tuple:
+    """RGB colour of a face block for `identity`."""
+    levels = (identity >> 8 & 15, identity >> 4 & 15, identity & 15)
+    return tuple(_LEVEL_BASE + _LEVEL_STEP * level for level in levels)
+
+
+def decode_color(rgb) -> int:
+    """Identity from a (mean) RGB colour, or -1 for background."""
+    rgb = np.asarray(rgb, dtype=np.float32)
+    if rgb.max() < _EMPTY_BELOW:
+        return -1
+    levels = np.clip(np.rint((rgb - _LEVEL_BASE) / _LEVEL_STEP), 0, 15).astype(int)
+    return int(levels[0] << 8 | levels[1] << 4 | levels[2])
+
+
+@lru_cache(maxsize=MAX_IDENTITIES + 1)
+def _identity_vector(identity: int) -> np.ndarray:
+    vector = np.random.default_rng(identity + 1).standard_normal(EMBEDDING_DIM).astype(np.float32)
+    vector /= np.linalg.norm(vector)
+    vector.flags.writeable = False
+    return vector
+
+
+def identity_embedding(identity: int) -> np.ndarray:
+    """The embedding the stub recognizer returns for `identity` (unit norm)."""
+    return _identity_vector(identity).copy()
+
+
+class StubDetector:
+    """Mimics the SCRFD detector object: input_size and detect()."""
+
+    def __init__(self, delay_ms: float = 0.0):
+        self.input_size = (640, 640)
+        self.delay_ms = delay_ms
+
+    def detect(self, img: np.ndarray, input_size=None, max_num: int = 0, metric: str = "default"):
+        if self.delay_ms:
+            time.sleep(self.delay_ms / 1000)
+        input_size = input_size or self.input_size
+
+        # SCRFD's fit: the longer side (relative to the input box) is resized to the input size
+        height, width = img.shape[:2]
+        if height / width > input_size[1] / input_size[0]:
+            new_height = input_size[1]
+            new_width = int(new_height * width / height)
+        else:
+            new_width = input_size[0]
+            new_height = int(new_width * height / width)
+        det_scale = new_height / height
+        det_img = cv2.resize(img, (new_width, new_height))
+
+        mask = (det_img.max(axis=2) >= _EMPTY_BELOW).astype(np.uint8)
+        count, _, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=4)
+        boxes = [(x, y, w, h) for x, y, w, h, _ in stats[1:count] if min(w, h) >= MIN_FACE_PX]
+        bboxes = np.zeros((len(boxes), 5), dtype=np.float32)
+        kpss = np.zeros((len(boxes), 5, 2), dtype=np.float32)
+        for i, (x, y, w, h) in enumerate(boxes):
+            x1, y1, side = x / det_scale, y / det_scale, max(w, h) / det_scale
+            bboxes[i] = (x1, y1, x1 + side, y1 + side, 0.9)
+            kpss[i] = ARCFACE_DST * (side / 112.0) + (x1, y1)
+        if max_num and len(bboxes) > max_num:
+            bboxes, kpss = bboxes[:max_num], kpss[:max_num]
+        return bboxes, kpss
+
+
+class StubRecognizer:
+    """Mimics insightface's ArcFaceONNX: input_size and get_feat()."""
+
+    def __init__(self, delay_ms: float = 0.0):
+        self.input_size = (112, 112)
+        self.delay_ms = delay_ms
+
+    def get_feat(self, imgs) -> np.ndarray:
+        if not isinstance(imgs, list):
+            imgs = [imgs]
+        if self.delay_ms:
+            time.sleep(self.delay_ms * len(imgs) / 1000)
+        feats = np.empty((len(imgs), EMBEDDING_DIM), dtype=np.float32)
+        for i, crop in enumerate(imgs):
+            centre = crop[48:64, 48:64].reshape(-1, 3).mean(axis=0)
+            feats[i] = _identity_vector(decode_color(centre))
+        return feats
+
+
+class StubFaceAnalysis:
+    """
+    Same surface as insightface.app.FaceAnalysis as far as the app uses it:
+    det_model, models["detection" / "recognition"], prepare() and get().
+    """
+
+    def __init__(self, det_delay_ms: float = 0.0, rec_delay_ms: float = 0.0):
+        self.det_model = StubDetector(det_delay_ms)
+        self.models = {"detection": self.det_model, "recognition": StubRecognizer(rec_delay_ms)}
+
+    def prepare(self, ctx_id: int = 0, det_thresh: float = 0.5, det_size=(640, 640)):
+        self.det_model.input_size = det_size
+
+    def get(self, img: np.ndarray, max_num: int = 0) -> list:
+        from app.core.model_loader import detect_faces, embed_faces
+
+        faces = detect_faces(self, img)
+        embed_faces(self, img, faces)
+        return faces
+
+
+def install(det_delay_ms: float = 0.0, rec_delay_ms: float = 0.0):
+    """
+    Makes the app's model pool build StubFaceAnalysis instances instead of
+    loading buffalo_l. Call before anything checks out a model.
+    """
+    from app.core import model_loader
+
+    model_loader._create_model = lambda: StubFaceAnalysis(det_delay_ms, rec_delay_ms)
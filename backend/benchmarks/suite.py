@@ -0,0 +1,441 @@
+"""
+Offline throughput suite: no model weights, no MongoDB.
+
+The model pool builds deterministic stub models (benchmarks.stub_model)
+and every collection lives in memory (benchmarks.memory_store); videos,
+photos and galleries are synthetic (benchmarks.synthetic). Measures:
+    video       - RecognitionService.process_video frames/s on a generated
+                  mp4, with the pipeline's per-stage timings
+    matching    - GalleryIndex.match matches/s and top-1 accuracy against
+                  galleries of --gallery-sizes identities (1M needs ~4 GB)
+    enrollment  - BulkEnrollment images/s on a generated ZIP, plus the
+                  one-image-per-request path
+    live        - LiveSessionManager capture -> annotated frame latency
+                  with --cameras file sources played in real time
+    detect_scale - detection + embedding ms/frame and face recall on large
+                   frames (--scale-resolutions) with faces of several sizes,
+                   per detector size, downscaling before detection vs
+                   handing the detector the full frame (DETECT_DOWNSCALE)
+
+The stub is much cheaper than buffalo_l; use --det-delay-ms / --rec-delay-ms
+to give it a realistic cost, or read the numbers as "everything but the
+model". Everything is seeded, so runs on the same machine compare directly.
+
+Run from the backend folder:
+    python -m benchmarks.suite
+    python -m benchmarks.suite --only matching --gallery-sizes 1000 100000 1000000
+    python -m benchmarks.suite --det-delay-ms 25 --rec-delay-ms 2 --out before.json
+    python -m benchmarks.suite --only detect_scale --det-sizes 320 480 640 960
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+from benchmarks import memory_store, stub_model, synthetic
+from benchmarks.ann_recall import make_gallery, make_queries
+
+BENCHMARKS = ("video", "matching", "enrollment", "live", "detect_scale")
+
+
+def _percentile(values, q: float):
+    return round(float(np.percentile(values, q)), 2) if len(values) else None
+
+
+def machine_info() -> dict:
+    from app.core.model_loader import MODEL_POOL_SIZE, ORT_INTRA_OP_THREADS
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": commit,
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "model_pool_size": MODEL_POOL_SIZE,
+        "ort_intra_op_threads": ORT_INTRA_OP_THREADS,
+    }
+
+
+def seed_gallery(identities) -> int:
+    """Writes stub identities as person documents and syncs the shared gallery."""
+    from app.repositories.persons_repo import insert_persons
+    from app.services.gallery_cache import gallery_cache
+
+    insert_persons(synthetic.person_docs(identities))
+    gallery_cache.clear()
+    return gallery_cache.sync()
+
+
+def reset_store():
+    memory_store.install()
+    from app.services.gallery_cache import gallery_cache
+    gallery_cache.clear()
+
+
+# --- benchmarks ---
+
+def bench_video(workdir: str, frames: int, width: int, height: int, identities: int,
+                known: int, faces_per_frame: int, detect_stride: int = None, motion_gate: bool = None) -> dict:
+    from app.services.event_sink import event_sink
+    from app.services.recognition_service import RecognitionService
+
+    reset_store()
+    seed_gallery(range(known))
+    input_path = os.path.join(workdir, "input.mp4")
+    output_path = os.path.join(workdir, "output.mp4")
+    video = synthetic.write_video(input_path, frames, width, height, identities=identities,
+                                  faces_per_frame=faces_per_frame)
+
+    service = RecognitionService()
+    start = time.perf_counter()
+    service.process_video(input_path, output_path, detect_stride=detect_stride, motion_gate=motion_gate)
+    elapsed = time.perf_counter() - start
+    event_sink.flush()
+    stats = service.last_pipeline_stats
+
+    return {
+        "video": video,
+        "gallery_size": known,
+        "detect_stride": detect_stride,
+        "elapsed_sec": round(elapsed, 3),
+        "fps": round(frames / elapsed, 2),
+        "pipeline_fps": stats["fps"],
+        "bottleneck": stats["bottleneck"],
+        "stages": {name: stage["busy_sec"] for name, stage in stats["stages"].items()},
+        "identities": stats["identities"],
+        "motion": stats["motion"],
+        "events": stats["events"],
+    }
+
+
+def bench_matching(sizes: list, backends: list, n_queries: int, batch: int) -> dict:
+    from app.core.gallery_index import GalleryIndex
+
+    results = []
+    for size in sizes:
+        gallery = make_gallery(size)
+        queries, truth = make_queries(gallery, min(n_queries, size))
+        ids = [f"p{i}" for i in range(size)]
+        for backend in backends:
+            index = GalleryIndex(backend=backend)
+            start = time.perf_counter()
+            index.load_matrix(gallery, ids, ids)
+            load_sec = time.perf_counter() - start
+
+            latencies = []
+            correct = 0
+            start = time.perf_counter()
+            for i in range(0, len(queries), batch):
+                t0 = time.perf_counter()
+                matches = index.match(queries[i:i + batch])
+                latencies.append((time.perf_counter() - t0) * 1000)
+                correct += sum(m["person_id"] == f"p{t}" for m, t in zip(matches, truth[i:i + batch]))
+            elapsed = time.perf_counter() - start
+
+            results.append({
+                "gallery_size": size,
+                "backend": backend,
+                "ann": index.ann is not None,
+                "load_sec": round(load_sec, 3),
+                "queries": len(queries),
+                "batch": batch,
+                "matches_per_sec": round(len(queries) / elapsed, 1),
+                "batch_ms_p50": _percentile(latencies, 50),
+                "batch_ms_p99": _percentile(latencies, 99),
+                "top1_accuracy": round(correct / len(queries), 4),
+            })
+        del gallery, queries
+    return {"results": results}
+
+
+def bench_enrollment(workdir: str, images: int, single_images: int) -> dict:
+    from app.services.bulk_enrollment import BulkEnrollment
+    from app.services.enrollment_service import EnrollmentService
+
+    reset_store()
+    zip_path = os.path.join(workdir, "enroll.zip")
+    zip_bytes = synthetic.write_enrollment_zip(zip_path, images, first_identity=0, folders=4)
+    faces_dir = os.path.join(workdir, "enrolled_faces")
+
+    summary = None
+    for line in BulkEnrollment(faces_storage_dir=faces_dir).run(zip_path):
+        if line["type"] == "summary":
+            summary = line
+
+    # The per-image path used by /enroll/image, on identities not enrolled yet
+    service = EnrollmentService()
+    service.faces_storage_dir = faces_dir
+    photos = [synthetic.face_image(images + i, seed=i) for i in range(single_images)]
+    start = time.perf_counter()
+    enrolled = 0
+    for i, photo in enumerate(photos):
+        results = service.process_frame_to_embedding(photo, f"single_{i}.jpg")
+        enrolled += sum(1 for r in results if r["status"] == "enrolled")
+    single_sec = time.perf_counter() - start
+
+    return {
+        "zip": {"images": images, "bytes": zip_bytes, **{k: v for k, v in summary.items() if k != "type"}},
+        "single": {
+            "images": single_images,
+            "enrolled": enrolled,
+            "elapsed_sec": round(single_sec, 3),
+            "images_per_sec": round(single_images / single_sec, 2) if single_sec > 0 else None,
+        },
+    }
+
+
+def bench_live(workdir: str, seconds: float, cameras: int, width: int, height: int,
+               identities: int, known: int, faces_per_frame: int, fps: float = 25.0) -> dict:
+    from app.services.live_manager import LiveSessionManager
+
+    reset_store()
+    seed_gallery(range(known))
+    source = os.path.join(workdir, "live.mp4")
+    # A little longer than the run, so no source ends early
+    synthetic.write_video(source, int(fps * (seconds + 2)), width, height, fps=fps,
+                          identities=identities, faces_per_frame=faces_per_frame)
+
+    manager = LiveSessionManager()
+    sessions = []
+    for i in range(cameras):
+        session = manager.start(f"bench-{i}", source)
+        # Keep every sample instead of the last 100 the dashboard shows
+        session.latency_ms = deque()
+        sessions.append(session)
+    time.sleep(seconds)
+    per_camera = [session.stats() for session in sessions]
+    latencies = [ms for session in sessions for ms in session.latency_ms]
+    manager.stop_all()
+
+    return {
+        "cameras": cameras,
+        "seconds": seconds,
+        "source_fps": fps,
+        "frames_processed": sum(s["frames_processed"] for s in per_camera),
+        "frames_skipped": sum(s["frames_skipped"] for s in per_camera),
+        "processed_fps_per_camera": [round(s["processed_fps"], 2) for s in per_camera],
+        "latency_ms_p50": _percentile(latencies, 50),
+        "latency_ms_p95": _percentile(latencies, 95),
+        "latency_ms_p99": _percentile(latencies, 99),
+        "latency_ms_max": round(max(latencies), 2) if latencies else None,
+    }
+
+
+def _iou(a, b) -> float:
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, x2 - x1) * max(0.0, y2 - y1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def _score_faces(faces: list, truth: list) -> tuple:
+    """(found, identified) counts per face size: IoU >= 0.5 box, then same stub identity."""
+    found, identified = {}, {}
+    for x, y, size, identity in truth:
+        box = (x, y, x + size, y + size)
+        best = max(faces, key=lambda face: _iou(face.bbox, box), default=None)
+        if best is None or _iou(best.bbox, box) < 0.5:
+            continue
+        found[size] = found.get(size, 0) + 1
+        if float(np.dot(best.embedding, stub_model.identity_embedding(identity))) > 0.9:
+            identified[size] = identified.get(size, 0) + 1
+    return found, identified
+
+
+def bench_detect_scale(resolutions: list, det_sizes: list, face_sizes: list, frames: int) -> dict:
+    from app.core import model_loader
+    from app.core.model_loader import detect_scaled, embed_face_batches, model_pool, prepare_detection_inputs
+
+    samples = []
+    for width, height in resolutions:
+        for seed in range(frames):
+            frame, truth = synthetic.sized_faces_frame(width, height, face_sizes, identities=1000, seed=seed)
+            samples.append(((width, height), frame, truth))
+
+    saved = (dict(model_loader.DET_SIZES), model_loader.DETECT_DOWNSCALE)
+    results = []
+    try:
+        with model_pool.checkout() as app:
+            for det_size in det_sizes:
+                model_loader.DET_SIZES["video"] = (det_size, det_size)
+                for downscale in (False, True):
+                    model_loader.DETECT_DOWNSCALE = downscale
+                    for resolution in resolutions:
+                        timings, found, identified, total = [], {}, {}, {}
+                        for sample_resolution, frame, truth in samples:
+                            if sample_resolution != resolution:
+                                continue
+                            start = time.perf_counter()
+                            faces = detect_scaled(app, prepare_detection_inputs([frame], "video"), "video")[0]
+                            embed_face_batches(app, [(frame, faces)], bgr=True)
+                            timings.append((time.perf_counter() - start) * 1000)
+
+                            frame_found, frame_identified = _score_faces(faces, truth)
+                            for _, _, size, _ in truth:
+                                total[size] = total.get(size, 0) + 1
+                            for size, count in frame_found.items():
+                                found[size] = found.get(size, 0) + count
+                            for size, count in frame_identified.items():
+                                identified[size] = identified.get(size, 0) + count
+                        results.append({
+                            "resolution": f"{resolution[0]}x{resolution[1]}",
+                            "det_size": det_size,
+                            "downscale": downscale,
+                            "ms_per_frame_p50": _percentile(timings, 50),
+                            "ms_per_frame_mean": round(float(np.mean(timings)), 2),
+                            "recall": round(sum(found.values()) / sum(total.values()), 4),
+                            "identified": round(sum(identified.values()) / sum(total.values()), 4),
+                            "recall_by_face_px": {size: round(found.get(size, 0) / count, 4)
+                                                  for size, count in sorted(total.items())},
+                        })
+    finally:
+        model_loader.DET_SIZES.update(saved[0])
+        model_loader.DETECT_DOWNSCALE = saved[1]
+    return {"face_sizes": face_sizes, "frames_per_resolution": frames, "results": results}
+
+
+def run(args) -> dict:
+    stub_model.install(args.det_delay_ms, args.rec_delay_ms)
+    memory_store.install()
+
+    report = {
+        "benchmark": "suite",
+        "machine": machine_info(),
+        "stub_model": {"det_delay_ms": args.det_delay_ms, "rec_delay_ms": args.rec_delay_ms},
+    }
+    workdir = tempfile.mkdtemp(prefix="facelog_bench_")
+    cwd = os.getcwd()
+    try:
+        # Services write crops / outputs under relative data/ paths
+        os.chdir(workdir)
+        # The app logs to stdout; keep it off the report
+        with contextlib.redirect_stdout(sys.stderr):
+            for name in args.only:
+                start = time.perf_counter()
+                if name == "video":
+                    result = bench_video(workdir, args.video_frames, args.width, args.height, args.identities,
+                                         args.known, args.faces_per_frame, args.detect_stride,
+                                         {"on": True, "off": False}.get(args.motion_gate))
+                elif name == "matching":
+                    result = bench_matching(args.gallery_sizes, args.index_backends, args.queries, args.match_batch)
+                elif name == "enrollment":
+                    result = bench_enrollment(workdir, args.enroll_images, args.single_images)
+                elif name == "detect_scale":
+                    result = bench_detect_scale(args.scale_resolutions, args.det_sizes, args.face_sizes,
+                                                args.scale_frames)
+                else:
+                    result = bench_live(workdir, args.live_seconds, args.cameras, args.width, args.height,
+                                        args.identities, args.known, args.faces_per_frame)
+                result["total_sec"] = round(time.perf_counter() - start, 3)
+                report[name] = result
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+    return report
+
+
+def print_report(report: dict):
+    machine = report["machine"]
+    print(f"{machine['platform']}, {machine['cpu_count']} CPUs, commit {machine['commit']}, "
+          f"stub det {report['stub_model']['det_delay_ms']} ms / rec {report['stub_model']['rec_delay_ms']} ms")
+    if "video" in report:
+        video = report["video"]
+        print(f"\nprocess_video  {video['fps']} fps ({video['video']['frames']} frames "
+              f"{video['video']['width']}x{video['video']['height']}), bottleneck {video['bottleneck']}, "
+              f"{video['events']} events, {video['motion']['skipped']} static detection frames skipped")
+    if "matching" in report:
+        print(f"\n{'gallery':>9} {'backend':>8} {'matches/s':>11} {'p50 ms':>8} {'p99 ms':>8} {'top-1':>7}")
+        for row in report["matching"]["results"]:
+            print(f"{row['gallery_size']:>9} {row['backend']:>8} {row['matches_per_sec']:>11.1f} "
+                  f"{row['batch_ms_p50']:>8.2f} {row['batch_ms_p99']:>8.2f} {row['top1_accuracy']:>7.3f}")
+    if "enrollment" in report:
+        zip_run, single = report["enrollment"]["zip"], report["enrollment"]["single"]
+        print(f"\nenrollment     zip {zip_run['images_per_sec']} images/s ({zip_run['faces_enrolled']} enrolled), "
+              f"single {single['images_per_sec']} images/s")
+    if "live" in report:
+        live = report["live"]
+        print(f"\nlive           {live['cameras']} cameras, fps {live['processed_fps_per_camera']}, "
+              f"latency p50 {live['latency_ms_p50']} ms, p99 {live['latency_ms_p99']} ms, "
+              f"max {live['latency_ms_max']} ms")
+    if "detect_scale" in report:
+        print(f"\n{'frame':>10} {'det':>5} {'input':>10} {'p50 ms':>8} {'mean ms':>8} {'recall':>7} {'ident':>7}  "
+              f"recall by face px")
+        for row in report["detect_scale"]["results"]:
+            by_size = " ".join(f"{size}:{recall:.2f}" for size, recall in row["recall_by_face_px"].items())
+            print(f"{row['resolution']:>10} {row['det_size']:>5} {'downscale' if row['downscale'] else 'full':>10} "
+                  f"{row['ms_per_frame_p50']:>8.2f} {row['ms_per_frame_mean']:>8.2f} {row['recall']:>7.3f} "
+                  f"{row['identified']:>7.3f}  {by_size}")
+
+
+def _resolution(value: str) -> tuple:
+    width, _, height = value.lower().partition("x")
+    return int(width), int(height)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS, default=list(BENCHMARKS))
+    parser.add_argument("--det-delay-ms", type=float, default=0.0, help="Stub detector cost per image")
+    parser.add_argument("--rec-delay-ms", type=float, default=0.0, help="Stub recognizer cost per face")
+    # video / live
+    parser.add_argument("--video-frames", type=int, default=500)
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=768)
+    parser.add_argument("--identities", type=int, default=60, help="Distinct people appearing in videos")
+    parser.add_argument("--known", type=int, default=40, help="How many of them are enrolled")
+    parser.add_argument("--faces-per-frame", type=int, default=4)
+    parser.add_argument("--detect-stride", type=int, default=None, help="Default: VIDEO_DETECT_STRIDE")
+    parser.add_argument("--motion-gate", choices=["env", "on", "off"], default="env",
+                        help="Video motion gate (default: MOTION_GATE_ENABLED)")
+    parser.add_argument("--live-seconds", type=float, default=10.0)
+    parser.add_argument("--cameras", type=int, default=2)
+    # matching
+    parser.add_argument("--gallery-sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--index-backends", nargs="+", default=["exact"], choices=["exact", "ivf", "auto"])
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--match-batch", type=int, default=4, help="Faces per match() call (one frame)")
+    # enrollment
+    parser.add_argument("--enroll-images", type=int, default=500)
+    parser.add_argument("--single-images", type=int, default=100)
+    # detect_scale
+    parser.add_argument("--scale-resolutions", type=_resolution, nargs="+", default=[(1920, 1080), (3840, 2160)],
+                        help="Frame sizes as WIDTHxHEIGHT")
+    parser.add_argument("--det-sizes", type=int, nargs="+", default=[320, 480, 640, 960])
+    parser.add_argument("--face-sizes", type=int, nargs="+", default=[24, 48, 96, 192],
+                        help="Face sides in full-frame pixels")
+    parser.add_argument("--scale-frames", type=int, default=10, help="Frames per resolution")
+    # output
+    parser.add_argument("--json", action="store_true", help="Print one JSON object instead of a table")
+    parser.add_argument("--out", help="Also write the JSON report to this file")
+    args = parser.parse_args()
+
+    report = run(args)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2, default=str)
+    if args.json:
+        print(json.dumps(report, default=str))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""
+Synthetic galleries, images, videos and enrollment archives for benchmarks.
+
+Faces are drawn in the layout the stub model understands (see
+benchmarks.stub_model): flat colour squares centred in CELL x CELL cells on
+a dark, slightly noisy background. Everything is seeded, so two runs with
+the same arguments produce the same data.
+"""
+import os
+import zipfile
+
+import cv2
+import numpy as np
+
+from app.models.person import create_person_document
+from benchmarks.stub_model import CELL, FACE_SIZE, identity_color, identity_embedding
+
+
+def person_docs(identities) -> list:
+    """Person documents (as enrollment would write them) for stub identities."""
+    docs = []
+    for identity in identities:
+        offset = (CELL - FACE_SIZE) // 2
+        docs.append(create_person_document(
+            embedding=identity_embedding(identity),
+            filename=f"person_{identity:04d}.jpg",
+            bbox=[offset, offset, FACE_SIZE, FACE_SIZE],
+            confidence=0.9,
+        ))
+    return docs
+
+
+def background(height: int, width: int, seed: int = 0) -> np.ndarray:
+    # Low noise keeps the encoder honest without reaching the "face" brightness
+    return np.random.default_rng(seed).integers(0, 6, (height, width, 3), dtype=np.uint8)
+
+
+def draw_faces(frame: np.ndarray, faces: dict) -> np.ndarray:
+    """Draws {(row, col): identity} onto a BGR frame in place."""
+    offset = (CELL - FACE_SIZE) // 2
+    for (row, col), identity in faces.items():
+        y, x = row * CELL + offset, col * CELL + offset
+        frame[y:y + FACE_SIZE, x:x + FACE_SIZE] = identity_color(identity)[::-1]
+    return frame
+
+
+def face_image(identity: int, seed: int = 0) -> np.ndarray:
+    """One CELL x CELL BGR image with a single face, like an enrollment photo."""
+    return draw_faces(background(CELL, CELL, seed), {(0, 0): identity})
+
+
+def sized_faces_frame(width: int, height: int, sizes, identities: int, seed: int = 0):
+    """
+    One BGR frame with faces of several `sizes` (pixels) scattered over a
+    grid, like a wide shot with people near and far from the camera.
+    Returns (frame, [(x, y, size, identity), ...]).
+    """
+    rng = np.random.default_rng(seed)
+    pitch = 2 * max(sizes)
+    # Keeps neighbouring faces from touching
+    margin = max(sizes) // 4
+    rows, cols = height // pitch, width // pitch
+    frame = background(height, width, seed)
+    faces = []
+    for i, cell in enumerate(rng.permutation(rows * cols)):
+        size = int(sizes[i % len(sizes)])
+        identity = int(rng.integers(identities))
+        x = int(cell % cols) * pitch + int(rng.integers(pitch - size - margin + 1))
+        y = int(cell // cols) * pitch + int(rng.integers(pitch - size - margin + 1))
+        frame[y:y + size, x:x + size] = identity_color(identity)[::-1]
+        faces.append((x, y, size, identity))
+    return frame, faces
+
+
+def scene(frame_index: int, rows: int, cols: int, identities: int, faces_per_frame: int, dwell: int) -> dict:
+    """
+    Which identity stands in which cell at `frame_index`. The cast changes
+    every `dwell` frames; within that window faces don't move, so trackers
+    and event sessions behave as with people standing in front of a camera.
+    """
+    window = frame_index // dwell
+    rng = np.random.default_rng(window)
+    cells = rng.choice(rows * cols, min(faces_per_frame, rows * cols), replace=False)
+    people = rng.choice(identities, len(cells), replace=len(cells) > identities)
+    return {(int(c) // cols, int(c) % cols): int(p) for c, p in zip(cells, people)}
+
+
+def write_video(path: str, frames: int, width: int = 1280, height: int = 768, fps: float = 25.0,
+                identities: int = 50, faces_per_frame: int = 4, dwell: int = 50) -> dict:
+    """
+    Writes an mp4 (OpenCV mp4v) of moving casts of stub faces. Returns the
+    parameters plus how many face appearances were drawn.
+    """
+    rows, cols = height // CELL, width // CELL
+    base = background(height, width)
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError(f"OpenCV cannot write {path}")
+    appearances = 0
+    try:
+        for index in range(frames):
+            faces = scene(index, rows, cols, identities, faces_per_frame, dwell)
+            appearances += len(faces)
+            writer.write(draw_faces(np.roll(base, index, axis=1), faces))
+    finally:
+        writer.release()
+    return {"frames": frames, "width": width, "height": height, "fps": fps,
+            "identities": identities, "faces_per_frame": faces_per_frame, "face_appearances": appearances}
+
+
+def write_enrollment_zip(path: str, count: int, first_identity: int = 0, folders: int = 0) -> int:
+    """
+    Writes `count` JPEG face photos into a ZIP, optionally spread over
+    `folders` sub-folders. Returns the archive size in bytes.
+    """
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_STORED) as zf:
+        for i in range(count):
+            identity = first_identity + i
+            ok, data = cv2.imencode(".jpg", face_image(identity, seed=i))
+            if not ok:
+                raise RuntimeError("JPEG encoding failed")
+            name = f"person_{identity:04d}.jpg"
+            if folders:
+                name = f"group_{i % folders}/{name}"
+            zf.writestr(name, data.tobytes())
+    return os.path.getsize(path)
@@ -0,0 +1,221 @@
+"""
+Throughput / memory benchmark for serving processed videos.
+
+Writes a large file into a scratch data/processed folder, starts uvicorn in
+a child process with either the current /recognize/video route or the old
+`yield from f` generator (--legacy), then measures:
+    full_download   - MB/s for a complete GET
+    seeks           - latency of random Range requests (206) and whether
+                      each returned exactly the requested bytes
+    revalidate      - status of a GET with If-None-Match (304 expected)
+    server_max_rss_mb
+                    - peak memory of the server process
+
+The file repeats one random 1 MiB block, so it has "lines" of realistic,
+arbitrary length for the legacy generator. Sizes of several GB work; the
+scratch folder is deleted afterwards.
+
+Run from the backend folder:
+    python -m benchmarks.video_serving --size-mb 4096
+    python -m benchmarks.video_serving --size-mb 1024 --legacy --json
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FILENAME = "benchmark.mp4"
+
+_SERVER = """
+import os
+import uvicorn
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+
+app = FastAPI()
+if LEGACY:
+    @app.get("/recognize/video/{filename}")
+    def serve_video(filename: str):
+        file_path = os.path.join("data", "processed", filename)
+
+        def iterfile():
+            with open(file_path, "rb") as f:
+                yield from f
+
+        return StreamingResponse(iterfile(), media_type="video/mp4")
+else:
+    from app.routes.recognition import router
+    app.include_router(router)
+
+uvicorn.run(app, host="127.0.0.1", port=PORT, log_level="warning")
+"""
+
+
+def write_file(path: str, size_mb: int, seed: int = 0):
+    block = random.Random(seed).randbytes(1024 * 1024)
+    with open(path, "wb") as f:
+        for _ in range(size_mb):
+            f.write(block)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(workdir: str, port: int, legacy: bool) -> subprocess.Popen:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = BACKEND_DIR + os.pathsep + env.get("PYTHONPATH", "")
+    env.setdefault("MONGODB_URI", "mongodb://localhost:27017/facelog_ai")
+    env["WARMUP_ON_STARTUP"] = "0"
+    proc = subprocess.Popen(
+        [sys.executable, "-c", f"LEGACY = {legacy}\nPORT = {port}\n" + _SERVER],
+        cwd=workdir, env=env
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                return proc
+        except OSError:
+            if proc.poll() is not None:
+                raise RuntimeError("server exited during startup")
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("server did not start")
+
+
+def stop_server(proc: subprocess.Popen) -> float:
+    """Stops the server and returns its peak RSS in MB (Linux reports ru_maxrss in KB)."""
+    proc.terminate()
+    _, _, usage = os.wait4(proc.pid, 0)
+    return usage.ru_maxrss / 1024
+
+
+def request(conn: http.client.HTTPConnection, url: str, headers: dict = None):
+    conn.request("GET", url, headers=headers or {})
+    return conn.getresponse()
+
+
+def full_download(conn: http.client.HTTPConnection, url: str) -> dict:
+    start = time.perf_counter()
+    received = 0
+    response = request(conn, url)
+    while True:
+        chunk = response.read(1024 * 1024)
+        if not chunk:
+            break
+        received += len(chunk)
+    headers = response.headers
+    elapsed = time.perf_counter() - start
+    return {
+        "bytes": received,
+        "sec": round(elapsed, 3),
+        "mb_per_sec": round(received / 1024 / 1024 / elapsed, 1),
+        "content_length": headers.get("content-length"),
+        "accept_ranges": headers.get("accept-ranges"),
+        "etag": headers.get("etag"),
+    }
+
+
+def seeks(conn: http.client.HTTPConnection, url: str, path: str, count: int, span: int, seed: int = 1) -> dict:
+    size = os.path.getsize(path)
+    rng = random.Random(seed)
+    latencies = []
+    correct = 0
+    statuses = set()
+    with open(path, "rb") as f:
+        for _ in range(count):
+            start = rng.randrange(0, max(1, size - span))
+            end = min(size, start + span) - 1
+            t0 = time.perf_counter()
+            response = request(conn, url, {"Range": f"bytes={start}-{end}"})
+            body = response.read()
+            latencies.append(time.perf_counter() - t0)
+            statuses.add(response.status)
+            f.seek(start)
+            correct += response.status == 206 and body == f.read(end - start + 1)
+    latencies.sort()
+    return {
+        "requests": count,
+        "span_bytes": span,
+        "statuses": sorted(statuses),
+        "correct": correct,
+        "ms_median": round(1000 * latencies[len(latencies) // 2], 2),
+        "ms_max": round(1000 * latencies[-1], 2),
+    }
+
+
+def run(size_mb: int, legacy: bool, seek_count: int, seek_span: int) -> dict:
+    workdir = tempfile.mkdtemp(prefix="video_serving_")
+    try:
+        processed = os.path.join(workdir, "data", "processed")
+        os.makedirs(processed)
+        os.makedirs(os.path.join(workdir, "data", "enrolled_faces"))
+        path = os.path.join(processed, FILENAME)
+        write_file(path, size_mb)
+
+        port = free_port()
+        url = f"/recognize/video/{FILENAME}"
+        proc = start_server(workdir, port, legacy)
+        conn = http.client.HTTPConnection("127.0.0.1", port)
+        try:
+            download = full_download(conn, url)
+            seek = seeks(conn, url, path, seek_count, seek_span)
+            revalidate = None
+            if download["etag"]:
+                response = request(conn, url, {"If-None-Match": download["etag"]})
+                response.read()
+                revalidate = response.status
+        finally:
+            conn.close()
+            max_rss = stop_server(proc)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "benchmark": "video_serving",
+        "mode": "legacy" if legacy else "current",
+        "size_mb": size_mb,
+        "full_download": download,
+        "seeks": seek,
+        "revalidate_status": revalidate,
+        "server_max_rss_mb": round(max_rss, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=int, default=2048)
+    parser.add_argument("--legacy", action="store_true", help="Serve with the old `yield from f` generator")
+    parser.add_argument("--seeks", type=int, default=50)
+    parser.add_argument("--seek-span", type=int, default=256 * 1024, help="Bytes per Range request")
+    parser.add_argument("--json", action="store_true", help="Print one JSON object instead of a table")
+    args = parser.parse_args()
+
+    report = run(args.size_mb, args.legacy, args.seeks, args.seek_span)
+    if args.json:
+        print(json.dumps(report))
+        return
+
+    download, seek = report["full_download"], report["seeks"]
+    print(f"{report['mode']} route, {report['size_mb']} MB file:")
+    print(f"  full download      {download['mb_per_sec']} MB/s ({download['sec']}s), "
+          f"Content-Length={download['content_length']}, Accept-Ranges={download['accept_ranges']}")
+    print(f"  range requests     {seek['correct']}/{seek['requests']} correct 206, "
+          f"median {seek['ms_median']} ms, max {seek['ms_max']} ms (statuses {seek['statuses']})")
+    print(f"  If-None-Match      {report['revalidate_status']}")
+    print(f"  server peak RSS    {report['server_max_rss_mb']} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+"""
+Adds the lowercased `name_lower` field to recognition events written before
+it existed, so /analysis/logs name searches find them through the index.
+
+The API's start-up warm-up runs the same backfill; this script does it
+ahead of a deploy (e.g. on a large log). Safe to re-run: only events
+without name_lower are touched.
+
+Run from the backend folder:
+    python -m scripts.backfill_event_names
+"""
+import argparse
+
+from app.repositories.events_repo import backfill_name_lower, ensure_event_indexes, events_collection
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--dry-run", action="store_true", help="only count the events to update")
+    args = parser.parse_args()
+
+    pending = events_collection.count_documents({"name_lower": {"$exists": False}, "name": {"$type": "string"}})
+    print(f"{pending} events without name_lower.")
+    if args.dry_run:
+        return
+
+    if pending:
+        updated = backfill_name_lower(args.batch_size)
+        print(f"Updated {updated} events.")
+    ensure_event_indexes()
+    print("Event indexes are in place.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+"""
+Converts person embeddings stored as lists of doubles into compact BSON Binary.
+
+Safe to re-run: only documents whose embedding_dtype differs from the target
+are touched. Also converts between float32 and float16.
+
+Run from the backend folder:
+    python -m scripts.migrate_embeddings
+    python -m scripts.migrate_embeddings --dtype float16
+"""
+import argparse
+
+from app.core.embedding_codec import EMBEDDING_STORE_DTYPE
+from app.repositories.persons_repo import migrate_embeddings, persons_collection
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dtype", choices=["float32", "float16"], default=EMBEDDING_STORE_DTYPE)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--dry-run", action="store_true", help="only count the documents to convert")
+    args = parser.parse_args()
+
+    pending = persons_collection.count_documents({"embedding_dtype": {"$ne": args.dtype}})
+    print(f"{pending} person documents to convert to {args.dtype}.")
+    if args.dry_run or pending == 0:
+        return
+
+    migrated = migrate_embeddings(args.dtype, args.batch_size)
+    print(f"Converted {migrated} documents.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Shared fixtures. Tests never need a MongoDB server or model weights: every
+collection is routed to benchmarks.memory_store, and code that needs a
+model uses benchmarks.stub_model.
+
+Run from the backend folder:
+    python -m pytest
+"""
+import os
+import sys
+
+# Before anything imports app.database / app.main
+os.environ.setdefault("MONGODB_URI", "mongodb://localhost:27017/facelog_ai_test")
+os.environ.setdefault("WARMUP_ON_STARTUP", "0")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pytest
+
+from benchmarks import memory_store
+
+
+@pytest.fixture
+def db():
+    """A fresh in-memory database behind every app collection, and an empty gallery."""
+    from app.services.gallery_cache import gallery_cache
+
+    database = memory_store.install()
+    gallery_cache.clear()
+    return database
+
+
+@pytest.fixture(scope="session")
+def stub_models():
+    """The model pool builds benchmarks.stub_model instances instead of loading buffalo_l."""
+    pytest.importorskip("insightface")
+    from benchmarks import stub_model
+
+    stub_model.install()
+
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(0)
+
+
+def unit_rows(rng, n: int, dim: int = 512) -> np.ndarray:
+    rows = rng.standard_normal((n, dim)).astype(np.float32)
+    return rows / np.linalg.norm(rows, axis=1, keepdims=True)
@@ -0,0 +1,107 @@
+import zipfile
+
+import cv2
+import pytest
+
+from app.models.person import create_person_document
+from app.repositories.persons_repo import insert_person, mark_duplicates
+from app.repositories.stats_repo import ENROLLED_FACES_COUNTER, seed_counter
+from app.services import bulk_enrollment, dedup_service
+from app.services.bulk_enrollment import BulkEnrollment
+from app.services.gallery_cache import gallery_cache
+from benchmarks import stub_model, synthetic
+
+
+def write_zip(path, photos):
+    """photos: [(member name, identity, seed)]"""
+    with zipfile.ZipFile(path, "w") as zf:
+        for name, identity, seed in photos:
+            if identity is None:
+                zf.writestr(name, b"boom")
+                continue
+            ok, data = cv2.imencode(".jpg", synthetic.face_image(identity, seed=seed))
+            assert ok
+            zf.writestr(name, data.tobytes())
+    return str(path)
+
+
+def run(tmp_path, zip_path, **kwargs):
+    lines = list(BulkEnrollment(faces_storage_dir=str(tmp_path / "faces"), **kwargs).run(zip_path))
+    files = {line["filename"]: line for line in lines if line["type"] == "file"}
+    return files, lines[-1]
+
+
+def enroll_existing(identity):
+    doc = create_person_document(stub_model.identity_embedding(identity), "existing.jpg", [0, 0, 80, 80], 0.9)
+    insert_person(doc)
+    gallery_cache.add(doc)
+    return doc
+
+
+def test_reject_catches_duplicates_within_the_archive(db, stub_models, tmp_path):
+    zip_path = write_zip(tmp_path / "a.zip", [("alice_1.jpg", 5, 1), ("alice_2.jpg", 5, 2), ("bob.jpg", 6, 3)])
+
+    files, summary = run(tmp_path, zip_path, on_duplicate="reject")
+
+    assert files["alice_1.jpg"]["status"] == "enrolled"
+    assert files["bob.jpg"]["status"] == "enrolled"
+    rejected = files["alice_2.jpg"]
+    assert rejected["status"] == "failed"
+    assert rejected["results"][0]["duplicate_of"]["person_id"] == files["alice_1.jpg"]["results"][0]["person_id"]
+    assert db["persons"].count_documents({}) == 2
+    assert summary["faces_enrolled"] == 2
+
+
+def test_merge_within_the_archive_folds_into_the_pending_person(db, stub_models, tmp_path):
+    zip_path = write_zip(tmp_path / "a.zip", [("alice_1.jpg", 5, 1), ("alice_2.jpg", 5, 2), ("alice_3.jpg", 5, 3)])
+
+    files, summary = run(tmp_path, zip_path, on_duplicate="merge")
+
+    person_id = files["alice_1.jpg"]["results"][0]["person_id"]
+    assert [files[f"alice_{i}.jpg"]["status"] for i in (1, 2, 3)] == ["enrolled", "merged", "merged"]
+    [person] = list(db["persons"].find({}))
+    assert person["person_id"] == person_id
+    assert person["samples"] == 3
+    assert len(person["merged_samples"]) == 2
+    assert summary["faces_merged"] == 2
+    assert len(gallery_cache) == 1
+
+
+def test_merge_with_failed_crop_write_is_an_error(db, stub_models, tmp_path, monkeypatch):
+    existing = enroll_existing(5)
+    monkeypatch.setattr(cv2, "imwrite", lambda path, image: False)
+    zip_path = write_zip(tmp_path / "a.zip", [("alice.jpg", 5, 1)])
+
+    files, summary = run(tmp_path, zip_path, on_duplicate="merge")
+
+    assert files["alice.jpg"]["status"] == "failed"
+    assert files["alice.jpg"]["results"][0]["reason"] == "Could not save face crop"
+    assert "merged_samples" not in db["persons"].find_one({"person_id": existing["person_id"]})
+    assert summary["faces_merged"] == 0
+
+
+def test_merge_into_a_deactivated_person_fails(db, stub_models, tmp_path):
+    existing = enroll_existing(5)
+    mark_duplicates([existing["person_id"]], "someone-else")
+
+    assert dedup_service.merge_sample(existing["person_id"], stub_model.identity_embedding(5), {}) is None
+
+
+def test_pending_documents_are_inserted_when_the_archive_fails(db, stub_models, tmp_path, monkeypatch):
+    decode = bulk_enrollment._decode
+
+    def failing_decode(data):
+        if data == b"boom":
+            raise RuntimeError("decoder crashed")
+        return decode(data)
+
+    monkeypatch.setattr(bulk_enrollment, "_decode", failing_decode)
+    seed_counter(ENROLLED_FACES_COUNTER, lambda: 0)
+    zip_path = write_zip(tmp_path / "a.zip", [("alice.jpg", 5, 1), ("bob.jpg", 6, 2), ("broken.jpg", None, 0)])
+
+    with pytest.raises(RuntimeError):
+        run(tmp_path, zip_path, batch_size=1)
+
+    assert db["persons"].count_documents({}) == 2
+    assert len(gallery_cache) == 2
+    assert db["counters"].find_one({"_id": "enrolled_faces"})["value"] == 2
@@ -0,0 +1,86 @@
+from itertools import combinations
+
+import numpy as np
+import pytest
+
+from app.core.gallery_index import l2_normalize
+from app.models.person import create_person_document
+from app.repositories.persons_repo import insert_persons
+from app.services import dedup_service
+from app.services.dedup_service import _UnionFind, _similar_pairs
+from conftest import unit_rows
+
+
+def test_union_find_is_transitive_and_keeps_lowest_root():
+    groups = _UnionFind(6)
+    groups.union(4, 2)
+    groups.union(2, 5)
+    groups.union(1, 3)
+
+    assert groups.find(5) == groups.find(4) == groups.find(2) == 2
+    assert groups.find(3) == groups.find(1) == 1
+    assert groups.find(0) == 0
+
+    groups.union(5, 3)
+    assert {groups.find(i) for i in range(1, 6)} == {1}
+
+
+@pytest.mark.parametrize("block_size", [1, 7, 64, 1000])
+def test_similar_pairs_matches_brute_force(rng, block_size):
+    base = unit_rows(rng, 40)
+    # Near copies of some rows so there are pairs above the threshold
+    embeddings = l2_normalize(np.vstack([base, base[:15] + 0.05 * unit_rows(rng, 15)]))
+    threshold = 0.9
+
+    found = set()
+    for rows, cols, _ in _similar_pairs(embeddings, threshold, block_size):
+        found.update(zip(rows.tolist(), cols.tolist()))
+
+    sims = embeddings @ embeddings.T
+    expected = {(i, j) for i, j in combinations(range(len(embeddings)), 2) if sims[i, j] >= threshold}
+    assert found == expected
+    assert len(expected) >= 15
+
+
+def enroll(embeddings):
+    docs = []
+    for i, embedding in enumerate(embeddings):
+        doc = create_person_document(embedding, f"person_{i}.jpg", [0, 0, 10, 10], 0.9)
+        doc["created_at"] = doc["created_at"].replace(microsecond=i)
+        docs.append(doc)
+    insert_persons(docs)
+    return docs
+
+
+def test_duplicate_clusters_are_transitive_and_keep_the_oldest(db, rng):
+    a = unit_rows(rng, 1)[0]
+    b = l2_normalize(a + 0.35 * unit_rows(rng, 1)[0])[0]
+    # c is close to b but not necessarily to a: still one cluster through b
+    c = l2_normalize(b + 0.35 * unit_rows(rng, 1)[0])[0]
+    stranger = unit_rows(rng, 1)[0]
+    docs = enroll([b, stranger, a, c])
+    threshold = min(float(a @ b), float(b @ c)) - 0.01
+    assert float(a @ c) < threshold
+
+    report = dedup_service.find_duplicate_clusters(threshold, block_size=2)
+
+    assert report["persons_scanned"] == 4
+    assert report["duplicates"] == 2
+    [cluster] = report["clusters"]
+    assert cluster["keep"]["person_id"] == docs[0]["person_id"]
+    assert {d["person_id"] for d in cluster["duplicates"]} == {docs[2]["person_id"], docs[3]["person_id"]}
+
+
+def test_deduplicate_soft_deletes_duplicates(db, rng):
+    a = unit_rows(rng, 1)[0]
+    docs = enroll([a, l2_normalize(a + 0.05 * unit_rows(rng, 1)[0])[0], unit_rows(rng, 1)[0]])
+
+    dry_run = dedup_service.deduplicate(0.9)
+    assert dry_run["deactivated"] == 0
+    assert db["persons"].count_documents({"status": "active"}) == 3
+
+    report = dedup_service.deduplicate(0.9, apply=True)
+    assert report["deactivated"] == 1
+    duplicate = db["persons"].find_one({"person_id": docs[1]["person_id"]})
+    assert duplicate["status"] == "duplicate"
+    assert duplicate["merged_into"] == docs[0]["person_id"]
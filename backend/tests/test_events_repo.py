@@ -0,0 +1,136 @@
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.repositories import events_repo
+from app.routes import analysis
+
+BASE = datetime(2026, 1, 22, 9, 0, 0)
+
+
+def make_event(name: str, created_at: datetime, date: str = "22-01-2026", camera_id: str = "cam-1"):
+    return {
+        "_id": ObjectId(),
+        "name": name,
+        "name_lower": name.lower(),
+        "date": date,
+        "camera_id": camera_id,
+        "created_at": created_at,
+    }
+
+
+@pytest.fixture
+def client(db):
+    app = FastAPI()
+    app.include_router(analysis.router)
+    return TestClient(app)
+
+
+def test_insert_events_skips_documents_already_written(db):
+    events = [make_event(f"Person {i}", BASE + timedelta(seconds=i)) for i in range(5)]
+    assert events_repo.insert_events(events[:3]) == 3
+
+    # A retried batch overlapping what was already written
+    assert events_repo.insert_events(events) == 2
+    assert events_repo.insert_events(events) == 0
+    assert db["recognition_events"].count_documents({}) == 5
+
+
+def test_insert_events_empty_batch(db):
+    assert events_repo.insert_events([]) == 0
+
+
+def fetch_pages(client, **params):
+    pages, cursor = [], None
+    while True:
+        query = dict(params)
+        if cursor:
+            query["cursor"] = cursor
+        response = client.get("/analysis/logs", params=query)
+        assert response.status_code == 200
+        pages.append(response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            return pages
+
+
+def test_logs_keyset_pages_are_disjoint_and_ordered(db, client):
+    events = []
+    for i in range(23):
+        # Groups of three share a timestamp, so _id has to break the ties
+        events.append(make_event(f"Person {i}", BASE + timedelta(seconds=i // 3)))
+    events_repo.insert_events(events)
+
+    pages = fetch_pages(client, limit=5)
+    assert [len(page) for page in pages] == [5, 5, 5, 5, 3]
+
+    rows = [row for page in pages for row in page]
+    expected = sorted(events, key=lambda e: (e["created_at"], e["_id"]), reverse=True)
+    assert [row["name"] for row in rows] == [e["name"] for e in expected]
+    assert all("_id" not in row for row in rows)
+
+
+def test_logs_last_full_page_has_no_cursor(db, client):
+    events_repo.insert_events([make_event(f"Person {i}", BASE + timedelta(seconds=i)) for i in range(4)])
+    response = client.get("/analysis/logs", params={"limit": 4})
+    assert len(response.json()) == 4
+    assert "X-Next-Cursor" not in response.headers
+
+
+def test_logs_name_filters(db, client):
+    events_repo.insert_events([
+        make_event("Abdul Khan", BASE),
+        make_event("Abdul Rahman", BASE + timedelta(seconds=1)),
+        make_event("Sara Abdul", BASE + timedelta(seconds=2)),
+    ])
+
+    contains = client.get("/analysis/logs", params={"name": "abdul"}).json()
+    assert [row["name"] for row in contains] == ["Sara Abdul", "Abdul Rahman", "Abdul Khan"]
+
+    prefix = client.get("/analysis/logs", params={"name": "abdul", "match": "prefix"}).json()
+    assert [row["name"] for row in prefix] == ["Abdul Rahman", "Abdul Khan"]
+
+    exact = client.get("/analysis/logs", params={"name": "ABDUL KHAN", "match": "exact"}).json()
+    assert [row["name"] for row in exact] == ["Abdul Khan"]
+
+
+def test_logs_name_search_is_literal(db, client):
+    events_repo.insert_events([make_event("A.B Khan", BASE), make_event("AxB Khan", BASE + timedelta(seconds=1))])
+
+    rows = client.get("/analysis/logs", params={"name": "a.b"}).json()
+    assert [row["name"] for row in rows] == ["A.B Khan"]
+    assert client.get("/analysis/logs", params={"name": "a", "match": "fuzzy"}).status_code == 400
+
+
+def test_backfilled_events_are_found_by_name(db, client):
+    legacy = make_event("Abdul Khan", BASE)
+    del legacy["name_lower"]
+    events_repo.insert_events([legacy])
+    assert client.get("/analysis/logs", params={"name": "abdul"}).json() == []
+
+    assert events_repo.backfill_name_lower() == 1
+    assert events_repo.backfill_name_lower() == 0
+    assert [row["name"] for row in client.get("/analysis/logs", params={"name": "abdul"}).json()] == ["Abdul Khan"]
+
+
+def test_logs_filters_combine_with_pagination(db, client):
+    events = [make_event("Abdul Khan", BASE + timedelta(seconds=i), camera_id=f"cam-{i % 2}") for i in range(10)]
+    events_repo.insert_events(events)
+
+    pages = fetch_pages(client, name="abdul", camera_id="cam-1", limit=2)
+    rows = [row for page in pages for row in page]
+    assert len(rows) == 5
+    assert {row["camera_id"] for row in rows} == {"cam-1"}
+
+
+def test_logs_rejects_bad_cursor(db, client):
+    response = client.get("/analysis/logs", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+
+def test_log_cursor_round_trip():
+    event = make_event("Abdul Khan", BASE)
+    assert events_repo.decode_log_cursor(events_repo.encode_log_cursor(event)) == (event["created_at"], event["_id"])
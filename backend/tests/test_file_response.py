@@ -0,0 +1,70 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.file_response import MediaFileResponse
+
+DATA = bytes(range(256)) * 40
+
+
+@pytest.fixture
+def client(tmp_path):
+    path = tmp_path / "clip.mp4"
+    path.write_bytes(DATA)
+    app = FastAPI()
+
+    @app.get("/video")
+    def video():
+        return MediaFileResponse(str(path), media_type="video/mp4", headers={"cache-control": "no-cache"})
+
+    return TestClient(app)
+
+
+def test_full_download(client):
+    response = client.get("/video")
+    assert response.status_code == 200
+    assert response.content == DATA
+    assert response.headers["accept-ranges"] == "bytes"
+    assert response.headers["content-length"] == str(len(DATA))
+
+
+@pytest.mark.parametrize("http_range, start, end", [
+    ("bytes=0-99", 0, 100),
+    ("bytes=1000-", 1000, len(DATA)),
+    ("bytes=-500", len(DATA) - 500, len(DATA)),
+])
+def test_range_requests_answer_206(client, http_range, start, end):
+    response = client.get("/video", headers={"range": http_range})
+    assert response.status_code == 206
+    assert response.content == DATA[start:end]
+    assert response.headers["content-range"] == f"bytes {start}-{end - 1}/{len(DATA)}"
+    assert response.headers["content-length"] == str(end - start)
+
+
+def test_unsatisfiable_range_answers_416(client):
+    response = client.get("/video", headers={"range": f"bytes={len(DATA)}-"})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(DATA)}"
+
+
+def test_stale_if_range_sends_the_whole_file(client):
+    response = client.get("/video", headers={"range": "bytes=0-99", "if-range": '"not-the-etag"'})
+    assert response.status_code == 200
+    assert response.content == DATA
+
+
+def test_matching_etag_answers_304(client):
+    etag = client.get("/video").headers["etag"]
+    response = client.get("/video", headers={"if-none-match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+    assert response.headers["cache-control"] == "no-cache"
+
+    assert client.get("/video", headers={"if-none-match": '"other"'}).status_code == 200
+
+
+def test_if_modified_since_answers_304(client):
+    last_modified = client.get("/video").headers["last-modified"]
+    assert client.get("/video", headers={"if-modified-since": last_modified}).status_code == 304
+    assert client.get("/video", headers={"if-modified-since": "Mon, 01 Jan 2001 00:00:00 GMT"}).status_code == 200
@@ -0,0 +1,56 @@
+from datetime import datetime, timedelta
+
+from app.core.embedding_codec import encode_embedding
+from app.database import persons_collection
+from app.models.person import create_person_document
+from app.repositories.persons_repo import insert_person
+from app.services.gallery_cache import gallery_cache
+from conftest import unit_rows
+
+BASE = datetime(2026, 1, 22, 9, 0, 0)
+
+
+def make_person(embedding, name: str, updated_at: datetime):
+    doc = create_person_document(embedding, f"{name}.jpg", [0, 0, 80, 80], 0.9)
+    doc["updated_at"] = updated_at
+    return doc
+
+
+def best_match(embedding):
+    return gallery_cache.index.match(embedding[None, :])[0]
+
+
+def test_local_add_does_not_hide_earlier_changes_from_other_processes(db, rng):
+    old, new, local = unit_rows(rng, 3)
+    alice = make_person(old, "alice", BASE)
+    insert_person(alice)
+    gallery_cache.sync()
+
+    # Another process merges a sample into Alice, then this process enrolls Bob a little later
+    persons_collection.update_one({"person_id": alice["person_id"]},
+                                  {"$set": {**encode_embedding(new), "updated_at": BASE + timedelta(seconds=1)}})
+    bob = make_person(local, "bob", BASE + timedelta(seconds=2))
+    insert_person(bob)
+    gallery_cache.add(bob)
+    assert gallery_cache.watermark == BASE
+
+    gallery_cache.sync()
+
+    assert best_match(new)["person_id"] == alice["person_id"]
+    assert best_match(old)["is_known"] is False
+    assert best_match(local)["person_id"] == bob["person_id"]
+    assert gallery_cache.watermark == BASE + timedelta(seconds=2)
+
+
+def test_apply_removes_inactive_persons_and_advances_the_watermark(db, rng):
+    embedding = unit_rows(rng, 1)[0]
+    alice = make_person(embedding, "alice", BASE)
+    insert_person(alice)
+    gallery_cache.sync()
+    version = gallery_cache.version
+
+    gallery_cache._apply({**alice, "status": "inactive", "updated_at": BASE + timedelta(seconds=5)})
+
+    assert len(gallery_cache) == 0
+    assert gallery_cache.version == version + 1
+    assert gallery_cache.watermark == BASE + timedelta(seconds=5)
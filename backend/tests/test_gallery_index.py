@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from app.core import gallery_index
+from app.core.gallery_index import GalleryIndex, l2_normalize
+from conftest import unit_rows
+
+
+def brute_force(embeddings, queries, k):
+    sims = queries @ embeddings.T
+    order = np.argsort(-sims, axis=1, kind="stable")[:, :k]
+    return np.take_along_axis(sims, order, axis=1), order
+
+
+def make_index(rng, n, backend="exact"):
+    embeddings = unit_rows(rng, n)
+    index = GalleryIndex(backend)
+    index.load_matrix(embeddings, [f"id{i}" for i in range(n)], [f"name{i}" for i in range(n)])
+    return index, embeddings
+
+
+@pytest.mark.parametrize("k", [1, 5])
+def test_exact_search_matches_brute_force(rng, k):
+    index, embeddings = make_index(rng, 500)
+    queries = unit_rows(rng, 20)
+
+    scores, indices = index.search(queries, k)
+    expected_scores, expected_indices = brute_force(embeddings, queries, k)
+
+    np.testing.assert_array_equal(indices, expected_indices)
+    np.testing.assert_allclose(scores, expected_scores, rtol=1e-5, atol=1e-6)
+
+
+def test_search_pads_when_gallery_is_smaller_than_k(rng):
+    index, _ = make_index(rng, 3)
+    scores, indices = index.search(unit_rows(rng, 2), k=5)
+    assert (indices[:, 3:] == -1).all()
+    assert (scores[:, 3:] == 0).all()
+    assert sorted(indices[0, :3]) == [0, 1, 2]
+
+
+def test_empty_gallery_is_unknown(rng):
+    index = GalleryIndex("exact")
+    matches = index.match(unit_rows(rng, 2))
+    assert [m["is_known"] for m in matches] == [False, False]
+
+
+def test_match_finds_enrolled_identity_and_applies_threshold(rng):
+    index, embeddings = make_index(rng, 200)
+    noisy = l2_normalize(embeddings[[7, 42]] + 0.01 * unit_rows(rng, 2))
+    stranger = unit_rows(rng, 1)
+
+    known = index.match(noisy)
+    assert [m["person_id"] for m in known] == ["id7", "id42"]
+    assert all(m["is_known"] for m in known)
+    assert not index.match(stranger)[0]["is_known"]
+
+
+def test_add_and_remove_keep_search_consistent(rng):
+    index, embeddings = make_index(rng, 50)
+    extra = unit_rows(rng, 1)[0]
+    index.add("new", "new person", extra)
+    assert index.match(extra[None, :])[0]["person_id"] == "new"
+
+    assert index.remove("id10")
+    assert not index.contains("id10")
+    assert len(index) == 50
+    # Rows after the removed one shifted down; their ids must still line up
+    assert index.match(embeddings[[11, 49]])[0]["person_id"] == "id11"
+    assert index.match(embeddings[[49]])[0]["person_id"] == "id49"
+
+
+def test_ivf_probing_every_cell_is_exact(rng, monkeypatch):
+    monkeypatch.setattr(gallery_index, "IVF_NLIST", 16)
+    monkeypatch.setattr(gallery_index, "IVF_NPROBE", 16)
+    index, embeddings = make_index(rng, 400, backend="ivf")
+    assert index.ann is not None
+    queries = unit_rows(rng, 10)
+
+    scores, indices = index.search(queries, 3)
+    expected_scores, expected_indices = brute_force(embeddings, queries, 3)
+
+    np.testing.assert_array_equal(indices, expected_indices)
+    np.testing.assert_allclose(scores, expected_scores, rtol=1e-5, atol=1e-6)
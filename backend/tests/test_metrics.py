@@ -0,0 +1,49 @@
+from app.core.metrics import Counter, Histogram, Registry, snapshot_delta
+from app.services.video_jobs import VideoJobManager
+
+
+def test_label_values_are_escaped():
+    registry = Registry()
+    counter = Counter("frames_total", "Frames.", ("camera_id",), registry=registry)
+    counter.inc(camera_id='lobby "east"\\door\nB')
+
+    assert 'frames_total{camera_id="lobby \\"east\\"\\\\door\\nB"} 1' in registry.render().splitlines()
+
+
+def test_snapshot_delta_round_trips_through_merge():
+    worker = Histogram("stage_seconds", "Stages.", ("pipeline", "stage"), registry=Registry())
+    parent = Histogram("stage_seconds", "Stages.", ("pipeline", "stage"), registry=Registry())
+    worker.labels(pipeline="video", stage="decode").observe(0.002)
+    base = worker.snapshot()
+
+    worker.labels(pipeline="video", stage="decode").observe(0.003)
+    worker.labels(pipeline="video", stage="detect").observe(0.2)
+    parent.merge(snapshot_delta(worker.snapshot(), base))
+
+    decode_counts, decode_sum = parent.labels("video", "decode").snapshot()
+    assert sum(decode_counts) == 1 and abs(decode_sum - 0.003) < 1e-9
+    assert sum(parent.labels("video", "detect").snapshot()[0]) == 1
+
+
+def test_worker_stage_timings_are_merged_once(monkeypatch):
+    from app.services import video_jobs
+
+    histogram = Histogram("stage_seconds", "Stages.", ("pipeline", "stage"), registry=Registry())
+    monkeypatch.setattr(video_jobs, "STAGE_SECONDS", histogram)
+    worker = Histogram("stage_seconds", "Stages.", ("pipeline", "stage"), registry=Registry())
+
+    manager = VideoJobManager()
+    manager._progress = {}
+    manager.jobs["job"] = {"job_id": "job", "stage_seconds_merged": {}}
+
+    worker.labels("video", "detect").observe(0.01)
+    manager._progress["job"] = {"stage_seconds": worker.snapshot()}
+    manager.collect_metrics()
+    manager.collect_metrics()
+    assert sum(histogram.labels("video", "detect").snapshot()[0]) == 1
+
+    worker.labels("video", "detect").observe(0.02)
+    manager._progress["job"] = {"stage_seconds": worker.snapshot()}
+    manager.collect_metrics()
+    counts, total = histogram.labels("video", "detect").snapshot()
+    assert sum(counts) == 2 and abs(total - 0.03) < 1e-9
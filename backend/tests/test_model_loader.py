@@ -0,0 +1,130 @@
+import numpy as np
+import pytest
+
+from app.core import model_loader
+
+ort = pytest.importorskip("onnxruntime")
+onnx = pytest.importorskip("onnx")
+
+
+@pytest.fixture
+def identity_model(tmp_path):
+    from onnx import TensorProto, helper
+
+    graph = helper.make_graph(
+        [helper.make_node("Identity", ["input"], ["output"])], "identity",
+        [helper.make_tensor_value_info("input", TensorProto.FLOAT, [1, 3])],
+        [helper.make_tensor_value_info("output", TensorProto.FLOAT, [1, 3])],
+    )
+    path = tmp_path / "identity.onnx"
+    # IR / opset versions every supported onnxruntime can load
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)], ir_version=8)
+    onnx.save(model, str(path))
+    return str(path)
+
+
+def test_sessions_get_the_pool_thread_settings(identity_model):
+    session = model_loader.create_session(identity_model)
+    options = session.get_session_options()
+
+    assert options.intra_op_num_threads == model_loader.ORT_INTRA_OP_THREADS
+    assert options.inter_op_num_threads == model_loader.ORT_INTER_OP_THREADS
+    assert options.execution_mode == ort.ExecutionMode.ORT_SEQUENTIAL
+    assert session.get_providers() == ["CPUExecutionProvider"]
+
+
+
+def scrfd_like_model(path: str, batched: bool) -> str:
+    """
+    A tiny detector with SCRFD's 9 outputs (scores, boxes, landmarks for
+    strides 8 / 16 / 32, two anchors each): bright cells score high.
+    With batched=True it has a dynamic batch axis and 3-D outputs, otherwise
+    batch 1 and 2-D outputs like buffalo_l's det_10g.
+    """
+    from onnx import TensorProto, helper
+
+    nodes, outputs, inits = [], {"scores": [], "boxes": [], "kps": []}, []
+    shape = (lambda width: [0, -1, width]) if batched else (lambda width: [-1, width])
+    dims = (lambda width: ["N", "K", width]) if batched else (lambda width: ["K", width])
+    for stride in (8, 16, 32):
+        p = f"s{stride}_"
+        nodes += [
+            helper.make_node("AveragePool", ["input"], [p + "pool"], kernel_shape=[stride, stride], strides=[stride, stride]),
+            helper.make_node("ReduceMean", [p + "pool"], [p + "mean"], axes=[1], keepdims=1),
+            helper.make_node("Mul", [p + "mean", "six"], [p + "logit"]),
+            helper.make_node("Sigmoid", [p + "logit"], [p + "prob"]),
+            helper.make_node("Transpose", [p + "prob"], [p + "cell"], perm=[0, 2, 3, 1]),
+        ]
+        for kind, width in (("scores", 1), ("boxes", 4), ("kps", 10)):
+            name = f"{kind}_{stride}"
+            scale = np.ones(2) if kind == "scores" else np.linspace(1.0, 2.0, 2 * width)
+            inits.append(helper.make_tensor(p + kind + "_scale", TensorProto.FLOAT, [2 * width], scale.astype(np.float32)))
+            inits.append(helper.make_tensor(p + kind + "_shape", TensorProto.INT64, [len(shape(width))], shape(width)))
+            nodes += [
+                helper.make_node("Concat", [p + "cell"] * (2 * width), [p + kind + "_tiled"], axis=-1),
+                helper.make_node("Mul", [p + kind + "_tiled", p + kind + "_scale"], [p + kind + "_scaled"]),
+                helper.make_node("Reshape", [p + kind + "_scaled", p + kind + "_shape"], [name]),
+            ]
+            outputs[kind].append(helper.make_tensor_value_info(name, TensorProto.FLOAT, dims(width)))
+    inits.append(helper.make_tensor("six", TensorProto.FLOAT, [], [6.0]))
+
+    graph = helper.make_graph(
+        nodes, "scrfd_like",
+        [helper.make_tensor_value_info("input", TensorProto.FLOAT, ["N" if batched else 1, 3, "H", "W"])],
+        outputs["scores"] + outputs["boxes"] + outputs["kps"], inits,
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)], ir_version=8)
+    onnx.save(model, path)
+    return path
+
+
+@pytest.fixture
+def detectors(tmp_path):
+    pytest.importorskip("insightface")
+    from types import SimpleNamespace
+    from insightface.model_zoo.retinaface import RetinaFace
+
+    def app(batched):
+        path = scrfd_like_model(str(tmp_path / f"det_{batched}.onnx"), batched)
+        det_model = RetinaFace(model_file=path, session=model_loader.create_session(path))
+        det_model.prepare(0, input_size=(96, 96), det_thresh=0.5)
+        return SimpleNamespace(det_model=det_model)
+
+    return app(batched=False), app(batched=True)
+
+
+def sample_images():
+    rng = np.random.default_rng(0)
+    images = []
+    for height, width in ((120, 200), (96, 96), (180, 100)):
+        img = np.zeros((height, width, 3), dtype=np.uint8)
+        for _ in range(3):
+            side = int(rng.integers(16, 40))
+            y, x = int(rng.integers(0, height - side)), int(rng.integers(0, width - side))
+            img[y:y + side, x:x + side] = 255
+        images.append(img)
+    return images
+
+
+def test_buffalo_style_detector_is_not_batched(detectors):
+    single, batched = detectors
+    assert not model_loader.supports_batch(single.det_model)
+    assert model_loader.supports_batch(batched.det_model)
+
+
+def test_batched_detection_matches_per_image_detection(detectors):
+    single, batched = detectors
+    images = sample_images()
+    session = batched.det_model.session
+
+    expected = [model_loader.detect_faces(single, img) for img in images]
+    results = model_loader.detect_faces_batch(batched, images)
+
+    assert batched.det_model.session is session
+    assert sum(len(faces) for faces in expected) > 0
+    for want, got in zip(expected, results):
+        assert len(got) == len(want)
+        for a, b in zip(want, got):
+            np.testing.assert_allclose(b.bbox, a.bbox, rtol=1e-5, atol=1e-3)
+            np.testing.assert_allclose(b.kps, a.kps, rtol=1e-5, atol=1e-3)
+            assert b.det_score == pytest.approx(a.det_score, abs=1e-5)
@@ -0,0 +1,101 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.database import events_collection
+from app.repositories.stats_repo import EVENTS_COUNTER, find_daily_stats, get_counter
+from app.services import stats_service
+from app.services.event_sink import EventSink
+from app.services.event_tracker import EventTracker
+
+BASE = datetime(2026, 1, 22, 9, 0, 0)
+
+
+def make_event(name: str, first_seen: datetime, duration: float, created_at: datetime = None):
+    return {
+        "name": name,
+        "name_lower": name.lower(),
+        "date": first_seen.strftime("%d-%m-%Y"),
+        "start_seconds_raw": 10.0,
+        "end_seconds_raw": 10.0 + duration,
+        "first_seen": first_seen,
+        "created_at": created_at or first_seen,
+    }
+
+
+@pytest.fixture
+def sink(db, monkeypatch):
+    sink = EventSink()
+    monkeypatch.setattr(stats_service, "event_sink", sink)
+    return sink
+
+
+def test_events_written_before_seeding_are_counted_once(sink):
+    for i in range(3):
+        sink.insert(make_event("Alice", BASE + timedelta(minutes=i), 5.0))
+    assert sink.flush()
+    assert get_counter(EVENTS_COUNTER) == 0
+
+    stats_service.seed_counters()
+    assert get_counter(EVENTS_COUNTER) == 3
+    assert find_daily_stats("22-01-2026")[0]["visits"] == 3
+
+    sink.insert(make_event("Alice", BASE + timedelta(hours=1), 5.0))
+    assert sink.flush()
+    stats_service.seed_counters()
+    assert get_counter(EVENTS_COUNTER) == 4
+    assert find_daily_stats("22-01-2026")[0]["visits"] == 4
+
+
+def test_statistics_pending_at_seed_time_are_not_added_again(sink):
+    sink.insert(make_event("Alice", BASE, 5.0))
+    assert sink.flush()
+    # As if the statistics write had failed: the event exists, its delta is still pending
+    sink._pending_events = 1
+
+    stats_service.seed_counters()
+    sink.insert(make_event("Alice", BASE + timedelta(hours=1), 5.0))
+    assert sink.flush()
+
+    assert get_counter(EVENTS_COUNTER) == 2
+
+
+def test_daily_rollups_are_backfilled_from_the_event_history(sink):
+    events_collection.insert_many([
+        make_event("Alice", BASE, 30.0),
+        make_event("Alice", BASE + timedelta(hours=2), 15.0),
+        make_event("Bob", BASE + timedelta(hours=1), 10.0),
+        make_event("Bob", BASE + timedelta(days=1), 20.0),
+    ])
+
+    stats_service.seed_counters()
+
+    alice = find_daily_stats("22-01-2026", "alice")[0]
+    assert alice["visits"] == 2
+    assert alice["total_duration_sec"] == pytest.approx(45.0)
+    assert alice["first_seen"] == BASE
+    assert alice["last_seen"] == BASE + timedelta(hours=2, seconds=15)
+    assert [row["visits"] for row in find_daily_stats(name="bob")] == [1, 1]
+
+    # Runs once: a second start-up leaves the rollups alone
+    stats_service.seed_counters()
+    sink.insert(make_event("Alice", BASE + timedelta(hours=3), 5.0))
+    assert sink.flush()
+    assert find_daily_stats("22-01-2026", "alice")[0]["visits"] == 3
+
+
+def test_video_events_are_dated_by_the_frame_time(sink):
+    stats_service.seed_counters()
+    origin = datetime(2026, 1, 22, 23, 59, 0)
+    tracker = EventTracker(sink=sink, origin=origin)
+    for second in (75.0, 76.0, 80.0):
+        tracker.update("Alice", second)
+    tracker.save_all_remaining()
+
+    event = events_collection.find_one({"name": "Alice"})
+    assert event["first_seen"] == origin + timedelta(seconds=75)
+    assert event["date"] == "23-01-2026"
+
+    rollup = find_daily_stats("23-01-2026", "alice")[0]
+    assert rollup["first_seen"] == origin + timedelta(seconds=75)
+    assert rollup["last_seen"] == origin + timedelta(seconds=80)
@@ -0,0 +1,94 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import video_jobs
+from app.services.video_jobs import VideoJobManager
+
+
+class ThreadedJobManager(VideoJobManager):
+    """Runs jobs on a thread instead of a worker process."""
+
+    def _ensure_started(self):
+        if self._executor is None:
+            self._manager = SimpleNamespace(Event=threading.Event, shutdown=lambda: None)
+            self._progress = {}
+            self._executor = ThreadPoolExecutor(max_workers=1)
+
+    def _ensure_syncing(self):
+        # The tests call sync() themselves
+        pass
+
+
+def fake_job(job_id, input_path, output_path, progress, cancel_event, motion_rois=None):
+    frames = 0
+    while not cancel_event.is_set():
+        frames += 1
+        progress[job_id] = {"status": "running", "frames_done": frames, "total_frames": 10_000, "events": 0,
+                            "fps": 100.0, "stage_seconds": {}}
+        if frames == 3 and "fail" in input_path:
+            raise RuntimeError("decoder crashed")
+        time.sleep(0.01)
+    return None
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def managers(db, monkeypatch):
+    monkeypatch.setattr(video_jobs, "_run_video_job", fake_job)
+    owner, other = ThreadedJobManager(), ThreadedJobManager()
+    yield owner, other
+    owner.shutdown()
+
+
+def test_any_process_sees_and_cancels_a_job(managers, tmp_path):
+    owner, other = managers
+    job_id = owner.submit(str(tmp_path / "in.mp4"), str(tmp_path / "out.mp4"), "out.mp4")
+    assert other.get(job_id)["status"] == "queued"
+
+    wait_for(lambda: owner.get(job_id)["frames_done"] > 0)
+    owner.sync()
+    seen = other.get(job_id)
+    assert seen["status"] == "running"
+    assert seen["frames_done"] > 0
+    assert other.active_jobs() == [job_id]
+
+    assert other.cancel(job_id) is True
+    assert other.get(job_id)["status"] == "cancelling"
+    owner.sync()
+    wait_for(lambda: other.get(job_id)["status"] == "cancelled")
+    assert other.get(job_id)["finished_at"] is not None
+    assert other.active_jobs() == []
+
+
+def test_failures_are_reported_to_other_processes(managers, tmp_path):
+    owner, other = managers
+    job_id = owner.submit(str(tmp_path / "fail.mp4"), str(tmp_path / "out.mp4"), "out.mp4")
+
+    wait_for(lambda: other.get(job_id)["status"] == "failed")
+    assert other.get(job_id)["error"] == "decoder crashed"
+
+
+def test_unknown_jobs(managers):
+    _, other = managers
+    assert other.get("missing") is None
+    assert other.cancel("missing") is False
+
+
+def test_jobs_of_a_stopped_process_are_reported_failed(managers, tmp_path, monkeypatch):
+    owner, other = managers
+    job_id = owner.submit(str(tmp_path / "in.mp4"), str(tmp_path / "out.mp4"), "out.mp4")
+    monkeypatch.setattr(video_jobs, "VIDEO_JOB_STALE_SEC", 0.0)
+    time.sleep(0.01)
+
+    assert other.get(job_id)["status"] == "failed"
+    assert owner.get(job_id)["status"] in ("queued", "running")
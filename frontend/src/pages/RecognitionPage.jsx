@@ -6,6 +6,7 @@ export default function RecognitionPage() {
   const [loading, setLoading] = useState(false);
   const [videoUrl, setVideoUrl] = useState(null);
   const [error, setError] = useState(null);
+  const [progress, setProgress] = useState(null);
 
   const handleVideoUpload = async (e) => {
     const file = e.target.files[0];
@@ -21,9 +22,14 @@ export default function RecognitionPage() {
     setLoading(true);
     setError(null);
     setVideoUrl(null);
+    setProgress(null);
 
     try {
-      const response = await recognizeVideo(file);
+      const response = await recognizeVideo(file, setProgress);
+      if (response.status === "aborted") {
+        setError(response.message);
+        return;
+      }
       
       // Fix Caching: Append timestamp to force browser to reload the new video
       setVideoUrl(`${response.video_url}?t=${Date.now()}`);
@@ -105,7 +111,11 @@ export default function RecognitionPage() {
                   </div>
                   <div className="text-center space-y-1">
                     <p className="text-xl font-bold text-white">Processing Video...</p>
-                    <p className="text-sm text-purple-300">Detecting faces & logging events</p>
+                    <p className="text-sm text-purple-300">
+                      {progress?.percent != null
+                        ? `${progress.percent}% done${progress.eta_sec != null ? ` · ~${Math.ceil(progress.eta_sec)}s left` : ""}`
+                        : "Detecting faces & logging events"}
+                    </p>
                   </div>
                 </div>
               ) : (
@@ -13,15 +13,29 @@ export async function getEnrolledPersons() {
 }
 
 
+// /analysis/logs returns one page at a time; follow X-Next-Cursor until every row is in
+export async function fetchAllLogs(params, errorMessage = "Failed to fetch logs") {
+  const rows = [];
+  let cursor = null;
+  do {
+    const query = new URLSearchParams(params);
+    if (cursor) query.set("cursor", cursor);
+
+    const res = await fetch(`${API_BASE_URL}/analysis/logs?${query.toString()}`);
+    if (!res.ok) throw new Error(errorMessage);
+    rows.push(...(await res.json()));
+    cursor = res.headers.get("X-Next-Cursor");
+  } while (cursor);
+  return rows;
+}
+
 export async function getLogs(name = "", date = "") {
   // Build query string: /analysis/logs?name=Abdul&date=22-01-2026
   const params = new URLSearchParams();
   if (name) params.append("name", name);
   if (date) params.append("date", date);
 
-  const res = await fetch(`${API_BASE_URL}/analysis/logs?${params.toString()}`);
-  if (!res.ok) throw new Error("Failed to fetch logs");
-  return res.json();
+  return fetchAllLogs(params);
 }
 
 export async function resetLogsOnly() {
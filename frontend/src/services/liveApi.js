@@ -1,19 +1,27 @@
 import { API_BASE_URL } from "../config/api";
+import { fetchAllLogs } from "./analysisApi";
 
-// Start the Camera (Local or Remote)
-export async function startLiveStream(source = "0") {
-  const res = await fetch(`${API_BASE_URL}/live/start?source=${encodeURIComponent(source)}`);
+// Start the Camera (Local or Remote). Each cameraId runs as its own live session.
+export async function startLiveStream(source = "0", cameraId = "default") {
+  const res = await fetch(`${API_BASE_URL}/live/start?source=${encodeURIComponent(source)}&camera_id=${encodeURIComponent(cameraId)}`);
   if (!res.ok) throw new Error("Failed to start camera");
   return res.json();
 }
 
 // Stop the Camera
-export async function stopLiveStream() {
-  const res = await fetch(`${API_BASE_URL}/live/stop`);
+export async function stopLiveStream(cameraId = "default") {
+  const res = await fetch(`${API_BASE_URL}/live/stop?camera_id=${encodeURIComponent(cameraId)}`);
   if (!res.ok) throw new Error("Failed to stop camera");
   return res.json();
 }
 
+// Running cameras with per-camera fps / latency
+export async function listLiveCameras() {
+  const res = await fetch(`${API_BASE_URL}/live/cameras`);
+  if (!res.ok) throw new Error("Failed to fetch cameras");
+  return res.json();
+}
+
 // Fetch Active Sessions (For the Real-Time Table)
 // We will filter the existing /analysis/logs endpoint by "today" to get live data
 export async function getLiveActivity() {
@@ -24,7 +32,5 @@ export async function getLiveActivity() {
   const yyyy = today.getFullYear();
   const dateStr = `${dd}-${mm}-${yyyy}`;
 
-  const res = await fetch(`${API_BASE_URL}/analysis/logs?date=${dateStr}`);
-  if (!res.ok) throw new Error("Failed to fetch live logs");
-  return res.json();
+  return fetchAllLogs({ date: dateStr }, "Failed to fetch live logs");
 }
\ No newline at end of file
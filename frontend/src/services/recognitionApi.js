@@ -1,26 +1,52 @@
 
 import { API_BASE_URL } from "../config/api";
 
-export async function recognizeVideo(videoFile) {
-  console.log("Inside RecognitionAPI.js Frontend 1")
+const POLL_INTERVAL_MS = 1000;
+
+let currentJobId = null;
+
+/**
+ * Uploads a video, then polls the background job until it finishes.
+ * @param {File} videoFile
+ * @param {(job: object) => void} onProgress - called with every status poll (frames_done, percent, eta_sec...)
+ */
+export async function recognizeVideo(videoFile, onProgress) {
   const formData = new FormData();
   formData.append("file", videoFile);
-  console.log("Inside RecognitionAPI.js Frontend before sending video to backend...")
+
   const response = await fetch(`${API_BASE_URL}/recognize/video`, {
     method: "POST",
     body: formData,
   });
-  console.log("Inside RecognitionAPI.js Frontend after receiving response...")
   if (!response.ok) {
     const error = await response.json();
     throw new Error(error.detail || "Video processing failed");
   }
-  console.log("Inside RecognitionAPI.js Frontend after receiving response response is okay and is being sent to UI...")
-  return response.json();
+
+  const { job_id } = await response.json();
+  currentJobId = job_id;
+
+  try {
+    while (true) {
+      await new Promise((resolve) => setTimeout(resolve, POLL_INTERVAL_MS));
+
+      const res = await fetch(`${API_BASE_URL}/recognize/jobs/${job_id}`);
+      if (!res.ok) throw new Error("Failed to fetch processing status");
+      const job = await res.json();
+      if (onProgress) onProgress(job);
+
+      if (job.status === "completed") return job;
+      if (job.status === "cancelled") return { ...job, status: "aborted" };
+      if (job.status === "failed") throw new Error(job.message || "Video processing failed");
+    }
+  } finally {
+    currentJobId = null;
+  }
 }
 
-export async function stopProcessing() {
-  await fetch(`${API_BASE_URL}/recognize/stop`, {
+export async function stopProcessing(jobId = currentJobId) {
+  if (!jobId) return;
+  await fetch(`${API_BASE_URL}/recognize/jobs/${jobId}/cancel`, {
     method: "POST",
   });
-}
\ No newline at end of file
+}